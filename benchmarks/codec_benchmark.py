@@ -0,0 +1,80 @@
+"""
+Compare the stored document formats: bytes per object and encode/decode time.
+
+Run from the repository root:
+
+    python -m benchmarks.codec_benchmark [--number 20000]
+
+No Redis server is needed; only the codecs and models are exercised.
+"""
+import argparse
+import timeit
+from datetime import datetime, timedelta
+
+from services.codec import CODECS
+from services.content import ContentType, Lesson, Module
+from services.course import Course, CourseLevel, CourseStatus
+from services.enrollment import Enrollment
+from services.user import User, UserRole
+
+
+def sample_objects():
+    """One representative instance of every stored model."""
+    now = datetime.now()
+    return {
+        "course": Course(
+            id=1700000000123, title="Python Programming Fundamentals",
+            description="Learn the fundamentals of Python programming in this comprehensive course.",
+            instructor_id=1700000000001, instructor_name="Instructor 1", level=CourseLevel.BEGINNER,
+            price=49.99, duration=12.0, status=CourseStatus.PUBLISHED, created_at=now, updated_at=now,
+            start_date=now + timedelta(days=7), tags=["python programming", "beginner", "online"],
+            thumbnail_url="https://example.com/thumbnails/python_programming.jpg",
+        ),
+        "module": Module(
+            id=1700000000456, course_id=1700000000123, title="Module 1: Getting Started",
+            description="An introduction to the tools used throughout the course.", order=1,
+            created_at=now, updated_at=now,
+        ),
+        "lesson": Lesson(
+            id=1700000000789, module_id=1700000000456, title="Lesson 1: Installing Python",
+            description="Set up Python and an editor.", content_type=ContentType.TEXT,
+            content="Download the installer from python.org and follow the steps below. " * 5,
+            duration_minutes=15, order=1, created_at=now, updated_at=now,
+        ),
+        "user": User(
+            id=1700000000001, username="student1", email="student1@example.com", full_name="Student One",
+            role=UserRole.STUDENT, created_at=now, updated_at=now,
+        ),
+        "enrollment": Enrollment(id=1700000000999, user_id=1700000000001, course_id=1700000000123, enrolled_at=now),
+    }
+
+
+def run(number: int) -> None:
+    objects = sample_objects()
+    header = f"{'object':<11} {'codec':<8} {'bytes':>6} {'encode us':>10} {'decode us':>10} {'decode+model us':>16}"
+    print(header)
+    print("-" * len(header))
+
+    for kind, obj in objects.items():
+        model = type(obj)
+        doc = obj.dict(exclude={"lessons"}) if kind == "module" else obj.dict()
+        baseline = None
+        for codec in CODECS.values():
+            data = codec.encode(doc)
+            size = len(data.encode("utf-8"))
+            encode = timeit.timeit(lambda: codec.encode(doc), number=number) / number * 1e6
+            decode = timeit.timeit(lambda: codec.decode(data), number=number) / number * 1e6
+            parse = timeit.timeit(lambda: model(**codec.decode(data)), number=number) / number * 1e6
+            if baseline is None:
+                baseline = size
+                saved = ""
+            else:
+                saved = f"  ({100 * (baseline - size) / baseline:.0f}% smaller)"
+            print(f"{kind:<11} {codec.name:<8} {size:>6} {encode:>10.2f} {decode:>10.2f} {parse:>16.2f}{saved}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark stored document formats")
+    parser.add_argument("--number", type=int, default=20000, help="Iterations per measurement (default: 20000)")
+    args = parser.parse_args()
+    run(args.number)
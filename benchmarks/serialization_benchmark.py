@@ -0,0 +1,76 @@
+"""
+Compare the cost of serializing `GET /courses/?limit=100` and its size on the wire.
+
+Run from the repository root:
+
+    python -m benchmarks.serialization_benchmark [--number 200] [--courses 100]
+
+Measures FastAPI's default path (response_model validation, jsonable_encoder
+and JSONResponse) against FastJSONResponse, and the body size uncompressed,
+with gzip and, if the brotli package is installed, with brotli. No Redis
+server is needed.
+"""
+import argparse
+import asyncio
+import gzip
+import timeit
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from services.course import Course, CourseLevel, CourseStatus
+from web.compression import brotli
+from web.responses import FastJSONResponse, orjson
+
+
+def sample_courses(count: int) -> List[Course]:
+    """Courses shaped like the catalog's, with realistic description lengths."""
+    now = datetime.now()
+    return [
+        Course(
+            id=1700000000000 + i, title=f"Course {i}: Python Programming Fundamentals",
+            description="Learn the fundamentals of Python programming in this comprehensive course. " * 8,
+            instructor_id=1700000000001, instructor_name=f"Instructor {i % 7}", level=CourseLevel.BEGINNER,
+            price=49.99, duration=12.0, status=CourseStatus.PUBLISHED, created_at=now, updated_at=now,
+            start_date=now + timedelta(days=7), tags=["python programming", "beginner", "online"],
+            thumbnail_url=f"https://example.com/thumbnails/course_{i}.jpg",
+        )
+        for i in range(count)
+    ]
+
+
+def run(number: int, count: int) -> None:
+    courses = sample_courses(count)
+    field = create_response_field(name="Response_list_courses", type_=List[Course])
+    loop = asyncio.new_event_loop()
+
+    def default_path() -> bytes:
+        content = loop.run_until_complete(serialize_response(field=field, response_content=courses))
+        return JSONResponse(content).body
+
+    def fast_path() -> bytes:
+        return FastJSONResponse([course.dict() for course in courses]).body
+
+    encoder = "orjson" if orjson is not None else "json (orjson not installed)"
+    print(f"{count} courses, FastJSONResponse encoder: {encoder}")
+    header = f"{'path':<30} {'us/response':>12} {'identity':>10} {'gzip':>8} {'br':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, path in (("response_model + JSONResponse", default_path), ("FastJSONResponse", fast_path)):
+        body = path()
+        seconds = timeit.timeit(path, number=number) / number
+        gzipped = len(gzip.compress(body, compresslevel=6))
+        brotlied = f"{len(brotli.compress(body, quality=4)):>8}" if brotli is not None else f"{'n/a':>8}"
+        print(f"{name:<30} {seconds * 1e6:>12.1f} {len(body):>10} {gzipped:>8} {brotlied}")
+    loop.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark course list serialization")
+    parser.add_argument("--number", type=int, default=200, help="Iterations per measurement (default: 200)")
+    parser.add_argument("--courses", type=int, default=100, help="Courses per response (default: 100)")
+    args = parser.parse_args()
+    run(args.number, args.courses)
@@ -149,29 +149,29 @@ async def verify_enrollment_possible():
 
     if course_data:
         try:
-            course_dict = json.loads(course_data)
+            course_dict = redis_manager.decode_doc(course_data)
             print(f"Course {course_id} is available for enrollment:")
             print(f"  Title: {course_dict.get('title')}")
             print(f"  Status: {course_dict.get('status')}")
 
             # Check if course has modules
             course_modules_key = f"course:{course_id}:modules"
-            module_ids = redis_manager.smembers(course_modules_key)
+            module_ids = redis_manager.zrange(course_modules_key)
             print(f"  Modules: {len(module_ids)}")
 
             if module_ids:
-                module_id = next(iter(module_ids))
+                module_id = module_ids[0]
                 module_key = f"module:{module_id}"
                 module_data = redis_manager.get(module_key)
 
                 if module_data:
-                    module_dict = json.loads(module_data)
+                    module_dict = redis_manager.decode_doc(module_data)
                     print(f"  Module {module_id} is available:")
                     print(f"    Title: {module_dict.get('title')}")
 
                     # Check if module has lessons
                     module_lessons_key = f"module:{module_id}:lessons"
-                    lesson_ids = redis_manager.smembers(module_lessons_key)
+                    lesson_ids = redis_manager.zrange(module_lessons_key)
                     print(f"    Lessons: {len(lesson_ids)}")
 
                     if lesson_ids:
@@ -182,8 +182,8 @@ async def verify_enrollment_possible():
                     print("✗ Module data not found")
             else:
                 print("✗ Course has no modules")
-        except json.JSONDecodeError:
-            print(f"✗ Course {course_id} data is not valid JSON")
+        except AttributeError:
+            print(f"✗ Course {course_id} data is not a valid document")
     else:
         print(f"✗ Course {course_id} data not found")
 
@@ -0,0 +1,58 @@
+import argparse
+import contextlib
+import sys
+from services.redis_manager import RedisManager
+from services.catalog_export import CatalogExportService, EXPORT_SECTIONS
+
+def export_catalog(path, sections=None, batch_size=100, host=None, port=None, password=None):
+    """
+    Stream courses, users and enrollments from Redis to an NDJSON file.
+
+    Args:
+        path (str): File to write, or "-" for stdout
+        sections (list, optional): Sections to export (default: all)
+        batch_size (int): Number of keys fetched per round-trip
+        host (str, optional): Redis host address
+        port (int, optional): Redis port
+        password (str, optional): Redis password
+    """
+    # Keep connection messages out of the export when writing to stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        redis_manager = RedisManager(host=host, port=port, password=password)
+    if not redis_manager.get_client():
+        print("Failed to connect to Redis. Exiting.", file=sys.stderr)
+        return
+
+    service = CatalogExportService(redis_manager, batch_size=batch_size)
+    out = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+    try:
+        count = 0
+        for line in service.iter_ndjson(sections):
+            out.write(line)
+            count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"Exported {count} records", file=sys.stderr)
+
+if __name__ == "__main__":
+    # Set up command line arguments
+    parser = argparse.ArgumentParser(description='Export courses, users and enrollments from Redis as NDJSON')
+    parser.add_argument('path', help='Output file, or - for stdout')
+    parser.add_argument('--sections', nargs='+', choices=EXPORT_SECTIONS, help='Sections to export (default: all)')
+    parser.add_argument('--batch-size', type=int, default=100, help='Keys fetched per round-trip (default: 100)')
+    parser.add_argument('--host', help='Redis host address (default: from env or localhost)')
+    parser.add_argument('--port', type=int, help='Redis port (default: from env or 14345)')
+    parser.add_argument('--password', help='Redis password (default: from env)')
+
+    args = parser.parse_args()
+
+    export_catalog(
+        args.path,
+        sections=args.sections,
+        batch_size=args.batch_size,
+        host=args.host,
+        port=args.port,
+        password=args.password
+    )
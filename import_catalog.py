@@ -0,0 +1,60 @@
+import asyncio
+import argparse
+import sys
+from services.redis_manager import RedisManager
+from services.catalog_import import CatalogImportService
+
+async def import_catalog(path, batch_size=100, host=None, port=None, password=None):
+    """
+    Bulk import courses, modules and lessons from an NDJSON file into Redis.
+
+    Args:
+        path (str): NDJSON file to read, or "-" for stdin
+        batch_size (int): Number of courses validated and written per pipeline
+        host (str, optional): Redis host address
+        port (int, optional): Redis port
+        password (str, optional): Redis password
+    """
+    redis_manager = RedisManager(host=host, port=port, password=password)
+    if not redis_manager.get_client():
+        print("Failed to connect to Redis. Exiting.")
+        return
+
+    def show_progress(report):
+        print(f"Line {report.lines}: {report.courses} courses, {report.modules} modules, "
+              f"{report.lessons} lessons imported, {len(report.errors)} errors")
+
+    service = CatalogImportService(redis_manager, batch_size=batch_size)
+    if path == "-":
+        report = await service.import_ndjson(sys.stdin, progress=show_progress)
+    else:
+        with open(path, encoding="utf-8") as f:
+            report = await service.import_ndjson(f, progress=show_progress)
+
+    print("\nImport complete!")
+    print(f"Courses: {report.courses}")
+    print(f"Modules: {report.modules}")
+    print(f"Lessons: {report.lessons}")
+    print(f"Skipped: {report.skipped}")
+    print(f"Errors: {len(report.errors)}")
+    for error in report.errors:
+        print(f"  line {error['line']}: {error['error']}")
+
+if __name__ == "__main__":
+    # Set up command line arguments
+    parser = argparse.ArgumentParser(description='Bulk import courses from an NDJSON file into Redis')
+    parser.add_argument('path', help='NDJSON file with one course per line, or - for stdin')
+    parser.add_argument('--batch-size', type=int, default=100, help='Courses per write batch (default: 100)')
+    parser.add_argument('--host', help='Redis host address (default: from env or localhost)')
+    parser.add_argument('--port', type=int, help='Redis port (default: from env or 14345)')
+    parser.add_argument('--password', help='Redis password (default: from env)')
+
+    args = parser.parse_args()
+
+    asyncio.run(import_catalog(
+        args.path,
+        batch_size=args.batch_size,
+        host=args.host,
+        port=args.port,
+        password=args.password
+    ))
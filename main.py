@@ -1,8 +1,8 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request, Form, Response
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Form, Response, Header
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, EmailStr
 import json
@@ -14,14 +14,26 @@ from services import (
     Enrollment, EnrollmentStatus, EnrollmentService,
     LessonProgress, ModuleProgress, CourseProgress, ProgressService,
     Token, AuthService,
-    Payment, PaymentStatus, PaymentMethod, PaymentService
+    Payment, PaymentStatus, PaymentMethod, PaymentService,
+    IdAllocator, CatalogImportService, CatalogExportService, CatalogVersions, CourseOverviewService,
+    TrendingService, SidebarSnapshot, AdminStats, AnalyticsService, PaymentQueue, EnrollmentExpirySweeper
 )
-
-# Import the EnhancedEnrollmentService for proper Redis-based enrollment management
-from test_complete_learning_flow import EnhancedEnrollmentService
+from services.admin_stats import course_changes, courses_field, users_field
+from services.analytics import get_resolution, parse_range
+from services.catalog_import import iter_ndjson_lines
+from services.payment_gateway import get_payment_gateway
+from services.payment_queue import CHARGE, REFUND
+from services.enrollment import ENROLLED, ENROLLMENT_FAILED, ENROLLMENT_REQUIRES_PAYMENT, PAYMENT_REQUIRED
+from services.course_overview import parse_fields, select_fields
 from services.redis_manager import RedisManager
+from services.redis_metrics import redis_metrics
+from web import (
+    PageCache, CompressionMiddleware, FastJSONResponse, PageViewMiddleware, RedisStatsMiddleware, conditional_response,
+    version_validators, ranking_validators
+)
 
 app = FastAPI(title="Online Course Platform API")
+app.add_middleware(CompressionMiddleware)
 
 # Configure templates
 templates = Jinja2Templates(directory="templates")
@@ -195,13 +207,78 @@ templates.env.globals["now"] = datetime.now
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Initialize services
-user_service = UserService()
-course_service = CourseService(featured_courses=featured_courses, trending_courses=trending_courses, redis_manager=redis_manager)
-content_service = ContentService()
-enrollment_service = EnhancedEnrollmentService(redis_manager)
+id_allocator = IdAllocator(redis_manager)
+user_service = UserService(redis_manager)
+trending_service = TrendingService(redis_manager)
+course_service = CourseService(featured_courses=featured_courses, trending_courses=trending_courses, redis_manager=redis_manager, id_allocator=id_allocator, trending_service=trending_service)
+content_service = ContentService(redis_manager, id_allocator)
+enrollment_service = EnrollmentService(redis_manager, id_allocator)
 progress_service = ProgressService()
-auth_service = AuthService()
-payment_service = PaymentService()
+auth_service = AuthService(user_service)
+analytics_service = AnalyticsService(redis_manager)
+payment_service = PaymentService(redis_manager, id_allocator, gateway=get_payment_gateway(),
+                                 analytics=analytics_service)
+payment_queue = PaymentQueue(redis_manager, payment_service)
+catalog_import_service = CatalogImportService(redis_manager, id_allocator)
+catalog_export_service = CatalogExportService(redis_manager)
+catalog_versions = CatalogVersions(redis_manager)
+course_overview_service = CourseOverviewService(course_service, content_service, catalog_versions)
+page_cache = PageCache(redis_manager, catalog_versions)
+admin_stats = AdminStats(redis_manager)
+app.add_middleware(PageViewMiddleware, analytics=analytics_service)
+app.add_middleware(RedisStatsMiddleware)
+sidebar = SidebarSnapshot(course_service, fallback_featured=featured_courses, fallback_trending=trending_courses)
+enrollment_sweeper = EnrollmentExpirySweeper(enrollment_service)
+
+
+@app.on_event("startup")
+async def build_user_id_index():
+    await user_service.build_id_index()
+
+
+@app.on_event("startup")
+async def count_existing_users_and_courses():
+    await admin_stats.count_existing()
+
+
+@app.on_event("startup")
+async def build_enrollment_index():
+    await enrollment_service.build_course_index()
+
+
+@app.on_event("startup")
+async def start_sidebar_refresh():
+    sidebar.start()
+
+
+@app.on_event("shutdown")
+async def stop_sidebar_refresh():
+    await sidebar.stop()
+
+
+@app.on_event("startup")
+async def start_payment_workers():
+    # Without a gateway queued jobs wait in the stream until one is configured
+    if payment_service.available:
+        payment_queue.start()
+
+
+@app.on_event("shutdown")
+async def stop_payment_workers():
+    await payment_queue.stop()
+
+
+@app.on_event("startup")
+async def start_enrollment_sweeper():
+    enrollment_sweeper.start()
+
+
+@app.on_event("shutdown")
+async def stop_enrollment_sweeper():
+    await enrollment_sweeper.stop()
+
+# Users and courses listed on the admin statistics pages
+ADMIN_PAGE_SIZE = 100
 
 # OAuth2 setup
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -354,22 +431,35 @@ async def create_course(
 
 
 @app.get("/courses/", response_model=List[Course])
-async def list_courses(skip: int = 0, limit: int = 100, exclude: Optional[str] = None):
+async def list_courses(request: Request, response: Response, skip: int = 0, limit: int = 100,
+                       exclude: Optional[str] = None):
     """List all published courses."""
+    validators = version_validators(catalog_versions, f"courses?skip={skip}&limit={limit}&exclude={exclude}")
+    not_modified = conditional_response(request, response, validators)
+    if not_modified:
+        return not_modified
+
     filters = {"status": CourseStatus.PUBLISHED}
     # Handle the exclude parameter if provided
     if exclude:
         filters["exclude"] = exclude
-    return await course_service.list_courses(
+    courses = await course_service.list_courses(
         skip=skip, 
         limit=limit, 
         filters=filters
     )
+    # The courses are validated models already, so skip response_model re-validation
+    return FastJSONResponse([course.dict() for course in courses], headers=response.headers)
 
 
 @app.get("/courses/{course_id}", response_model=Course)
-async def get_course(course_id: int):
+async def get_course(request: Request, response: Response, course_id: int):
     """Get a specific course by ID."""
+    validators = version_validators(catalog_versions, f"course:{course_id}", course_id)
+    not_modified = conditional_response(request, response, validators)
+    if not_modified:
+        return not_modified
+
     course = await course_service.get_course(course_id)
     if course is None:
         raise HTTPException(
@@ -392,22 +482,41 @@ async def root(request: Request, response: Response):
         # User is not authenticated, continue without user
         pass
 
-    return templates.TemplateResponse("base.html", {
-        "request": request,
-        "title": "Welcome to the Online Course Platform",
-        "message": "Welcome to the Online Course Platform API",
-        "version": "1.0.0",
-        "documentation": "/docs",
-        "featured_courses": featured_courses,
-        "trending_courses": trending_courses,
-        "user": user
-    })
+    async def render():
+        return templates.TemplateResponse("base.html", {
+            "request": request,
+            "title": "Welcome to the Online Course Platform",
+            "message": "Welcome to the Online Course Platform API",
+            "version": "1.0.0",
+            "documentation": "/docs",
+            "featured_courses": sidebar.featured,
+            "trending_courses": sidebar.trending,
+            "user": user
+        })
+
+    return await page_cache.respond(request, user, render)
 
 # HTML UI routes
 @app.get("/courses", response_class=HTMLResponse)
 @app.get("/courses/ui", response_class=HTMLResponse)
 async def list_courses_ui(request: Request, response: Response, skip: int = 0, limit: int = 100, exclude: Optional[str] = None, featured: bool = False, trending: bool = False):
     """List all published courses with HTML UI."""
+    # Try to get the current user from cookie
+    user = None
+    try:
+        user = await get_current_user_from_cookie(request, response)
+    except HTTPException:
+        # User is not authenticated, continue without user
+        pass
+
+    return await page_cache.respond(
+        request, user, lambda: render_course_list(request, user, skip, limit, exclude, featured, trending)
+    )
+
+
+async def render_course_list(request: Request, user: Optional[User], skip: int, limit: int,
+                             exclude: Optional[str], featured: bool, trending: bool) -> HTMLResponse:
+    """Render the course list page."""
     filters = {"status": CourseStatus.PUBLISHED}
     # Handle the exclude parameter if provided and not empty
     if exclude and exclude.strip():
@@ -419,19 +528,24 @@ async def list_courses_ui(request: Request, response: Response, skip: int = 0, l
     elif trending:
         filters["trending"] = True
 
-    courses = await course_service.list_courses(
+    # Course cards only need a few fields, so skip reading descriptions of full documents
+    courses = await course_service.list_course_cards(
         skip=skip, 
         limit=limit, 
         filters=filters
     )
 
-    # Get featured and trending courses separately for the template
-    featured_filters = {"status": CourseStatus.PUBLISHED, "featured": True}
-    trending_filters = {"status": CourseStatus.PUBLISHED, "trending": True}
-
-    featured_courses_list = await course_service.list_courses(filters=featured_filters)
-    trending_courses_list = await course_service.list_courses(filters=trending_filters)
+    return templates.TemplateResponse("courses/list.html", {
+        "request": request,
+        "courses": courses,
+        "featured_courses": sidebar.featured,
+        "trending_courses": sidebar.trending,
+        "user": user
+    })
 
+@app.get("/courses/{course_id}/ui", response_class=HTMLResponse)
+async def get_course_ui(request: Request, response: Response, course_id: int):
+    """Get a specific course by ID with HTML UI."""
     # Try to get the current user from cookie
     user = None
     try:
@@ -440,17 +554,23 @@ async def list_courses_ui(request: Request, response: Response, skip: int = 0, l
         # User is not authenticated, continue without user
         pass
 
-    return templates.TemplateResponse("courses/list.html", {
-        "request": request,
-        "courses": courses,
-        "featured_courses": featured_courses_list,
-        "trending_courses": trending_courses_list,
-        "user": user
-    })
+    # Enrolling does not bump the catalog version, so the enrollment state is read
+    # on every view and the page is cached once per state
+    enrollment_count = await enrollment_service.get_enrollment_count(course_id)
+    enrolled = user is not None and await enrollment_service.is_user_enrolled(user.id, course_id)
+    page = await page_cache.respond(
+        request, user, lambda: render_course_detail(request, user, course_id, enrollment_count, enrolled),
+        vary=f"students={enrollment_count};enrolled={int(enrolled)}")
 
-@app.get("/courses/{course_id}/ui", response_class=HTMLResponse)
-async def get_course_ui(request: Request, response: Response, course_id: int):
-    """Get a specific course by ID with HTML UI."""
+    # Count the view even when the page is served from the cache, but only for a course that
+    # exists: a missing one raises 404 above, so random IDs never enter the trending set
+    await trending_service.record_view(course_id)
+    return page
+
+
+async def render_course_detail(request: Request, user: Optional[User], course_id: int,
+                               enrollment_count: int, enrolled: bool) -> HTMLResponse:
+    """Render the course detail page with its modules and lessons."""
     # Get the course using the course service
     course = await course_service.get_course(course_id)
 
@@ -462,24 +582,8 @@ async def get_course_ui(request: Request, response: Response, course_id: int):
 
     # Convert Pydantic model to dict for template
     course = course.dict()
-    # Get modules and lessons for the course
-    modules = await content_service.get_modules_by_course_id(course_id)
-    if modules is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Modules not found for this course",
-        )
-    # Convert modules to dicts
-    modules = [module.dict() for module in modules]
-    # Convert lessons in each module to dicts
-    for module in modules:
-        lessons = await content_service.get_lessons_by_module_id(module["id"])
-        if lessons is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Lessons not found for module {module['id']}",
-            )
-        module["lessons"] = [lesson.dict() for lesson in lessons]
+    # Get modules and lessons for the course, with a fixed number of round-trips
+    modules = [module.dict() for module in await content_service.get_course_tree(course_id)]
     # Generate sample modules and lessons for the course
     # modules = [
     #     {
@@ -582,22 +686,15 @@ async def get_course_ui(request: Request, response: Response, course_id: int):
     course_with_modules["duration"] = total_duration / 60  # Convert to hours
 
 
-    # Add enrolled_students field
-    course_with_modules["enrolled_students"] = []  # Empty list by default
-
-    # Try to get the current user from cookie
-    user = None
-    try:
-        user = await get_current_user_from_cookie(request, response)
-    except HTTPException:
-        # User is not authenticated, continue without user
-        pass
+    # Add the enrollment count, and the current user if they are enrolled
+    course_with_modules["enrollment_count"] = enrollment_count
+    course_with_modules["enrolled_students"] = [user.id] if enrolled else []
 
     return templates.TemplateResponse("courses/detail.html", {
         "request": request,
         "course": course_with_modules,
-        "featured_courses": featured_courses,
-        "trending_courses": trending_courses,
+        "featured_courses": sidebar.featured,
+        "trending_courses": sidebar.trending,
         "user": user
     })
 
@@ -631,8 +728,8 @@ async def get_module_ui(request: Request, response: Response, course_id: int, mo
         "course": course,
         "module": module,
         "completed_lessons": [],  # This would be populated from user progress
-        "featured_courses": featured_courses,
-        "trending_courses": trending_courses,
+        "featured_courses": sidebar.featured,
+        "trending_courses": sidebar.trending,
         "user": user
     })
 
@@ -674,8 +771,8 @@ async def get_lesson_ui(request: Request, response: Response, course_id: int, mo
         "module": module,
         "lesson": lesson,
         "completed_lessons": [],  # This would be populated from user progress
-        "featured_courses": featured_courses,
-        "trending_courses": trending_courses,
+        "featured_courses": sidebar.featured,
+        "trending_courses": sidebar.trending,
         "user": user
     })
 
@@ -803,8 +900,8 @@ async def login_ui(request: Request, response: Response):
 
     return templates.TemplateResponse("login.html", {
         "request": request,
-        "featured_courses": featured_courses,
-        "trending_courses": trending_courses
+        "featured_courses": sidebar.featured,
+        "trending_courses": sidebar.trending
     })
 
 
@@ -846,17 +943,13 @@ async def course_session(
             # Check if student is enrolled
             is_enrolled = await enrollment_service.is_user_enrolled(user.id, course_id)
 
-    # Get all modules for the course
-    course_modules = await content_service.get_modules_by_course_id(course_id)
+    # Get all modules for the course with their lessons
+    course_modules = await content_service.get_course_tree(course_id)
 
     # Convert course to dict to add modules
     course_dict = course.dict()
     course_dict["modules"] = course_modules
 
-    # Get lessons for each module
-    for module in course_modules:
-        module.lessons = await content_service.get_lessons_by_module_id(module.id)
-
     # Initialize variables
     module = None
     lesson = None
@@ -866,6 +959,8 @@ async def course_session(
     next_module = None
     prev_module_last_lesson = None
     next_module_first_lesson = None
+    lesson_position = None
+    lesson_total = None
     completed_lessons = []
     progress_percentage = 0
 
@@ -895,28 +990,30 @@ async def course_session(
                     detail="Lesson not found",
                 )
 
-            # Determine previous and next lessons within the current module
-            current_lesson_index = module.lessons.index(lesson)
-            if current_lesson_index > 0:
-                prev_lesson = module.lessons[current_lesson_index - 1]
-            if current_lesson_index < len(module.lessons) - 1:
-                next_lesson = module.lessons[current_lesson_index + 1]
-
-            # If there's no previous/next lesson in the current module,
-            # check for previous/next modules
-            if not prev_lesson and course_dict["modules"]:
-                current_module_index = course_dict["modules"].index(module)
-                if current_module_index > 0:
-                    prev_module = course_dict["modules"][current_module_index - 1]
-                    if prev_module.lessons:
-                        prev_module_last_lesson = prev_module.lessons[-1]
-
-            if not next_lesson and course_dict["modules"]:
-                current_module_index = course_dict["modules"].index(module)
-                if current_module_index < len(course_dict["modules"]) - 1:
-                    next_module = course_dict["modules"][current_module_index + 1]
-                    if next_module.lessons:
-                        next_module_first_lesson = next_module.lessons[0]
+            # Lessons are listed without their content; load it for the one being shown
+            lesson.content = await content_service.get_lesson_content(lesson.id)
+
+            # Look up previous and next lessons in the precomputed lesson sequence
+            navigation = await content_service.get_lesson_navigation(course_id, lesson.id)
+            if navigation:
+                modules_by_id = {mod.id: mod for mod in course_dict["modules"]}
+                lessons_by_id = {les.id: les for mod in course_dict["modules"] for les in mod.lessons}
+                lesson_position = navigation.position
+                lesson_total = navigation.total
+
+                if navigation.prev_lesson_id:
+                    if navigation.prev_module_id == module.id:
+                        prev_lesson = lessons_by_id.get(navigation.prev_lesson_id)
+                    else:
+                        prev_module = modules_by_id.get(navigation.prev_module_id)
+                        prev_module_last_lesson = lessons_by_id.get(navigation.prev_lesson_id)
+
+                if navigation.next_lesson_id:
+                    if navigation.next_module_id == module.id:
+                        next_lesson = lessons_by_id.get(navigation.next_lesson_id)
+                    else:
+                        next_module = modules_by_id.get(navigation.next_module_id)
+                        next_module_first_lesson = lessons_by_id.get(navigation.next_lesson_id)
 
     # Get completed lessons for the user if they're enrolled
     if user and is_enrolled and user.role == "student":
@@ -943,8 +1040,10 @@ async def course_session(
         "next_module": next_module,
         "prev_module_last_lesson": prev_module_last_lesson,
         "next_module_first_lesson": next_module_first_lesson,
-        "featured_courses": featured_courses,
-        "trending_courses": trending_courses,
+        "lesson_position": lesson_position,
+        "lesson_total": lesson_total,
+        "featured_courses": sidebar.featured,
+        "trending_courses": sidebar.trending,
         "user": user
     })
 
@@ -969,8 +1068,8 @@ async def login(
             "request": request,
             "error": "Invalid username or password",
             "username": username,
-            "featured_courses": featured_courses,
-            "trending_courses": trending_courses
+            "featured_courses": sidebar.featured,
+            "trending_courses": sidebar.trending
         })
 
     # Create access token
@@ -1003,8 +1102,8 @@ async def register_ui(request: Request, response: Response):
 
     return templates.TemplateResponse("register.html", {
         "request": request,
-        "featured_courses": featured_courses,
-        "trending_courses": trending_courses
+        "featured_courses": sidebar.featured,
+        "trending_courses": sidebar.trending
     })
 @app.post("/settings/update_user", response_class=HTMLResponse)
 async def update_user_settings(
@@ -1024,8 +1123,8 @@ async def update_user_settings(
             "email": email,
             "full_name": full_name,
             "bio": bio,
-            "featured_courses": featured_courses,
-            "trending_courses": trending_courses
+            "featured_courses": sidebar.featured,
+            "trending_courses": sidebar.trending
         })
     # Get the current user from the cookie
     response = RedirectResponse(url="/settings", status_code=303)
@@ -1035,8 +1134,8 @@ async def update_user_settings(
         return templates.TemplateResponse("settings.html", {
             "request": request,
             "error": "You must be logged in to update settings",
-            "featured_courses": featured_courses,
-            "trending_courses": trending_courses
+            "featured_courses": sidebar.featured,
+            "trending_courses": sidebar.trending
         })
     # Prepare user data for update
     user_data = {
@@ -1076,8 +1175,8 @@ async def update_user_settings(
             "email": email,
             "full_name": full_name,
             "bio": bio,
-            "featured_courses": featured_courses,
-            "trending_courses": trending_courses
+            "featured_courses": sidebar.featured,
+            "trending_courses": sidebar.trending
         })
 
 @app.post("/register", response_class=HTMLResponse)
@@ -1100,8 +1199,8 @@ async def register_user(
             "username": username,
             "email": email,
             "full_name": full_name,
-            "featured_courses": featured_courses,
-            "trending_courses": trending_courses
+            "featured_courses": sidebar.featured,
+            "trending_courses": sidebar.trending
         })
 
     # Create user
@@ -1114,8 +1213,8 @@ async def register_user(
                 "error": "Username already exists",
                 "email": email,
                 "full_name": full_name,
-                "featured_courses": featured_courses,
-                "trending_courses": trending_courses
+                "featured_courses": sidebar.featured,
+                "trending_courses": sidebar.trending
             })
 
         # Prepare user data for creation
@@ -1155,112 +1254,222 @@ async def register_user(
             "username": username,
             "email": email,
             "full_name": full_name,
-            "featured_courses": featured_courses,
-            "trending_courses": trending_courses
+            "featured_courses": sidebar.featured,
+            "trending_courses": sidebar.trending
         })
 
 
 @app.get("/api/courses/{course_id}/overview")
-async def get_course_overview(course_id: int):
-    """Get a course overview with modules and lessons."""
-    # In a real implementation, this would fetch the course, modules, and lessons from a database
-    # For now, we'll return mock data
-
-    # Find the course in the featured_courses or trending_courses arrays
-    course = None
-    for c in featured_courses:
-        if c["id"] == course_id:
-            course = c
-            break
+async def get_course_overview(request: Request, response: Response, course_id: int, fields: Optional[str] = None):
+    """
+    Get a course with its ordered modules and lessons, without lesson content.
 
-    if not course:
-        for c in trending_courses:
-            if c["id"] == course_id:
-                course = c
-                break
+    `fields` selects what to return as comma-separated dotted paths, e.g.
+    `?fields=id,title,modules.title,modules.lessons.title`.
+    """
+    validators = version_validators(catalog_versions, f"overview:{course_id}?fields={fields}", course_id)
+    not_modified = conditional_response(request, response, validators)
+    if not_modified:
+        return not_modified
 
-    if not course:
+    overview = await course_overview_service.get_overview(course_id)
+    if overview is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Course not found",
         )
+    await trending_service.record_view(course_id)
 
-    # Generate sample modules and lessons for the course
-    modules = [
-        {
-            "id": 1,
-            "course_id": course_id,
-            "title": "Introduction to " + course["title"],
-            "description": "Get started with the basics of " + course["title"],
-            "order": 1,
-            "lessons": [
-                {
-                    "id": 1,
-                    "module_id": 1,
-                    "title": "Welcome to the Course",
-                    "description": "Introduction to the course",
-                    "content_type": ContentType.VIDEO,
-                    "content": "https://example.com/video1.mp4",
-                    "duration_minutes": 10,
-                    "order": 1,
-                    "is_free_preview": True
-                },
-                {
-                    "id": 2,
-                    "module_id": 1,
-                    "title": "Course Overview",
-                    "description": "Overview of what you'll learn",
-                    "content_type": ContentType.TEXT,
-                    "content": "This is the course overview text content.",
-                    "order": 2,
-                    "is_free_preview": True
-                }
-            ]
-        },
-        {
-            "id": 2,
-            "course_id": course_id,
-            "title": "Core Concepts",
-            "description": "Learn the fundamental concepts of " + course["title"],
-            "order": 2,
-            "lessons": [
-                {
-                    "id": 3,
-                    "module_id": 2,
-                    "title": "Key Principles",
-                    "description": "Understanding the key principles",
-                    "content_type": ContentType.VIDEO,
-                    "content": "https://example.com/video2.mp4",
-                    "duration_minutes": 15,
-                    "order": 1,
-                    "is_free_preview": False
-                },
-                {
-                    "id": 4,
-                    "module_id": 2,
-                    "title": "Practice Quiz",
-                    "description": "Test your knowledge",
-                    "content_type": ContentType.QUIZ,
-                    "content": "{'questions': [...]}",  # JSON string for quiz questions
-                    "order": 2,
-                    "is_free_preview": False
-                }
-            ]
-        }
-    ]
+    return FastJSONResponse(select_fields(overview, parse_fields(fields)), headers=response.headers)
 
-    # Add modules to the course
-    course_with_modules = course.copy()
-    course_with_modules["modules"] = modules
 
-    return course_with_modules
+@app.get("/api/trending-courses", response_model=List[Course])
+async def get_trending_courses(request: Request, response: Response, limit: int = 5):
+    """Get the most trending published courses, ranked by recent views and enrollments."""
+    validators = ranking_validators(catalog_versions, "trending-courses", trending_service.top_ids(limit))
+    not_modified = conditional_response(request, response, validators)
+    if not_modified:
+        return not_modified
+
+    courses = await course_service.list_courses(
+        limit=limit,
+        filters={"status": CourseStatus.PUBLISHED, "trending": True}
+    )
+    return FastJSONResponse([course.dict() for course in courses], headers=response.headers)
 
 
-@app.get("/api/trending-courses", response_model=List[Course])
-async def get_trending_courses():
-    """Get a list of trending courses."""
-    # Use the global trending_courses variable
-    return trending_courses
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Redis command counts, latencies and bytes of this process, in the Prometheus text format."""
+    if not redis_metrics.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Metrics are disabled",
+        )
+    return Response(redis_metrics.render([("main", redis_manager.circuit.is_open)]),
+                    media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/admin/analytics")
+async def get_analytics(request: Request, response: Response, metric: str = "enrollments", range: str = "24h",
+                        resolution: Optional[str] = None):
+    """
+    Get a time series of enrollments, payments, revenue or page_views.
+
+    `range` is e.g. "60m", "24h", "30d" or "12w"; the bucket size is per minute,
+    hour or day depending on the range, unless `resolution` asks for one.
+    """
+    user = await get_current_user_from_cookie(request, response)
+    if user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can view analytics",
+        )
+
+    range_seconds = parse_range(range)
+    bucket_size = get_resolution(resolution) if resolution else None
+    if range_seconds is None or (resolution and bucket_size is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid range or resolution",
+        )
+    series = analytics_service.series(metric, range_seconds, bucket_size)
+    if series is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown metric {metric!r} or too many buckets for range {range!r}",
+        )
+    series["range"] = range
+    return FastJSONResponse(series, headers=response.headers)
+
+
+def require_payments() -> None:
+    """Answer 503 when no payment gateway is configured (PAYMENT_GATEWAY is not set)."""
+    if not payment_service.available:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Payments are unavailable",
+        )
+
+
+class CheckoutRequest(BaseModel):
+    payment_method: PaymentMethod = PaymentMethod.CREDIT_CARD
+
+
+@app.post("/api/courses/{course_id}/checkout", status_code=status.HTTP_202_ACCEPTED)
+async def checkout(course_id: int, checkout_request: CheckoutRequest, request: Request, response: Response,
+                   idempotency_key: Optional[str] = Header(None)):
+    """
+    Start paying for a course. The charge runs in the background; poll the
+    returned `status_url`. Retrying with the same `Idempotency-Key` header
+    returns the same payment and job.
+    """
+    current_user = await get_current_user_from_cookie(request, response)
+    course = await course_service.get_course(course_id)
+    if course is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Course not found",
+        )
+    require_payments()
+
+    payment = await payment_service.create_payment({
+        "user_id": current_user.id,
+        "course_id": course_id,
+        "amount": course.price,
+        "payment_method": checkout_request.payment_method,
+    }, idempotency_key=idempotency_key)
+    job_id = payment_queue.enqueue(CHARGE, payment.id, current_user.id) if payment else None
+    if job_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Payments are unavailable, please try again",
+        )
+    return FastJSONResponse({
+        "payment_id": payment.id,
+        "job_id": job_id,
+        "status_url": f"/api/payments/jobs/{job_id}",
+    }, status_code=status.HTTP_202_ACCEPTED, headers=response.headers)
+
+
+@app.post("/api/payments/{payment_id}/refund", status_code=status.HTTP_202_ACCEPTED)
+async def queue_refund(payment_id: int, request: Request, response: Response):
+    """Queue the refund of a completed payment (requires admin role)."""
+    current_user = await get_current_user_from_cookie(request, response)
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can refund payments",
+        )
+    payment = await payment_service.get_payment(payment_id)
+    if payment is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Payment not found",
+        )
+    require_payments()
+    job_id = payment_queue.enqueue(REFUND, payment_id, payment.user_id)
+    if job_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Payments are unavailable, please try again",
+        )
+    return FastJSONResponse({"payment_id": payment_id, "job_id": job_id,
+                             "status_url": f"/api/payments/jobs/{job_id}"},
+                            status_code=status.HTTP_202_ACCEPTED, headers=response.headers)
+
+
+@app.get("/api/payments/jobs/{job_id}")
+async def get_payment_job(job_id: str, request: Request, response: Response):
+    """Poll a charge or refund: `queued`, `running`, `retrying`, `succeeded`, `failed` or `dead`."""
+    current_user = await get_current_user_from_cookie(request, response)
+    job = payment_queue.get_job(job_id)
+    if job is None or (current_user.role != UserRole.ADMIN and job["user_id"] != current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Payment job not found",
+        )
+    return FastJSONResponse(job, headers=response.headers)
+
+
+@app.get("/api/courses/{course_id}/roster")
+async def get_course_roster(course_id: int, request: Request, response: Response, skip: int = 0, limit: int = 100):
+    """Get a page of a course's enrolled students, oldest enrollment first (course instructor or admin)."""
+    current_user = await get_current_user_from_cookie(request, response)
+    course = await course_service.get_course(course_id)
+    if course is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Course not found",
+        )
+    if current_user.role != UserRole.ADMIN and current_user.id != course.instructor_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only the course instructor can see its students",
+        )
+    skip = max(skip, 0)
+    limit = min(max(limit, 1), ADMIN_PAGE_SIZE)
+
+    total = await enrollment_service.get_enrollment_count(course_id)
+    enrollments = await enrollment_service.get_course_enrollments(course_id, skip=skip, limit=limit)
+    students = await user_service.get_users([enrollment.user_id for enrollment in enrollments])
+    return FastJSONResponse({
+        "course_id": course_id,
+        "total": total,
+        "skip": skip,
+        "limit": limit,
+        "students": [
+            {
+                "enrollment_id": enrollment.id,
+                "user_id": enrollment.user_id,
+                "username": student.username if student else None,
+                "full_name": student.full_name if student else None,
+                "enrolled_at": enrollment.enrolled_at,
+                "status": enrollment.status,
+            }
+            for enrollment, student in zip(enrollments, students)
+        ],
+    }, headers=response.headers)
 
 
 @app.post("/courses/{course_id}/enroll")
@@ -1276,14 +1485,26 @@ async def enroll_in_course(course_id: int, request: Request, response: Response)
             detail="Course not found",
         )
 
-    # Check if the user is already enrolled
-    is_enrolled = await enrollment_service.is_user_enrolled(current_user.id, course_id)
-    if is_enrolled:
-        # If already enrolled, redirect to the session page
-        return RedirectResponse(url=f"/courses/{course_id}/session", status_code=303)
+    require_payment = ENROLLMENT_REQUIRES_PAYMENT and course.price > 0
+    if require_payment:
+        require_payments()
 
-    # Enroll the user
-    enrollment = await enrollment_service.enroll_user(current_user.id, course_id)
+    # Check payment and existing enrollment and enroll in one transaction
+    result = await enrollment_service.enroll_after_payment(current_user.id, course_id,
+                                                           require_payment=require_payment)
+    if result.status == PAYMENT_REQUIRED:
+        raise HTTPException(
+            status_code=status.HTTP_402_PAYMENT_REQUIRED,
+            detail=f"Please pay for this course before enrolling (POST /api/courses/{course_id}/checkout)",
+        )
+    if result.status == ENROLLMENT_FAILED:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Enrollment is unavailable, please try again",
+        )
+    if result.status == ENROLLED:
+        await trending_service.record_enrollment(course_id)
+        await analytics_service.record_enrollment()
 
     # Redirect to the session page
     return RedirectResponse(url=f"/courses/{course_id}/session", status_code=303)
@@ -1309,19 +1530,16 @@ async def move_courses_to_redis(current_user: User = Depends(get_current_user)):
             detail="Redis connection is not available",
         )
 
+    # Statuses of the courses being replaced, to keep the admin counters right
+    sample_courses = featured_courses + trending_courses
+    stored = redis_manager.hmget_docs([f"course:{course['id']}" for course in sample_courses], ["status"])
+
     # Store featured courses in Redis
     featured_courses_key = "featured_courses"
     for i, course in enumerate(featured_courses):
-        # Convert datetime objects to strings for JSON serialization
-        course_copy = course.copy()
-        course_copy["created_at"] = course_copy["created_at"].isoformat()
-        course_copy["updated_at"] = course_copy["updated_at"].isoformat()
-        if course_copy["start_date"]:
-            course_copy["start_date"] = course_copy["start_date"].isoformat()
-
         # Store individual course
         course_key = f"course:{course['id']}"
-        redis_manager.set(course_key, json.dumps(course_copy))
+        redis_manager.set_doc(course_key, course)
 
         # Add to featured courses set
         redis_manager.sadd(featured_courses_key, course['id'])
@@ -1329,24 +1547,26 @@ async def move_courses_to_redis(current_user: User = Depends(get_current_user)):
     # Store trending courses in Redis
     trending_courses_key = "trending_courses"
     for i, course in enumerate(trending_courses):
-        # Convert datetime objects to strings for JSON serialization
-        course_copy = course.copy()
-        course_copy["created_at"] = course_copy["created_at"].isoformat()
-        course_copy["updated_at"] = course_copy["updated_at"].isoformat()
-        if course_copy["start_date"]:
-            course_copy["start_date"] = course_copy["start_date"].isoformat()
-
         # Store individual course
         course_key = f"course:{course['id']}"
-        redis_manager.set(course_key, json.dumps(course_copy))
+        redis_manager.set_doc(course_key, course)
 
         # Add to trending courses set
         redis_manager.sadd(trending_courses_key, course['id'])
 
     # Store all course IDs in a set
     all_courses_key = "all_courses"
-    all_course_ids = [course["id"] for course in featured_courses + trending_courses]
+    all_course_ids = [course["id"] for course in sample_courses]
     redis_manager.sadd(all_courses_key, *all_course_ids)
+    catalog_versions.bump(*all_course_ids)
+    changes = {}
+    for course, previous in zip(sample_courses, stored):
+        previous_status = previous.get("status", CourseStatus.PENDING) if previous is not None else None
+        for field, delta in course_changes(previous_status, course["status"]).items():
+            changes[field] = changes.get(field, 0) + delta
+    admin_stats.apply(changes)
+    # Show the moved courses in this worker's sidebars now rather than at the next refresh
+    await sidebar.refresh()
 
     return JSONResponse(content={
         "status": "success",
@@ -1401,6 +1621,62 @@ async def create_sample_courses_endpoint(current_user: User = Depends(get_curren
     })
 
 
+@app.post("/admin/catalog/import")
+async def import_catalog(request: Request, current_user: User = Depends(get_current_user)):
+    """
+    Bulk import courses with their modules and lessons from an NDJSON request body.
+    Each line is one course object; see CatalogImportService for the format.
+    """
+    # Check if user is an admin
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can perform this operation",
+        )
+
+    # Check if Redis is connected
+    if not redis_manager.is_connected():
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Redis connection is not available",
+        )
+
+    report = await catalog_import_service.import_ndjson(iter_ndjson_lines(request.stream()))
+    return JSONResponse(content={
+        "status": "success" if not report.errors else "partial",
+        "message": f"Imported {report.courses} courses from {report.lines} lines",
+        "details": report.dict()
+    })
+
+
+@app.get("/admin/catalog/export")
+async def export_catalog(sections: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    """
+    Stream courses (with modules and lessons), users and enrollments as NDJSON.
+    `sections` optionally limits the export, e.g. `?sections=courses,users`.
+    """
+    # Check if user is an admin
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can perform this operation",
+        )
+
+    # Check if Redis is connected
+    if not redis_manager.is_connected():
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Redis connection is not available",
+        )
+
+    section_list = [s.strip() for s in sections.split(",") if s.strip()] if sections else None
+    return StreamingResponse(
+        catalog_export_service.iter_ndjson(section_list),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="catalog.ndjson"'}
+    )
+
+
 @app.get("/my-courses", response_class=HTMLResponse)
 async def my_courses(request: Request, response: Response):
     """Show the current user's enrolled courses."""
@@ -1599,7 +1875,8 @@ async def edit_course_form(course_id: int, request: Request, response: Response)
             modules_dict = [module.dict() for module in modules]
             # Get lessons for each module
             for module in modules_dict:
-                lessons = await content_service.get_lessons_by_module_id(module["id"])
+                # The form posts every lesson's content back, so it must show the current bodies
+                lessons = await content_service.get_lessons_by_module_id(module["id"], with_content=True)
                 if lessons:
                     module["lessons"] = [lesson.dict() for lesson in lessons]
                 else:
@@ -1716,9 +1993,6 @@ async def create_course_submit(
         lesson_durations = form.getlist("lesson_durations[]")
         lesson_free_previews = form.getlist("lesson_free_previews[]")
 
-        # Initialize content service
-        content_service = ContentService()
-
         # If this is an update and no module data was submitted, preserve existing modules and lessons
         if course_id and not module_titles:
             print(f"No module data submitted for course {course_id}, preserving existing modules and lessons")
@@ -1888,25 +2162,8 @@ async def create_lesson(
             "topics": topics
         }
 
-        # Save lesson to Redis
-        lesson_id = int(datetime.now().timestamp())  # Generate a unique ID
-        lesson_key = f"lesson:{lesson_id}"
-
-        # Convert datetime objects to strings for JSON serialization
-        lesson_data_copy = lesson_data.copy()
-        lesson_data_copy["created_at"] = lesson_data_copy["created_at"].isoformat()
-        lesson_data_copy["updated_at"] = lesson_data_copy["updated_at"].isoformat()
-
-        # Store lesson in Redis
-        redis_manager.set(lesson_key, json.dumps(lesson_data_copy))
-
-        # Add lesson ID to module's lessons set
-        module_lessons_key = f"module:{module_id}:lessons"
-        redis_manager.sadd(module_lessons_key, lesson_id)
-
-        # Add lesson ID to instructor's lessons set
-        instructor_lessons_key = f"instructor:{user.id}:lessons"
-        redis_manager.sadd(instructor_lessons_key, lesson_id)
+        # Save the lesson and its index entries in one MULTI/EXEC
+        await content_service.create_lesson(lesson_data, instructor_id=user.id)
 
         # Redirect to my lessons page
         return RedirectResponse(url="/my-lessons", status_code=303)
@@ -1996,16 +2253,15 @@ async def admin_overview(request: Request, response: Response):
         if user.role != UserRole.ADMIN:
             return RedirectResponse(url="/", status_code=303)
 
-        # Get statistics
-        users = await user_service.list_users()
-        courses = await course_service.list_courses()
+        # Get statistics from the maintained counters
+        stats = admin_stats.get()
 
         return templates.TemplateResponse("admin.html", {
             "request": request,
             "user": user,
             "active_section": "overview",
-            "total_users": len(users),
-            "total_courses": len(courses),
+            "total_users": stats.get(users_field(), 0),
+            "total_courses": stats.get(courses_field(), 0),
             "featured_courses": [],
             "trending_courses": []
         })
@@ -2025,23 +2281,19 @@ async def admin_users(request: Request, response: Response):
         if user.role != UserRole.ADMIN:
             return RedirectResponse(url="/", status_code=303)
 
-        # Get users
-        users = await user_service.list_users()
-
-        # Count users by role
-        student_count = sum(1 for u in users if u.role == UserRole.STUDENT)
-        instructor_count = sum(1 for u in users if u.role == UserRole.INSTRUCTOR)
-        admin_count = sum(1 for u in users if u.role == UserRole.ADMIN)
+        # Get the first page of users; the counts come from the maintained counters
+        users = await user_service.list_users(limit=ADMIN_PAGE_SIZE)
+        stats = admin_stats.get()
 
         return templates.TemplateResponse("admin.html", {
             "request": request,
             "user": user,
             "active_section": "users",
             "users": users,
-            "total_users": len(users),
-            "student_count": student_count,
-            "instructor_count": instructor_count,
-            "admin_count": admin_count,
+            "total_users": stats.get(users_field(), 0),
+            "student_count": stats.get(users_field(UserRole.STUDENT), 0),
+            "instructor_count": stats.get(users_field(UserRole.INSTRUCTOR), 0),
+            "admin_count": stats.get(users_field(UserRole.ADMIN), 0),
             "featured_courses": [],
             "trending_courses": []
         })
@@ -2061,16 +2313,16 @@ async def admin_courses(request: Request, response: Response):
         if user.role != UserRole.ADMIN:
             return RedirectResponse(url="/", status_code=303)
 
-        # Get courses
-        courses = await course_service.list_courses(filters={})
-
-        # Count courses by status
-        published_courses = sum(1 for c in courses if c.status == CourseStatus.PUBLISHED)
-        pending_courses = sum(1 for c in courses if c.status == CourseStatus.PENDING)
+        # Get the first page of courses; the counts come from the maintained counters
+        courses = await course_service.list_courses(limit=ADMIN_PAGE_SIZE, filters={})
+        stats = admin_stats.get()
 
-        # Get instructor names for courses
+        # Get instructor names for courses, looking each instructor up once by ID
+        instructors = {}
+        for instructor_id in {course.instructor_id for course in courses}:
+            instructors[instructor_id] = await user_service.get_user(instructor_id)
         for course in courses:
-            instructor = await user_service.get_user(course.instructor_id)
+            instructor = instructors[course.instructor_id]
             course.instructor_name = instructor.full_name if instructor else "Unknown"
 
         return templates.TemplateResponse("admin.html", {
@@ -2078,9 +2330,9 @@ async def admin_courses(request: Request, response: Response):
             "user": user,
             "active_section": "courses",
             "courses": courses,
-            "total_courses": len(courses),
-            "published_courses": published_courses,
-            "pending_courses": pending_courses,
+            "total_courses": stats.get(courses_field(), 0),
+            "published_courses": stats.get(courses_field(CourseStatus.PUBLISHED), 0),
+            "pending_courses": stats.get(courses_field(CourseStatus.PENDING), 0),
             "featured_courses": [],
             "trending_courses": []
         })
@@ -0,0 +1,54 @@
+import argparse
+from services.redis_manager import RedisManager
+from services.codec import CODECS, DOCUMENT_PATTERNS
+
+def migrate_codec(codec_name, storage=None, batch_size=500, host=None, port=None, password=None):
+    """
+    Rewrite all stored documents in the given format and storage mode.
+
+    Reads understand every format version and both storage modes, so this can
+    run while the app is serving traffic; run it after changing REDIS_CODEC or
+    REDIS_DOCUMENT_STORAGE so old documents get the new format too.
+
+    Args:
+        codec_name (str): Target format, "json" or "compact"
+        storage (str, optional): Target storage mode, "string" or "hash" (default: from env or string)
+        batch_size (int): Number of keys rewritten per transaction
+        host (str, optional): Redis host address
+        port (int, optional): Redis port
+        password (str, optional): Redis password
+    """
+    redis_manager = RedisManager(host=host, port=port, password=password, codec=codec_name, storage=storage)
+    if not redis_manager.get_client():
+        print("Failed to connect to Redis. Exiting.")
+        return
+
+    storage_name = "hash" if redis_manager.hash_documents else "string"
+    print(f"Migrating documents matching {', '.join(DOCUMENT_PATTERNS)} to {codec_name} ({storage_name} storage)...")
+    counts = redis_manager.migrate_documents(batch_size=batch_size)
+
+    print("\nMigration complete!")
+    print(f"Documents scanned: {counts['scanned']}")
+    print(f"Documents rewritten: {counts['migrated']}")
+
+if __name__ == "__main__":
+    # Set up command line arguments
+    parser = argparse.ArgumentParser(description='Rewrite stored documents in another format or storage mode')
+    parser.add_argument('codec', choices=sorted(CODECS), help='Target document format')
+    parser.add_argument('--storage', choices=['string', 'hash'],
+                        help='Target storage mode for courses, modules and lessons (default: from env or string)')
+    parser.add_argument('--batch-size', type=int, default=500, help='Keys per transaction (default: 500)')
+    parser.add_argument('--host', help='Redis host address (default: from env or localhost)')
+    parser.add_argument('--port', type=int, help='Redis port (default: from env or 14345)')
+    parser.add_argument('--password', help='Redis password (default: from env)')
+
+    args = parser.parse_args()
+
+    migrate_codec(
+        args.codec,
+        storage=args.storage,
+        batch_size=args.batch_size,
+        host=args.host,
+        port=args.port,
+        password=args.password
+    )
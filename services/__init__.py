@@ -1,30 +1,62 @@
-from .user import User, UserRole, UserService
-from .course import Course, CourseLevel, CourseStatus, CourseService
-from .content import Module, Lesson, ContentType, ContentService
-from .enrollment import Enrollment, EnrollmentStatus, EnrollmentService
-from .progress import LessonProgress, ModuleProgress, CourseProgress, ProgressStatus, ProgressService
-from .auth import Token, TokenData, Permission, TokenType, AuthService
-from .payment import Payment, PaymentStatus, PaymentMethod, PaymentService
+"""
+The platform's models and services.
 
-# Export all services for easy access
-__all__ = [
+Names are imported from their modules on first use, so importing one
+module (e.g. `services.redis_manager` in a script or worker) does not pay
+for importing every service and its dependencies.
+"""
+import importlib
+
+# Name -> module it is defined in
+_EXPORTS = {
     # Models
-    'User', 'UserRole',
-    'Course', 'CourseLevel', 'CourseStatus',
-    'Module', 'Lesson', 'ContentType',
-    'Enrollment', 'EnrollmentStatus',
-    'LessonProgress', 'ModuleProgress', 'CourseProgress', 'ProgressStatus',
-    'Token', 'TokenData', 'Permission', 'TokenType',
-    'Payment', 'PaymentStatus', 'PaymentMethod',
+    'User': 'user', 'UserRole': 'user',
+    'Course': 'course', 'CourseCard': 'course', 'CourseLevel': 'course', 'CourseStatus': 'course',
+    'Module': 'content', 'Lesson': 'content', 'ContentType': 'content', 'LessonNavigation': 'content',
+    'Enrollment': 'enrollment', 'EnrollmentStatus': 'enrollment',
+    'LessonProgress': 'progress', 'ModuleProgress': 'progress', 'CourseProgress': 'progress',
+    'ProgressStatus': 'progress',
+    'Token': 'auth', 'TokenData': 'auth', 'Permission': 'auth', 'TokenType': 'auth',
+    'Payment': 'payment', 'PaymentStatus': 'payment', 'PaymentMethod': 'payment',
+    'ImportReport': 'catalog_import',
 
     # Services
-    'UserService',
-    'CourseService',
-    'ContentService',
-    'EnrollmentService',
-    'ProgressService',
-    'AuthService',
-    'PaymentService',
-]
+    'UserService': 'user',
+    'CourseService': 'course',
+    'ContentService': 'content',
+    'EnrollmentService': 'enrollment',
+    'EnrollmentExpirySweeper': 'enrollment_expiry',
+    'ProgressService': 'progress',
+    'AuthService': 'auth',
+    'PaymentService': 'payment',
+    'PaymentGateway': 'payment_gateway',
+    'FakePaymentGateway': 'payment_gateway',
+    'GatewayError': 'payment_gateway',
+    'GatewayResult': 'payment_gateway',
+    'PaymentQueue': 'payment_queue',
+    'IdAllocator': 'id_allocator',
+    'CatalogImportService': 'catalog_import',
+    'CatalogExportService': 'catalog_export',
+    'CatalogVersions': 'catalog_version',
+    'CourseOverviewService': 'course_overview',
+    'TrendingService': 'trending',
+    'SidebarSnapshot': 'sidebar',
+    'AdminStats': 'admin_stats',
+    'AnalyticsService': 'analytics',
+}
+
+# Export all services for easy access
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value
+    return value
 
 
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,141 @@
+from typing import Any, Dict, Optional
+
+# One hash of counters, so the admin dashboard reads every statistic with one HGETALL
+STATS_KEY = "admin_stats"
+# Set once the counters cover the users and courses stored before counting began
+COUNTED_FIELD = "counted"
+
+
+def _value(value: Any) -> str:
+    return getattr(value, "value", value)
+
+
+def users_field(role: Any = None) -> str:
+    """Counter of all users, or of the users with a role."""
+    return "users" if role is None else f"users:{_value(role)}"
+
+
+def courses_field(status: Any = None) -> str:
+    """Counter of all courses, or of the courses with a status."""
+    return "courses" if status is None else f"courses:{_value(status)}"
+
+
+def _changes(field, before: Any, after: Any) -> Dict[str, int]:
+    changes: Dict[str, int] = {}
+    if before is not None and after is not None and _value(before) == _value(after):
+        return changes
+    if before is not None:
+        changes[field()] = changes.get(field(), 0) - 1
+        changes[field(before)] = -1
+    if after is not None:
+        changes[field()] = changes.get(field(), 0) + 1
+        changes[field(after)] = 1
+    return {key: delta for key, delta in changes.items() if delta}
+
+
+def user_changes(before_role: Any, after_role: Any) -> Dict[str, int]:
+    """
+    Counter changes for a user whose role went from before_role to after_role.
+    None before means the user was created, None after that it was deleted.
+    """
+    return _changes(users_field, before_role, after_role)
+
+
+def course_changes(before_status: Any, after_status: Any) -> Dict[str, int]:
+    """Counter changes for a course whose status went from before_status to after_status."""
+    return _changes(courses_field, before_status, after_status)
+
+
+def queue_counter_changes(pipe, changes: Dict[str, int]) -> None:
+    """Queue HINCRBYs applying counter changes on a pipeline."""
+    for field, delta in changes.items():
+        pipe.hincrby(STATS_KEY, field, delta)
+
+
+class AdminStats:
+    """
+    User and course totals, per role and per status, for the admin dashboard.
+
+    The counters are kept with HINCRBY by every write that creates, deletes
+    or re-roles a user or re-statuses a course, so reading them is constant
+    time however many users and courses there are. What was stored before
+    counting began is counted once, at startup (see count_existing).
+    """
+
+    def __init__(self, redis_manager):
+        self.redis_manager = redis_manager
+
+    def apply(self, changes: Dict[str, int]) -> bool:
+        """Apply counter changes. Returns False if they could not be written."""
+        if not changes:
+            return True
+        pipe = self.redis_manager.pipeline(transaction=False) if self.redis_manager else None
+        if pipe is None:
+            return False
+        queue_counter_changes(pipe, changes)
+        return self.redis_manager.execute(pipe) is not None
+
+    def get(self) -> Dict[str, int]:
+        """All counters by field name; missing counters are zero, so use .get(field, 0)."""
+        client = self.redis_manager.get_client() if self.redis_manager else None
+        if client is None:
+            return {}
+        try:
+            stats = client.hgetall(STATS_KEY)
+        except Exception as e:
+            print(f"Error getting admin statistics from Redis: {e}")
+            return {}
+        return {field: int(value) for field, value in stats.items() if field != COUNTED_FIELD}
+
+    async def count_existing(self) -> Optional[Dict[str, int]]:
+        """
+        Count the users and courses stored before counting began. Run at
+        startup; once it has completed, the marker field makes it a single
+        HEXISTS. Returns the counts, or None if nothing was recounted.
+        """
+        client = self.redis_manager.get_client() if self.redis_manager else None
+        if client is None:
+            return None
+        try:
+            if client.hexists(STATS_KEY, COUNTED_FIELD):
+                return None
+        except Exception as e:
+            print(f"Error getting admin statistics from Redis: {e}")
+            return None
+        return self.recount()
+
+    def _count(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {users_field(): 0, courses_field(): 0}
+
+        for usernames in self.redis_manager.sscan("users", count=500):
+            for user in self.redis_manager.mget_docs([f"user:{username}" for username in usernames]):
+                if user:
+                    for field, delta in user_changes(None, user.get("role", "student")).items():
+                        counts[field] = counts.get(field, 0) + delta
+
+        for course_ids in self.redis_manager.sscan("all_courses", count=500):
+            keys = [f"course:{course_id}" for course_id in course_ids]
+            for course in self.redis_manager.hmget_docs(keys, ["status"]):
+                if course:
+                    for field, delta in course_changes(None, course.get("status", "pending")).items():
+                        counts[field] = counts.get(field, 0) + delta
+        return counts
+
+    def recount(self) -> Optional[Dict[str, int]]:
+        """
+        Recount every stored user and course and set the counters and the
+        marker in one MULTI.
+
+        Takes time proportional to the number of users and courses. The
+        counters hash is watched while counting, so a write that changes a
+        counter meanwhile makes it count again instead of being lost.
+        """
+        def write(pipe):
+            counts = self._count()
+            # Zero the counters of roles or statuses nothing has any more, rather than delete the hash
+            stale = {field: 0 for field in pipe.hkeys(STATS_KEY) if field != COUNTED_FIELD}
+            pipe.multi()
+            pipe.hset(STATS_KEY, mapping={**stale, **counts, COUNTED_FIELD: 1})
+            return counts
+
+        return self.redis_manager.transaction(write, STATS_KEY, value_from_callable=True)
@@ -0,0 +1,170 @@
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional
+
+ANALYTICS_KEY_PREFIX = "analytics"
+
+ENROLLMENTS = "enrollments"
+PAYMENTS = "payments"
+REVENUE = "revenue"
+PAGE_VIEWS = "page_views"
+METRICS = (ENROLLMENTS, PAYMENTS, REVENUE, PAGE_VIEWS)
+
+MINUTE = 60
+HOUR = 3600
+DAY = 86400
+
+
+class Resolution(NamedTuple):
+    """A bucket size, how long its buckets are kept, and how many seconds of buckets share one hash."""
+    name: str
+    seconds: int
+    retention: int
+    chunk: int
+
+
+# Finest first. Every event is counted at every resolution, so finer buckets
+# can expire early while coarser ones keep the long-range history.
+RESOLUTIONS = (
+    Resolution("minute", MINUTE, 2 * DAY, HOUR),
+    Resolution("hour", HOUR, 90 * DAY, DAY),
+    Resolution("day", DAY, 3 * 365 * DAY, 30 * DAY),
+)
+
+# Most points a series may have before a coarser resolution is used
+MAX_POINTS = 1440
+
+RANGE_PATTERN = re.compile(r"^\s*(\d+)\s*([mhdw])\s*$")
+RANGE_UNITS = {"m": MINUTE, "h": HOUR, "d": DAY, "w": 7 * DAY}
+
+
+def parse_range(text: Optional[str]) -> Optional[int]:
+    """Parse a range such as "90m", "24h", "30d" or "12w" into seconds; None if invalid."""
+    match = RANGE_PATTERN.match(text or "")
+    if not match or int(match.group(1)) == 0:
+        return None
+    return int(match.group(1)) * RANGE_UNITS[match.group(2)]
+
+
+def _number(value: str) -> float:
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def get_resolution(name: str) -> Optional[Resolution]:
+    return next((resolution for resolution in RESOLUTIONS if resolution.name == name), None)
+
+
+def choose_resolution(range_seconds: int) -> Optional[Resolution]:
+    """The finest resolution that still covers the range with at most MAX_POINTS buckets."""
+    for resolution in RESOLUTIONS:
+        if range_seconds <= resolution.retention and range_seconds / resolution.seconds <= MAX_POINTS:
+            return resolution
+    return None
+
+
+class AnalyticsService:
+    """
+    Activity over time as per-minute, per-hour and per-day counters.
+
+    Each event increments its bucket at every resolution with one pipelined
+    HINCRBY per resolution. Buckets are fields of a hash that holds one chunk
+    of time (an hour of minutes, a day of hours, 30 days of days) and expires
+    with the resolution's retention, so old minute buckets disappear while the
+    hour and day buckets keep the history: the downsampling is done when
+    counting rather than by a rollup job.
+
+    Reading a series is one HMGET per chunk it spans, in one pipeline, and
+    never touches enrollment or payment documents.
+    """
+
+    def __init__(self, redis_manager=None):
+        self.redis_manager = redis_manager
+
+    @staticmethod
+    def _chunk_key(metric: str, resolution: Resolution, bucket: int) -> str:
+        chunk_start = bucket - bucket % resolution.chunk
+        return f"{ANALYTICS_KEY_PREFIX}:{metric}:{resolution.name}:{chunk_start}"
+
+    def _queue(self, pipe, metric: str, amount: float, now: float) -> None:
+        for resolution in RESOLUTIONS:
+            bucket = int(now // resolution.seconds) * resolution.seconds
+            key = self._chunk_key(metric, resolution, bucket)
+            if isinstance(amount, int):
+                pipe.hincrby(key, bucket, amount)
+            else:
+                pipe.hincrbyfloat(key, bucket, amount)
+            chunk_end = bucket - bucket % resolution.chunk + resolution.chunk
+            pipe.expireat(key, chunk_end + resolution.retention)
+
+    def record(self, metric: str, amount: float = 1, now: Optional[float] = None, **amounts: float) -> bool:
+        """
+        Count an event, or add an amount such as revenue, at the current time.
+        Other metrics changed by the same event can be given as keyword amounts.
+        """
+        amounts = {metric: amount, **amounts}
+        if self.redis_manager is None or any(name not in METRICS for name in amounts):
+            return False
+        pipe = self.redis_manager.pipeline(transaction=False)
+        if pipe is None:
+            return False
+        now = time.time() if now is None else now
+        for name, value in amounts.items():
+            self._queue(pipe, name, value, now)
+        return self.redis_manager.execute(pipe) is not None
+
+    async def record_enrollment(self) -> bool:
+        return self.record(ENROLLMENTS)
+
+    async def record_payment(self, amount: float) -> bool:
+        """Count a completed payment and add its amount to revenue."""
+        return self.record(PAYMENTS, revenue=float(amount))
+
+    async def record_page_view(self) -> bool:
+        return self.record(PAGE_VIEWS)
+
+    def series(self, metric: str, range_seconds: int, resolution: Optional[Resolution] = None,
+               now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        The buckets of a metric over the last range_seconds, oldest first.
+
+        Returns None for an unknown metric or a range no resolution can serve.
+        """
+        if metric not in METRICS or range_seconds <= 0:
+            return None
+        resolution = resolution or choose_resolution(range_seconds)
+        if resolution is None or range_seconds / resolution.seconds > MAX_POINTS:
+            return None
+
+        now = time.time() if now is None else now
+        last = int(now // resolution.seconds) * resolution.seconds
+        count = max(1, math.ceil(range_seconds / resolution.seconds))
+        buckets = [last - i * resolution.seconds for i in range(count - 1, -1, -1)]
+
+        chunks: "OrderedDict[str, List[int]]" = OrderedDict()
+        for bucket in buckets:
+            chunks.setdefault(self._chunk_key(metric, resolution, bucket), []).append(bucket)
+
+        values: Dict[int, float] = {}
+        pipe = self.redis_manager.pipeline(transaction=False) if self.redis_manager else None
+        if pipe is not None:
+            for key, chunk_buckets in chunks.items():
+                pipe.hmget(key, chunk_buckets)
+            results = self.redis_manager.execute(pipe) or []
+            for chunk_buckets, chunk_values in zip(chunks.values(), results):
+                for bucket, value in zip(chunk_buckets, chunk_values):
+                    if value is not None:
+                        values[bucket] = _number(value)
+
+        points = [{"t": bucket, "value": values.get(bucket, 0)} for bucket in buckets]
+        return {
+            "metric": metric,
+            "resolution": resolution.name,
+            "step": resolution.seconds,
+            "start": buckets[0],
+            "end": last + resolution.seconds,
+            "total": sum(point["value"] for point in points),
+            "points": points,
+        }
@@ -40,12 +40,23 @@ class Permission(str, Enum):
 class AuthService:
     """Service for authentication and authorization in the online course platform."""
 
+    def __init__(self, user_service=None):
+        """
+        Initialize the AuthService. Without a user service, one with its own
+        Redis connection is created the first time a user is looked up.
+        """
+        self.user_service = user_service
+
+    def _user_service(self):
+        if self.user_service is None:
+            from services.user import UserService
+            self.user_service = UserService()
+        return self.user_service
+
     async def authenticate_user(self, username: str, password: str) -> Optional[Dict[str, Any]]:
         """Authenticate a user with username and password."""
-        from services.user import UserService
-
         # Get the user service
-        user_service = UserService()
+        user_service = self._user_service()
 
         # Get the user by username
         user = await user_service.get_user_by_username(username)
@@ -113,7 +124,7 @@ class AuthService:
         Extract username from token and return user data without token verification.
         This modified implementation skips token verification and directly uses username from Redis.
         """
-        from services.user import UserService, UserRole
+        from services.user import UserRole
 
         # Remove 'Bearer ' prefix if present
         if token.startswith("Bearer "):
@@ -137,8 +148,7 @@ class AuthService:
                 username = parts[0]
 
                 # Get user from Redis
-                user_service = UserService()
-                user = await user_service.get_user_by_username(username)
+                user = await self._user_service().get_user_by_username(username)
 
                 if user:
                     # Return TokenData with user information
@@ -170,10 +180,8 @@ class AuthService:
 
     async def change_password(self, user_id: int, old_password: str, new_password: str) -> bool:
         """Change a user's password."""
-        from services.user import UserService
-
         # Get the user service
-        user_service = UserService()
+        user_service = self._user_service()
 
         # Get the user by ID
         user = await user_service.get_user(user_id)
@@ -206,14 +214,12 @@ class AuthService:
 
     async def reset_password(self, token: str, new_password: str) -> bool:
         """Reset a user's password using a reset token."""
-        from services.user import UserService
-
         # In a real implementation, this would verify the token and get the username
         # For this implementation, we'll assume the token is the username for simplicity
         username = token
 
         # Get the user service
-        user_service = UserService()
+        user_service = self._user_service()
 
         # Get the user by username
         user = await user_service.get_user_by_username(username)
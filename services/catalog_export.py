@@ -0,0 +1,99 @@
+import json
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from services.codec import body_key, json_default
+
+# Fields that must never leave the server, even if an old user document still has them
+PRIVATE_USER_FIELDS = {"password", "hashed_password", "password_hash"}
+
+EXPORT_SECTIONS = ("courses", "users", "enrollments")
+
+
+class CatalogExportService:
+    """
+    Streaming NDJSON export of the catalog, users and enrollments.
+
+    Sets are walked with SSCAN and documents fetched with one MGET or
+    pipeline per batch, so memory stays bounded by the batch size rather
+    than the size of the dataset. Course lines carry their modules and
+    lessons nested, in the format CatalogImportService reads back:
+
+        {"type": "course", ..., "modules": [{..., "lessons": [...]}]}
+        {"type": "user", ...}
+        {"type": "enrollment", ...}
+    """
+
+    def __init__(self, redis_manager, batch_size: int = 100):
+        self.redis_manager = redis_manager
+        self.batch_size = batch_size
+
+    def iter_ndjson(self, sections: Optional[Iterable[str]] = None) -> Iterator[str]:
+        """Yield the export line by line, each ending with a newline."""
+        sections = list(sections or EXPORT_SECTIONS)
+        for section in EXPORT_SECTIONS:
+            if section not in sections:
+                continue
+            records = getattr(self, f"iter_{section}")()
+            for record in records:
+                yield json.dumps(record, default=json_default) + "\n"
+
+    def _load_docs(self, keys: List[str]) -> List[Dict[str, Any]]:
+        """MGET a batch of documents, skipping missing or corrupt ones."""
+        return [doc for doc in self.redis_manager.mget_docs(keys) if doc]
+
+    def _zrange_many(self, keys: List[str]) -> List[List[str]]:
+        """ZRANGE several sorted-set indexes in one pipeline."""
+        pipe = self.redis_manager.pipeline(transaction=False)
+        if pipe is None:
+            return [[] for _ in keys]
+        for key in keys:
+            pipe.zrange(key, 0, -1)
+        results = self.redis_manager.execute(pipe)
+        return results if results is not None else [[] for _ in keys]
+
+    def _load_lesson_contents(self, lessons: List[Dict[str, Any]]) -> None:
+        """Fill in the content of lessons that keep it under its own key, with one MGET."""
+        missing = [lesson for lesson in lessons if "content" not in lesson]
+        if not missing:
+            return
+        keys = [body_key(f"lesson:{lesson['id']}", "content") for lesson in missing]
+        for lesson, content in zip(missing, self.redis_manager.mget_bodies(keys)):
+            lesson["content"] = content or ""
+
+    def iter_courses(self) -> Iterator[Dict[str, Any]]:
+        """Yield every course with its ordered modules and lessons."""
+        for course_ids in self.redis_manager.sscan("all_courses", count=self.batch_size):
+            courses = self._load_docs([f"course:{course_id}" for course_id in course_ids])
+
+            module_id_lists = self._zrange_many([f"course:{c['id']}:modules" for c in courses])
+            modules = self._load_docs([f"module:{module_id}" for ids in module_id_lists for module_id in ids])
+
+            lesson_id_lists = self._zrange_many([f"module:{m['id']}:lessons" for m in modules])
+            lessons = self._load_docs([f"lesson:{lesson_id}" for ids in lesson_id_lists for lesson_id in ids])
+            self._load_lesson_contents(lessons)
+
+            lessons_by_module: Dict[Any, List[Dict[str, Any]]] = {}
+            for lesson in lessons:
+                lessons_by_module.setdefault(lesson["module_id"], []).append(lesson)
+            modules_by_course: Dict[Any, List[Dict[str, Any]]] = {}
+            for module in modules:
+                module["lessons"] = lessons_by_module.get(module["id"], [])
+                modules_by_course.setdefault(module["course_id"], []).append(module)
+
+            for course in courses:
+                yield {"type": "course", **course, "modules": modules_by_course.get(course["id"], [])}
+
+    def iter_users(self) -> Iterator[Dict[str, Any]]:
+        """Yield every user profile without password data."""
+        for usernames in self.redis_manager.sscan("users", count=self.batch_size):
+            for user in self._load_docs([f"user:{username}" for username in usernames]):
+                yield {"type": "user", **{k: v for k, v in user.items() if k not in PRIVATE_USER_FIELDS}}
+
+    def iter_enrollments(self) -> Iterator[Dict[str, Any]]:
+        """Yield every enrollment, course by course."""
+        for course_ids in self.redis_manager.sscan("all_courses", count=self.batch_size):
+            for course_id in course_ids:
+                for enrollment_ids in self.redis_manager.sscan(f"course:{course_id}:enrollments",
+                                                               count=self.batch_size):
+                    for enrollment in self._load_docs([f"enrollment:{i}" for i in enrollment_ids]):
+                        yield {"type": "enrollment", **enrollment}
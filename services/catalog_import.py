@@ -0,0 +1,239 @@
+import codecs
+import json
+from typing import Any, AsyncIterable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from pydantic import BaseModel, ValidationError
+
+from services.admin_stats import course_changes, queue_counter_changes
+from services.catalog_version import queue_version_bump
+from services.codec import body_key
+from services.content import ContentService, Lesson, Module
+from services.course import Course, CourseStatus
+from services.id_allocator import IdAllocator
+
+
+class ImportReport(BaseModel):
+    """Running totals of a catalog import."""
+    lines: int = 0
+    courses: int = 0
+    modules: int = 0
+    lessons: int = 0
+    skipped: int = 0
+    errors: List[Dict[str, Any]] = []
+
+
+# A validated course with its modules, each with its lessons, plus the NDJSON line it came from
+CourseRecord = Tuple[int, Course, List[Tuple[Module, List[Lesson]]]]
+
+
+async def iter_ndjson_lines(chunks: AsyncIterable[bytes]) -> AsyncIterable[str]:
+    """Split a stream of UTF-8 byte chunks, e.g. a request body, into lines."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+class CatalogImportService:
+    """
+    Bulk import of courses, modules and lessons from NDJSON.
+
+    Every line is one course object with its modules nested under "modules"
+    and their lessons under "lessons", the same shape the admin export writes:
+
+        {"type": "course", "title": ..., "modules": [{"title": ..., "lessons": [...]}]}
+
+    Lines are validated in batches, missing IDs are leased in one block per
+    kind and batch, and each batch is written with a single pipeline instead
+    of one round-trip per object. A course with any invalid module or lesson
+    is rejected as a whole and reported with its line number.
+    """
+
+    def __init__(self, redis_manager=None, id_allocator=None, batch_size: int = 100):
+        self.redis_manager = redis_manager
+        self.id_allocator = id_allocator or IdAllocator(redis_manager)
+        self.batch_size = batch_size
+
+    async def import_ndjson(self, lines: Union[Iterable[str], AsyncIterable[str]],
+                            progress: Optional[Callable[[ImportReport], None]] = None) -> ImportReport:
+        """Import NDJSON lines and return the totals; `progress` is called after every batch."""
+        report = ImportReport()
+        batch: List[CourseRecord] = []
+
+        async for line_number, line in self._numbered(lines):
+            report.lines = line_number
+            record = self._parse_line(line_number, line, report)
+            if record is None:
+                continue
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                self._write_batch(batch, report)
+                batch = []
+                if progress:
+                    progress(report)
+
+        if batch:
+            self._write_batch(batch, report)
+        if progress:
+            progress(report)
+        return report
+
+    @staticmethod
+    async def _numbered(lines):
+        """Number the lines of a sync or async iterable, starting at 1."""
+        line_number = 0
+        if hasattr(lines, "__aiter__"):
+            async for line in lines:
+                line_number += 1
+                yield line_number, line
+        else:
+            for line in lines:
+                line_number += 1
+                yield line_number, line
+
+    def _parse_line(self, line_number: int, line: str, report: ImportReport) -> Optional[CourseRecord]:
+        """Validate one line into a course record, recording the error if it is invalid."""
+        line = line.strip()
+        if not line:
+            return None
+
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            report.errors.append({"line": line_number, "error": f"Invalid JSON: {e}"})
+            return None
+        if not isinstance(data, dict):
+            report.errors.append({"line": line_number, "error": "Expected a JSON object"})
+            return None
+        if data.pop("type", "course") != "course":
+            report.skipped += 1
+            return None
+
+        try:
+            module_list = data.pop("modules", None) or []
+            course = Course(**data)
+            modules = []
+            for module_index, module_data in enumerate(module_list):
+                module_data = dict(module_data)
+                lesson_list = module_data.pop("lessons", None) or []
+                module_data.setdefault("order", module_index + 1)
+                # The real course ID is assigned once IDs are allocated for the batch
+                module_data["course_id"] = course.id or 0
+                module = Module(**module_data)
+                lessons = []
+                for lesson_index, lesson_data in enumerate(lesson_list):
+                    lesson_data = dict(lesson_data)
+                    lesson_data.setdefault("order", lesson_index + 1)
+                    lesson_data["module_id"] = module.id or 0
+                    lessons.append(Lesson(**lesson_data))
+                modules.append((module, lessons))
+        except (ValidationError, TypeError, ValueError) as e:
+            report.errors.append({"line": line_number, "error": str(e)})
+            return None
+
+        return line_number, course, modules
+
+    def _assign_ids(self, batch: List[CourseRecord]) -> None:
+        """Give every new object in the batch an ID, leasing one block per kind."""
+        courses = [course for _, course, _ in batch if not course.id]
+        modules = [module for _, _, tree in batch for module, _ in tree if not module.id]
+        lessons = [lesson for _, _, tree in batch for _, lesson_list in tree
+                   for lesson in lesson_list if not lesson.id]
+
+        for kind, objects in (("course", courses), ("module", modules), ("lesson", lessons)):
+            if objects:
+                for obj, new_id in zip(objects, self.id_allocator.allocate_block(kind, len(objects))):
+                    obj.id = new_id
+
+        # Link children to their (possibly new) parents
+        for _, course, tree in batch:
+            for module, lesson_list in tree:
+                module.course_id = course.id
+                for lesson in lesson_list:
+                    lesson.module_id = module.id
+
+    def _stored_trees(self, course_ids: List[int]) -> Dict[int, List[Tuple[int, List[int]]]]:
+        """The module IDs of stored courses, each with its lesson IDs, in two round-trips."""
+        content_service = ContentService(self.redis_manager)
+        module_id_lists = content_service._get_ordered_id_lists(
+            [f"course:{course_id}:modules" for course_id in course_ids], "module")
+        lesson_id_lists = iter(content_service._get_ordered_id_lists(
+            [f"module:{module_id}:lessons" for module_ids in module_id_lists for module_id in module_ids], "lesson"))
+        return {course_id: [(module_id, next(lesson_id_lists)) for module_id in module_ids]
+                for course_id, module_ids in zip(course_ids, module_id_lists)}
+
+    def _write_batch(self, batch: List[CourseRecord], report: ImportReport) -> None:
+        """Write a validated batch with one pipeline and update the report."""
+        self._assign_ids(batch)
+
+        pipe = self.redis_manager.pipeline(transaction=False) if self.redis_manager else None
+        if pipe is None:
+            for line_number, _, _ in batch:
+                report.errors.append({"line": line_number, "error": "Redis connection is not available"})
+            return
+
+        # Statuses of courses the batch replaces, so the admin counters only count new courses once
+        course_keys = [f"course:{course.id}" for _, course, _ in batch]
+        stored = self.redis_manager.hmget_docs(course_keys, ["status", "instructor_id"])
+        stored_trees = self._stored_trees([course.id for (_, course, _), previous in zip(batch, stored)
+                                           if previous is not None])
+
+        module_count = 0
+        lesson_count = 0
+        for (_, course, tree), previous in zip(batch, stored):
+            self.redis_manager.queue_set_doc(pipe, f"course:{course.id}", course.dict())
+            pipe.sadd("all_courses", course.id)
+            previous_status = previous.get("status", CourseStatus.PENDING) if previous is not None else None
+            queue_counter_changes(pipe, course_changes(previous_status, course.status))
+
+            # An imported course replaces the modules and lessons it had before; delete
+            # the ones it drops, so none are left behind without an index pointing at them
+            module_ids = {module.id for module, _ in tree}
+            lesson_ids = {lesson.id for _, lessons in tree for lesson in lessons}
+            stored_tree = stored_trees.get(course.id, [])
+            dropped_modules = [module_id for module_id, _ in stored_tree if module_id not in module_ids]
+            dropped_lessons = [lesson_id for _, stored_lesson_ids in stored_tree
+                               for lesson_id in stored_lesson_ids if lesson_id not in lesson_ids]
+            if dropped_modules:
+                pipe.delete(*[key for module_id in dropped_modules
+                              for key in (f"module:{module_id}", f"module:{module_id}:lessons")])
+            if dropped_lessons:
+                pipe.delete(*[key for lesson_id in dropped_lessons
+                              for key in (f"lesson:{lesson_id}", body_key(f"lesson:{lesson_id}", "content"))])
+                pipe.srem(f"instructor:{previous.get('instructor_id')}:lessons", *dropped_lessons)
+
+            modules_key = f"course:{course.id}:modules"
+            pipe.delete(modules_key)
+            modules = []
+            for module, lessons in tree:
+                self.redis_manager.queue_set_doc(pipe, f"module:{module.id}", module.dict(exclude={"lessons"}))
+                pipe.zadd(modules_key, {module.id: module.order})
+                lessons_key = f"module:{module.id}:lessons"
+                pipe.delete(lessons_key)
+                for lesson in lessons:
+                    self.redis_manager.queue_set_doc(pipe, f"lesson:{lesson.id}", lesson.dict())
+                    pipe.zadd(lessons_key, {lesson.id: lesson.order})
+                    pipe.sadd(f"instructor:{course.instructor_id}:lessons", lesson.id)
+                module.lessons = lessons
+                modules.append(module)
+                module_count += 1
+                lesson_count += len(lessons)
+
+            ContentService._sort_tree(modules)
+            ContentService._queue_navigation(pipe, course.id, modules)
+            queue_version_bump(pipe, course.id)
+
+        if self.redis_manager.execute(pipe) is None:
+            for line_number, _, _ in batch:
+                report.errors.append({"line": line_number, "error": "Failed to write batch to Redis"})
+            return
+
+        report.courses += len(batch)
+        report.modules += module_count
+        report.lessons += lesson_count
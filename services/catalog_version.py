@@ -0,0 +1,84 @@
+import time
+from datetime import datetime, timezone
+from typing import List, NamedTuple, Optional
+
+# One hash holds every version counter, so a page or API response can read the
+# catalog version and the versions of the courses it shows in one HMGET
+VERSIONS_KEY = "catalog_versions"
+CATALOG_FIELD = "catalog"
+
+
+class Version(NamedTuple):
+    """A version counter and when it was last bumped (None if never)."""
+    number: int
+    modified: Optional[datetime]
+
+
+def course_version_field(course_id) -> str:
+    """The field of a course's version counter in the versions hash."""
+    return f"course:{course_id}"
+
+
+def modified_field(field: str) -> str:
+    """The field holding the time a version counter was last bumped, in epoch seconds."""
+    return f"{field}:modified"
+
+
+def queue_version_bump(pipe, *course_ids) -> None:
+    """
+    Queue the version increments for a write on a pipeline.
+
+    Every write bumps the catalog version; writes to a course, its modules or
+    its lessons also bump that course's version. Queue this on the same
+    pipeline as the write so the bump is never lost.
+    """
+    fields = [CATALOG_FIELD] + [course_version_field(course_id) for course_id in course_ids]
+    for field in fields:
+        pipe.hincrby(VERSIONS_KEY, field, 1)
+    now = int(time.time())
+    pipe.hset(VERSIONS_KEY, mapping={modified_field(field): now for field in fields})
+
+
+class CatalogVersions:
+    """
+    Version counters of the catalog and of each course.
+
+    Caches key their entries by these versions instead of deleting entries on
+    writes, so every process sees an invalidation as soon as the write commits.
+    """
+
+    def __init__(self, redis_manager=None):
+        self.redis_manager = redis_manager
+
+    def bump(self, *course_ids) -> bool:
+        """Bump the catalog version and the versions of the given courses."""
+        if self.redis_manager is None:
+            return False
+        pipe = self.redis_manager.pipeline(transaction=False)
+        if pipe is None:
+            return False
+        queue_version_bump(pipe, *course_ids)
+        return self.redis_manager.execute(pipe) is not None
+
+    def get(self, *course_ids) -> Optional[List[Version]]:
+        """
+        Get the catalog version followed by the versions of the given courses.
+
+        Returns None if Redis is unavailable, in which case callers must not
+        trust anything they cached.
+        """
+        if self.redis_manager is None:
+            return None
+        fields = [CATALOG_FIELD] + [course_version_field(course_id) for course_id in course_ids]
+        values = self.redis_manager.hmget(
+            VERSIONS_KEY, [name for field in fields for name in (field, modified_field(field))]
+        )
+        if values is None:
+            return None
+        versions = []
+        for number, modified in zip(values[::2], values[1::2]):
+            versions.append(Version(
+                int(number or 0),
+                datetime.fromtimestamp(int(modified), timezone.utc) if modified else None,
+            ))
+        return versions
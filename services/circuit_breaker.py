@@ -0,0 +1,123 @@
+import functools
+import os
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import redis
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Errors that mean Redis could not be reached in time, as opposed to errors
+# Redis answered with (WRONGTYPE, a failed WATCH and so on)
+FAILURES = (redis.ConnectionError, redis.TimeoutError)
+
+
+class CircuitOpenError(redis.ConnectionError):
+    """Raised instead of sending a command while the circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops sending commands to Redis after repeated connection failures.
+
+    After `failure_threshold` consecutive failures the circuit opens: commands
+    fail at once with CircuitOpenError instead of each waiting for a socket
+    timeout. After `reset_timeout` seconds it is half-open and lets one probe
+    command through; if it succeeds the circuit closes, otherwise it opens
+    again for another `reset_timeout`.
+    """
+
+    def __init__(self, failure_threshold: Optional[int] = None, reset_timeout: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold or int(os.getenv("REDIS_CIRCUIT_FAILURES", "5"))
+        self.reset_timeout = reset_timeout or float(os.getenv("REDIS_CIRCUIT_RESET_SECONDS", "10"))
+        self.clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return CLOSED
+        if self.clock() - self._opened_at < self.reset_timeout:
+            return OPEN
+        return HALF_OPEN
+
+    @property
+    def is_open(self) -> bool:
+        """Whether commands are being refused without a probe being due."""
+        return self.state == OPEN
+
+    def allow(self) -> bool:
+        """Whether a command may be sent now; in the half-open state only one probe at a time is."""
+        if self._opened_at is None:
+            return True
+        with self._lock:
+            if self.state != HALF_OPEN or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        if self._opened_at is None and not self._failures:
+            return
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            # A failed probe opens the circuit again straight away
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = self.clock()
+
+    def trip(self) -> None:
+        """Open the circuit now, e.g. because connecting failed."""
+        with self._lock:
+            self._opened_at = self.clock()
+            self._probing = False
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """Call func unless the circuit is open, recording whether Redis answered."""
+        if not self.allow():
+            raise CircuitOpenError("Redis circuit is open")
+        try:
+            result = func(*args, **kwargs)
+        except FAILURES:
+            self.record_failure()
+            raise
+        except Exception:
+            self.record_success()
+            raise
+        self.record_success()
+        return result
+
+
+def guard_client(client: redis.Redis, breaker: CircuitBreaker) -> redis.Redis:
+    """
+    Route every command of a client, including those of its pipelines and
+    transactions, through a circuit breaker. A client is only guarded once.
+    """
+    if getattr(client, "circuit_breaker", None) is not None:
+        return client
+    client.circuit_breaker = breaker
+    client.execute_command = functools.partial(breaker.call, client.execute_command)
+    pipeline = client.pipeline
+
+    def guarded_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        # Queued commands are sent by execute; commands after WATCH are sent at once
+        pipe.execute = functools.partial(breaker.call, pipe.execute)
+        pipe.immediate_execute_command = functools.partial(breaker.call, pipe.immediate_execute_command)
+        return pipe
+
+    client.pipeline = guarded_pipeline
+    return client
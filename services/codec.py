@@ -0,0 +1,213 @@
+import base64
+import json
+import os
+import re
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+# Field names the compact format stores as small integers. Stored documents
+# refer to these by position, so only ever append new names at the end.
+FIELDS = (
+    "id", "title", "description", "created_at", "updated_at", "status", "order",
+    # Course
+    "instructor_id", "instructor_name", "level", "price", "duration", "start_date", "tags", "thumbnail_url",
+    # Module and lesson
+    "course_id", "module_id", "content_type", "content", "duration_minutes", "is_free_preview", "image", "topics",
+    # User
+    "username", "email", "full_name", "role", "is_active", "bio",
+    # Enrollment, progress and payment
+    "user_id", "enrolled_at", "completed_at", "expiry_date", "lesson_id", "started_at", "time_spent_seconds",
+    "last_position_seconds", "completion_percentage", "amount", "currency", "payment_method", "transaction_id",
+)
+FIELD_CODES = {name: code for code, name in enumerate(FIELDS)}
+DATETIME_FIELDS = {"created_at", "updated_at", "start_date", "enrolled_at", "completed_at", "expiry_date", "started_at"}
+
+
+def json_default(obj: Any) -> str:
+    """json.dumps `default` hook that writes datetimes as ISO 8601."""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class JsonCodec:
+    """
+    Format version 1: a JSON object with ISO 8601 datetimes.
+
+    This is how every document was stored before codecs existed, so version 1
+    documents carry no marker and are recognized by their leading "{".
+    """
+
+    name = "json"
+    marker = "{"
+
+    def encode(self, doc: Dict[str, Any]) -> str:
+        return json.dumps(doc, default=json_default)
+
+    def decode(self, data: str) -> Dict[str, Any]:
+        return json.loads(data)
+
+
+class CompactCodec:
+    """
+    Format version 2: a marker character followed by a flat JSON array.
+
+    The array alternates keys and values. Keys listed in FIELDS are written as
+    their index, and naive datetimes (or their ISO 8601 strings, as read from
+    version 1 documents) as integer microseconds since the epoch under the
+    negated key (-index - 1). Other keys keep their name and other datetimes
+    their ISO 8601 form. The result stays valid UTF-8, so it works
+    with the text-mode client, MGET and pipelines like version 1 does.
+    """
+
+    name = "compact"
+    marker = "\x02"
+
+    def encode(self, doc: Dict[str, Any]) -> str:
+        items = []
+        for key, value in doc.items():
+            code = FIELD_CODES.get(key)
+            if isinstance(value, str) and key in DATETIME_FIELDS:
+                try:
+                    value = datetime.fromisoformat(value)
+                except ValueError:
+                    pass
+            if code is None:
+                items.append(key)
+            elif isinstance(value, datetime) and value.tzinfo is None:
+                items.append(-code - 1)
+                value = (value - EPOCH) // ONE_MICROSECOND
+            else:
+                items.append(code)
+            items.append(value)
+        return self.marker + json.dumps(items, separators=(",", ":"), default=json_default)
+
+    def decode(self, data: str) -> Dict[str, Any]:
+        items = json.loads(data[len(self.marker):])
+        doc = {}
+        for i in range(0, len(items), 2):
+            key, value = items[i], items[i + 1]
+            if isinstance(key, str):
+                doc[key] = value
+            elif key < 0:
+                doc[FIELDS[-key - 1]] = EPOCH + value * ONE_MICROSECOND
+            else:
+                doc[FIELDS[key]] = value
+        return doc
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec(), CompactCodec())}
+CODECS_BY_MARKER = {codec.marker: codec for codec in CODECS.values()}
+
+
+def get_codec(name: Optional[str] = None):
+    """Get a codec by name, defaulting to the REDIS_CODEC env var or "json"."""
+    name = name or os.getenv("REDIS_CODEC", "json")
+    if name not in CODECS:
+        print(f"Unknown Redis codec {name!r}, falling back to json")
+        name = "json"
+    return CODECS[name]
+
+
+def codec_for(data: str):
+    """Get the codec a stored document was written with, or None if it is not a document."""
+    return CODECS_BY_MARKER.get(data[:1]) if data else None
+
+
+def decode_document(data: str) -> Dict[str, Any]:
+    """Decode a stored document of any format version."""
+    codec = codec_for(data)
+    if codec is None:
+        raise ValueError("Value is not a stored document")
+    return codec.decode(data)
+
+
+class HashDocument(dict):
+    """A document read from a Redis hash rather than a string key."""
+
+
+def encode_fields(doc: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Encode a document as a Redis hash mapping, one JSON value per field.
+
+    Hash documents are stored field by field so they can be read with HMGET
+    and updated with HSET; the codec setting applies to string documents only.
+    """
+    return {key: json.dumps(value, default=json_default) for key, value in doc.items()}
+
+
+def decode_fields(mapping: Dict[str, str]) -> HashDocument:
+    """Decode a mapping read from a hash document (HGETALL or HMGET)."""
+    return HashDocument((key, json.loads(value)) for key, value in mapping.items())
+
+
+# Large text bodies (lesson content) live under their own keys next to the
+# document. A compressed body is a marker, the compression name and base64
+# data, so it stays valid UTF-8 for the text-mode client; anything else is
+# the plain text itself.
+BODY_MARKER = "\x00"
+BODY_COMPRESSIONS = {"zlib": (zlib.compress, zlib.decompress)}
+
+
+def get_body_compression(name: Optional[str] = None) -> Optional[str]:
+    """Get a body compression by name, defaulting to the LESSON_CONTENT_COMPRESSION env var or none."""
+    name = name if name is not None else os.getenv("LESSON_CONTENT_COMPRESSION", "none")
+    if not name or name == "none":
+        return None
+    if name not in BODY_COMPRESSIONS:
+        print(f"Unknown body compression {name!r}, storing bodies uncompressed")
+        return None
+    return name
+
+
+def encode_body(text: str, compression: Optional[str] = None, min_size: int = 1024) -> str:
+    """Encode a text body for storage, compressing it if it is at least `min_size` bytes."""
+    raw = text.encode("utf-8")
+    if compression is None or len(raw) < min_size:
+        if text.startswith(BODY_MARKER):
+            # Keep a plain body that happens to start with the marker unambiguous
+            return f"{BODY_MARKER}:{text}"
+        return text
+    compress, _ = BODY_COMPRESSIONS[compression]
+    encoded = base64.b64encode(compress(raw)).decode("ascii")
+    # Compression only pays off if the base64 form is still smaller
+    if len(encoded) + len(compression) + 2 >= len(raw):
+        return encode_body(text)
+    return f"{BODY_MARKER}{compression}:{encoded}"
+
+
+def decode_body(data: Optional[str]) -> Optional[str]:
+    """Decode a stored text body written by encode_body."""
+    if data is None or not data.startswith(BODY_MARKER):
+        return data
+    name, _, payload = data[len(BODY_MARKER):].partition(":")
+    if not name:
+        return payload
+    _, decompress = BODY_COMPRESSIONS[name]
+    return decompress(base64.b64decode(payload)).decode("utf-8")
+
+
+# Keys holding documents; other keys under these prefixes are sets, hashes or sorted sets
+DOCUMENT_PATTERNS = ("course:*", "module:*", "lesson:*", "user:*", "enrollment:*", "payment:*")
+DOCUMENT_KEY = re.compile(r"^(course|module|lesson|user|enrollment|payment):[^:]+$")
+# Documents that are stored as hashes in hash storage mode
+HASH_DOCUMENT_KEY = re.compile(r"^(course|module|lesson):[^:]+$")
+# Document fields stored under their own "{document key}:{field}" key, so that
+# listings read only metadata and the body is fetched when it is shown
+BODY_FIELDS = {"lesson": ("content",)}
+
+
+def body_fields(key: str) -> tuple:
+    """The body fields split out of the document stored under `key`."""
+    if not DOCUMENT_KEY.match(key):
+        return ()
+    return BODY_FIELDS.get(key.partition(":")[0], ())
+
+
+def body_key(key: str, field: str) -> str:
+    """The key a document's body field is stored under."""
+    return f"{key}:{field}"
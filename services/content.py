@@ -1,8 +1,11 @@
-from typing import List, Optional, Dict, Any, ForwardRef
+from typing import List, Optional, Dict, Any, Callable, ForwardRef, Tuple
 from pydantic import BaseModel
 from datetime import datetime
 from enum import Enum
 
+from services.catalog_version import CatalogVersions, queue_version_bump
+from services.codec import body_key
+
 # Forward reference for Lesson to avoid circular import
 LessonRef = ForwardRef('Lesson')
 
@@ -35,10 +38,12 @@ class Lesson(BaseModel):
     title: str
     description: str
     content_type: ContentType
-    content: str  # URL for videos/files, text content, or JSON for quizzes/assignments
+    content: str  # URL for videos/files, text content, or JSON for quizzes/assignments; stored under its own key
     duration_minutes: Optional[int] = None  # For video content
     order: int
     is_free_preview: bool = False
+    image: Optional[str] = None
+    topics: List[Dict[str, str]] = []
     created_at: datetime = datetime.now()
     updated_at: datetime = datetime.now()
 
@@ -49,92 +54,407 @@ class Lesson(BaseModel):
 Module.update_forward_refs()
 
 
+class LessonNavigation(BaseModel):
+    """Position of a lesson in the flattened lesson sequence of its course."""
+    course_id: int
+    module_id: int
+    lesson_id: int
+    position: int  # 1-based position of the lesson within the course
+    total: int
+    prev_module_id: Optional[int] = None
+    prev_lesson_id: Optional[int] = None
+    next_module_id: Optional[int] = None
+    next_lesson_id: Optional[int] = None
+    first_module_id: int
+    first_lesson_id: int
+    last_module_id: int
+    last_lesson_id: int
+
+
+# Field of the navigation hash marking it as written together with the indexes
+# it was built from; hashes without it may be stale and are rebuilt on read
+NAVIGATION_FORMAT_FIELD = "_format"
+NAVIGATION_FORMAT = "2"
+
+
+def build_lesson_navigation(course_id: int, modules: List[Module]) -> List[LessonNavigation]:
+    """
+    Flatten ordered modules and their ordered lessons into navigation entries.
+
+    Modules without lessons are skipped, so prev/next always point at a lesson.
+    """
+    return build_sequence_navigation(
+        course_id, [(module.id, lesson.id) for module in modules for lesson in module.lessons])
+
+
+def build_sequence_navigation(course_id: int, sequence: List[Tuple[int, int]]) -> List[LessonNavigation]:
+    """Build the navigation entries of a course's (module ID, lesson ID) sequence."""
+    if not sequence:
+        return []
+
+    first_module_id, first_lesson_id = sequence[0]
+    last_module_id, last_lesson_id = sequence[-1]
+    entries = []
+    for index, (module_id, lesson_id) in enumerate(sequence):
+        prev_entry = sequence[index - 1] if index > 0 else (None, None)
+        next_entry = sequence[index + 1] if index < len(sequence) - 1 else (None, None)
+        entries.append(LessonNavigation(
+            course_id=course_id,
+            module_id=module_id,
+            lesson_id=lesson_id,
+            position=index + 1,
+            total=len(sequence),
+            prev_module_id=prev_entry[0],
+            prev_lesson_id=prev_entry[1],
+            next_module_id=next_entry[0],
+            next_lesson_id=next_entry[1],
+            first_module_id=first_module_id,
+            first_lesson_id=first_lesson_id,
+            last_module_id=last_module_id,
+            last_lesson_id=last_lesson_id
+        ))
+    return entries
+
+
 class ContentService:
     """Service for managing course content in the online course platform."""
 
+    def __init__(self, redis_manager=None, id_allocator=None):
+        self.redis_manager = redis_manager
+        self.id_allocator = id_allocator
+
+    def _get_redis_manager(self):
+        """Get the Redis manager shared by all calls, connecting on first use."""
+        if self.redis_manager is None:
+            from services.redis_manager import RedisManager
+            self.redis_manager = RedisManager()
+        return self.redis_manager
+
+    def _get_id_allocator(self):
+        """Get the ID allocator, creating one on the shared Redis manager on first use."""
+        if self.id_allocator is None:
+            from services.id_allocator import IdAllocator
+            self.id_allocator = IdAllocator(self._get_redis_manager())
+        return self.id_allocator
+
+    def _ensure_ordered_index(self, index_key: str, item_prefix: str) -> None:
+        """Convert a legacy plain-set index into a sorted set scored by `order`."""
+        redis_manager = self._get_redis_manager()
+        if redis_manager.type(index_key) != "set":
+            return
+
+        item_ids = list(redis_manager.smembers(index_key))
+        item_docs = redis_manager.mget_docs([f"{item_prefix}:{item_id}" for item_id in item_ids])
+        scores = {}
+        for item_id, item_doc in zip(item_ids, item_docs):
+            scores[item_id] = item_doc.get("order", 0) if item_doc else 0
+
+        pipe = redis_manager.pipeline()
+        if pipe is None:
+            return
+        pipe.delete(index_key)
+        if scores:
+            pipe.zadd(index_key, scores)
+        redis_manager.execute(pipe)
+
+    def _get_ordered_ids(self, index_key: str, item_prefix: str) -> List[int]:
+        """Get the IDs stored in an ordered index, lowest `order` first."""
+        redis_manager = self._get_redis_manager()
+        item_ids = redis_manager.zrange(index_key)
+        if not item_ids and redis_manager.type(index_key) == "set":
+            self._ensure_ordered_index(index_key, item_prefix)
+            item_ids = redis_manager.zrange(index_key)
+        return [int(item_id) for item_id in item_ids]
+
+    def _get_ordered_id_lists(self, index_keys: List[str], item_prefix: str) -> List[List[int]]:
+        """Get the IDs of several ordered indexes with one pipeline."""
+        redis_manager = self._get_redis_manager()
+        if len(index_keys) < 2:
+            return [self._get_ordered_ids(index_key, item_prefix) for index_key in index_keys]
+        results = None
+        pipe = redis_manager.pipeline(transaction=False)
+        if pipe is not None:
+            for index_key in index_keys:
+                pipe.zrange(index_key, 0, -1)
+            results = redis_manager.execute(pipe, raise_on_error=False)
+        if results is None:
+            results = [None] * len(index_keys)
+
+        id_lists = []
+        for index_key, item_ids in zip(index_keys, results):
+            if isinstance(item_ids, list) and item_ids:
+                id_lists.append([int(item_id) for item_id in item_ids])
+            else:
+                # Empty, failed, or a legacy plain-set index that needs converting first
+                id_lists.append(self._get_ordered_ids(index_key, item_prefix))
+        return id_lists
+
+    async def _reorder(self, index_key: str, item_prefix: str, parent_field: str,
+                       parent_id: int, item_order: List[Dict[str, int]], course_id: Optional[int] = None) -> None:
+        """
+        Atomically update the `order` of items and their scores in an ordered
+        index, and the navigation of the course they belong to if known.
+        """
+        redis_manager = self._get_redis_manager()
+        self._ensure_ordered_index(index_key, item_prefix)
+
+        order_by_id = {int(item["id"]): item["order"] for item in item_order}
+        item_keys = [f"{item_prefix}:{item_id}" for item_id in order_by_id]
+        updated_at = datetime.now()
+
+        def apply_order(pipe, indexes=None):
+            # Read after WATCH is in place, so any concurrent change makes EXEC retry
+            item_docs = redis_manager.mget_docs(item_keys)
+            pipe.multi()
+            scores = {}
+            for item_id, item_dict in zip(order_by_id, item_docs):
+                # Ignore missing items and items that belong to another course or module
+                if not item_dict or item_dict.get(parent_field) != parent_id:
+                    continue
+                changes = {"order": order_by_id[item_id], "updated_at": updated_at}
+                redis_manager.queue_update_doc(pipe, f"{item_prefix}:{item_id}", item_dict, changes)
+                scores[item_id] = order_by_id[item_id]
+            if scores:
+                pipe.zadd(index_key, scores, xx=True)
+                if indexes is not None:
+                    # XX only moves members already in the index
+                    indexes[index_key].update(
+                        {item_id: score for item_id, score in scores.items() if item_id in indexes[index_key]})
+
+        if not item_keys:
+            return
+        if course_id is None:
+            redis_manager.transaction(apply_order, index_key, *item_keys)
+        else:
+            self._write_with_navigation(course_id, apply_order, (index_key,), tuple(item_keys))
+
+    @staticmethod
+    def _parse_module(module_dict: Optional[Dict[str, Any]]) -> Optional[Module]:
+        """Build a module from a document read from Redis."""
+        if not module_dict:
+            return None
+        try:
+            return Module(**module_dict)
+        except Exception as e:
+            print(f"Error parsing module data: {e}")
+            return None
+
+    @staticmethod
+    def _parse_lesson(lesson_dict: Optional[Dict[str, Any]]) -> Optional[Lesson]:
+        """Build a lesson from a document read from Redis; the content is empty unless it was loaded."""
+        if not lesson_dict:
+            return None
+        try:
+            return Lesson(**{"content": "", **lesson_dict})
+        except Exception as e:
+            print(f"Error parsing lesson data: {e}")
+            return None
+
+    def _queue_module(self, pipe, module: Module) -> None:
+        """Queue the write of a module document, without its lessons."""
+        self._get_redis_manager().queue_set_doc(pipe, f"module:{module.id}", module.dict(exclude={"lessons"}))
+
+    def _queue_lesson(self, pipe, lesson: Lesson) -> None:
+        """Queue the write of a lesson document; its content goes to a separate key."""
+        self._get_redis_manager().queue_set_doc(pipe, f"lesson:{lesson.id}", lesson.dict())
+
+    async def get_course_tree(self, course_id: int) -> List[Module]:
+        """
+        Get the ordered modules of a course with their ordered lessons attached,
+        without lesson content.
+
+        The whole tree takes four round-trips however many modules it has:
+        the module index, the modules, the lesson indexes and the lessons.
+        """
+        redis_manager = self._get_redis_manager()
+        modules = await self.get_modules_by_course_id(course_id)
+        id_lists = self._get_ordered_id_lists([f"module:{module.id}:lessons" for module in modules], "lesson")
+        lesson_docs = redis_manager.mget_docs([f"lesson:{lesson_id}" for ids in id_lists for lesson_id in ids])
+        lessons = iter(lesson_docs)
+        for module, lesson_ids in zip(modules, id_lists):
+            module.lessons = [lesson for lesson in (self._parse_lesson(next(lessons)) for _ in lesson_ids) if lesson]
+        return modules
+
+    @staticmethod
+    def _sort_tree(modules: List[Module]) -> None:
+        """Sort modules and lessons the way their sorted-set indexes order them."""
+        modules.sort(key=lambda m: (m.order, str(m.id)))
+        for module in modules:
+            module.lessons.sort(key=lambda l: (l.order, str(l.id)))
+
+    @staticmethod
+    def _queue_navigation(pipe, course_id: int, modules: List[Module]) -> List[LessonNavigation]:
+        """Queue the commands that replace a course's navigation index on a pipeline."""
+        return ContentService._queue_entries(pipe, course_id, build_lesson_navigation(course_id, modules))
+
+    @staticmethod
+    def _queue_entries(pipe, course_id: int, entries: List[LessonNavigation]) -> List[LessonNavigation]:
+        """Queue the commands that replace a course's navigation index with the given entries."""
+        import json
+        nav_key = f"course:{course_id}:lesson_nav"
+        pipe.delete(nav_key)
+        mapping = {str(e.lesson_id): json.dumps(e.dict()) for e in entries}
+        pipe.hset(nav_key, mapping={**mapping, NAVIGATION_FORMAT_FIELD: NAVIGATION_FORMAT})
+        return entries
+
+    def _read_indexes(self, index_keys: List[str]) -> Dict[str, Dict[int, float]]:
+        """Get the IDs and scores of several ordered indexes with one pipeline."""
+        redis_manager = self._get_redis_manager()
+        pipe = redis_manager.pipeline(transaction=False)
+        if pipe is None:
+            raise RuntimeError("Redis is not available")
+        for index_key in index_keys:
+            pipe.zrange(index_key, 0, -1, withscores=True)
+        results = redis_manager.execute(pipe, raise_on_error=False)
+        if results is None:
+            raise RuntimeError("Could not read the course indexes")
+
+        indexes = {}
+        for index_key, items in zip(index_keys, results):
+            if not isinstance(items, list):
+                # A legacy plain-set index: converting it changes a watched key, so the
+                # transaction reading it is retried and reads the sorted set next time
+                self._ensure_ordered_index(index_key, "module" if index_key.startswith("course:") else "lesson")
+                items = []
+            indexes[index_key] = {int(item_id): score for item_id, score in items}
+        return indexes
+
+    @staticmethod
+    def _index_sequence(course_id: int, indexes: Dict[str, Dict[int, float]]) -> List[Tuple[int, int]]:
+        """The (module ID, lesson ID) sequence of a course, in the order its indexes sort it."""
+        def ordered(scores: Dict[int, float]) -> List[int]:
+            # Sorted sets break ties between equal scores by member
+            return [item_id for item_id, _ in sorted(scores.items(), key=lambda item: (item[1], str(item[0])))]
+
+        return [(module_id, lesson_id)
+                for module_id in ordered(indexes.get(f"course:{course_id}:modules", {}))
+                for lesson_id in ordered(indexes.get(f"module:{module_id}:lessons", {}))]
+
+    def _write_with_navigation(self, course_id: int, write: Optional[Callable] = None,
+                               index_keys: Tuple[str, ...] = (), watches: Tuple[str, ...] = ()
+                               ) -> Optional[Tuple[Any, List[LessonNavigation]]]:
+        """
+        Run a write to a course's content and the rebuild of its navigation index
+        as one WATCH/MULTI/EXEC transaction. Without a write, only the
+        navigation is rebuilt and the course version is not bumped.
+
+        The course's module index, the lesson index of each of its modules and
+        `index_keys` are watched and read first, and the navigation is built
+        from them, so a concurrent change to any of them makes EXEC retry.
+        `write(pipe, indexes)` may read more, must call pipe.multi(), then
+        queues its commands and applies the index changes it queued to
+        `indexes`, a dict of {index key: {item ID: score}}.
+
+        Returns:
+            (what write returned, the navigation entries), or None if failed.
+        """
+        redis_manager = self._get_redis_manager()
+        modules_key = f"course:{course_id}:modules"
+        index_keys = tuple(dict.fromkeys((modules_key,) + tuple(index_keys)))
+
+        def apply(pipe):
+            # Read after WATCH is in place, so any concurrent change makes EXEC retry
+            indexes = self._read_indexes(list(index_keys))
+            lesson_keys = [f"module:{module_id}:lessons" for module_id in indexes[modules_key]]
+            unread = [key for key in lesson_keys if key not in indexes]
+            if unread:
+                pipe.watch(*unread)
+                indexes.update(self._read_indexes(unread))
+
+            if write is None:
+                pipe.multi()
+                result = None
+            else:
+                result = write(pipe, indexes)
+            entries = self._queue_entries(
+                pipe, course_id, build_sequence_navigation(course_id, self._index_sequence(course_id, indexes)))
+            # A rebuild on its own changes nothing pages show, so it leaves cached pages valid
+            if write is not None:
+                queue_version_bump(pipe, course_id)
+            return result, entries
+
+        return redis_manager.transaction(apply, *index_keys, *watches, value_from_callable=True)
+
     # Module methods
     async def create_module(self, module_data: dict) -> Module:
         """Create a new module and save to Redis."""
-        from services.redis_manager import RedisManager
-        import json
-        from datetime import datetime
-
         module = Module(**module_data)
         if not module.id:
-            module.id = int(datetime.now().timestamp())
+            module.id = self._get_id_allocator().next_id("module")
 
-        # Convert datetime objects to strings for JSON serialization
-        module_dict = module.dict()
-        module_dict["created_at"] = module_dict["created_at"].isoformat()
-        module_dict["updated_at"] = module_dict["updated_at"].isoformat()
+        course_modules_key = f"course:{module.course_id}:modules"
+        self._ensure_ordered_index(course_modules_key, "module")
 
-        redis_manager = RedisManager()
-        module_key = f"module:{module.id}"
-        redis_manager.set(module_key, json.dumps(module_dict))
+        def save(pipe, indexes):
+            pipe.multi()
+            self._queue_module(pipe, module)
+            pipe.zadd(course_modules_key, {module.id: module.order})
+            indexes[course_modules_key][module.id] = module.order
 
-        # Add module ID to course's modules set
-        course_modules_key = f"course:{module.course_id}:modules"
-        redis_manager.sadd(course_modules_key, module.id)
+        # Save the module, its index entry and the navigation in one transaction;
+        # a module saved again keeps its lessons
+        if self._write_with_navigation(module.course_id, save, (f"module:{module.id}:lessons",)) is None:
+            print(f"Failed to save module {module.id} to Redis!")
 
         return module
 
     async def get_module(self, module_id: int) -> Optional[Module]:
         """Get a module by ID."""
-        # In a real implementation, this would fetch from a database
-        from services.redis_manager import RedisManager
-        import json
-        redis_manager = RedisManager()
-        module_key = f"module:{module_id}"
-        module_json = redis_manager.get(module_key)
-        if module_json:
-            try:
-                module_dict = json.loads(module_json)
-                # Convert string dates back to datetime objects
-                module_dict["created_at"] = datetime.fromisoformat(module_dict["created_at"])
-                module_dict["updated_at"] = datetime.fromisoformat(module_dict["updated_at"])
-                return Module(**module_dict)
-            except Exception as e:
-                print(f"Error parsing module data: {e}")
+        redis_manager = self._get_redis_manager()
+        return self._parse_module(redis_manager.get_doc(f"module:{module_id}"))
 
-        return None
     async def get_modules_by_course_id(self, course_id: int) -> List[Module]:
-        """Get all modules for a specific course."""
-        # In a real implementation, this would fetch from a database
-        from services.redis_manager import RedisManager
-        redis_manager = RedisManager()
+        """Get all modules of a course in order."""
+        redis_manager = self._get_redis_manager()
         course_modules_key = f"course:{course_id}:modules"
-        module_ids = redis_manager.smembers(course_modules_key)
+        module_ids = self._get_ordered_ids(course_modules_key, "module")
         if not module_ids:
             return []
+        # Fetch all modules in one round-trip, already in order
+        module_docs = redis_manager.mget_docs([f"module:{module_id}" for module_id in module_ids])
         modules = []
-        for module_id in module_ids:
-            module = await self.get_module(int(module_id))
+        for module_doc in module_docs:
+            module = self._parse_module(module_doc)
             if module:
                 modules.append(module)
-        # Sort modules by order
-        modules.sort(key=lambda x: x.order)
 
         return modules
 
     async def update_module(self, module_id: int, module_data: dict) -> Optional[Module]:
         """Update a module's information."""
         # In a real implementation, this would update in a database
-        from services.redis_manager import RedisManager
-        import json
-        redis_manager = RedisManager()
+        redis_manager = self._get_redis_manager()
         module_key = f"module:{module_id}"
-        module_json = redis_manager.get(module_key)
-        if module_json:
+        module_dict = redis_manager.get_doc(module_key)
+        if module_dict:
             try:
-                module_dict = json.loads(module_json)
-                # Update fields
-                for key, value in module_data.items():
-                    if key in module_dict:
-                        module_dict[key] = value
-                # Convert datetime objects to strings for JSON serialization
-                module_dict["updated_at"] = datetime.now().isoformat()
-                redis_manager.set(module_key, json.dumps(module_dict))
-                return Module(**module_dict)
+                # Only fields the module has can be changed
+                changes = {key: value for key, value in module_data.items() if key in module_dict}
+                changes["updated_at"] = datetime.now()
+                if "order" not in changes:
+                    # Write only the changed fields, atomically with respect to other updates
+                    updated = redis_manager.update_doc(module_key, changes)
+                    if not updated:
+                        return None
+                    CatalogVersions(redis_manager).bump(module_dict["course_id"])
+                    return Module(**updated)
+
+                # Moving the module changes its score and the lesson sequence
+                course_id = module_dict["course_id"]
+                course_modules_key = f"course:{course_id}:modules"
+                self._ensure_ordered_index(course_modules_key, "module")
+
+                def move(pipe, indexes):
+                    pipe.multi()
+                    updated = redis_manager.queue_update_doc(pipe, module_key, module_dict, changes)
+                    pipe.zadd(course_modules_key, {module_id: changes["order"]})
+                    indexes[course_modules_key][module_id] = changes["order"]
+                    return updated
+
+                result = self._write_with_navigation(course_id, move, (f"module:{module_id}:lessons",))
+                if result is None:
+                    return None
+                return Module(**result[0])
             except Exception as e:
                 print(f"Error updating module data: {e}")
 
@@ -142,122 +462,109 @@ class ContentService:
 
     async def delete_module(self, module_id: int) -> bool:
         """Delete a module and all its associated lessons."""
-        from services.redis_manager import RedisManager
-
-        # Initialize Redis manager
-        redis_manager = RedisManager()
+        # Use the shared Redis manager
+        redis_manager = self._get_redis_manager()
 
         # Get the module to find its course_id
         module = await self.get_module(module_id)
         if not module:
             return False
 
-        # Get all lessons for this module
-        lessons = await self.get_lessons_by_module_id(module_id)
-
-        # Delete all lessons associated with this module
-        for lesson in lessons:
-            await self.delete_lesson(lesson.id)
-
-        # Delete the module from Redis
-        module_key = f"module:{module_id}"
-        redis_manager.delete(module_key)
-
-        # Remove module ID from course's modules set
         course_modules_key = f"course:{module.course_id}:modules"
-        redis_manager.srem(course_modules_key, module_id)
-
-        return True
+        module_lessons_key = f"module:{module_id}:lessons"
+        self._ensure_ordered_index(course_modules_key, "module")
+        self._ensure_ordered_index(module_lessons_key, "lesson")
+
+        def delete(pipe, indexes):
+            # The lesson index was read under WATCH, so no lesson added meanwhile is left behind
+            lesson_ids = list(indexes[module_lessons_key])
+            pipe.multi()
+            if lesson_ids:
+                pipe.delete(*[key for lesson_id in lesson_ids
+                              for key in (f"lesson:{lesson_id}", body_key(f"lesson:{lesson_id}", "content"))])
+            pipe.delete(f"module:{module_id}", module_lessons_key)
+            pipe.zrem(course_modules_key, module_id)
+            indexes[course_modules_key].pop(module_id, None)
+
+        # Delete the module, all of its lessons and its index entries in one transaction
+        return self._write_with_navigation(module.course_id, delete, (module_lessons_key,)) is not None
 
     async def list_course_modules(self, course_id: int) -> List[Module]:
         """List all modules for a specific course."""
-        # In a real implementation, this would fetch from a database
-        from services.redis_manager import RedisManager
-        redis_manager = RedisManager()
-        course_modules_key = f"course:{course_id}:modules"
-        module_ids = redis_manager.smembers(course_modules_key)
-        if not module_ids:
-            return []
-        modules = []
-        for module_id in module_ids:
-            module = await self.get_module(int(module_id))
-            if module:
-                modules.append(module)
-        # Sort modules by order
-        modules.sort(key=lambda x: x.order)
-
-        return modules
+        return await self.get_modules_by_course_id(course_id)
 
     async def reorder_modules(self, course_id: int, module_order: List[Dict[str, int]]) -> List[Module]:
-        """Reorder modules within a course."""
-        # In a real implementation, this would update module orders in a database
-        return []
+        """
+        Reorder modules within a course.
 
-    # Lesson methods
-    async def create_lesson(self, lesson_data: dict) -> Lesson:
-        """Create a new lesson."""
-        from services.redis_manager import RedisManager
-        import json
-        from datetime import datetime
+        module_order is a list of {"id": module_id, "order": new_order} items.
+        """
+        await self._reorder(f"course:{course_id}:modules", "module", "course_id", course_id, module_order, course_id)
+        return await self.get_modules_by_course_id(course_id)
 
-        # Initialize Redis manager
-        redis_manager = RedisManager()
+    # Lesson methods
+    async def create_lesson(self, lesson_data: dict, instructor_id: Optional[int] = None) -> Lesson:
+        """Create a new lesson, optionally recording it under its instructor."""
+        # Use the shared Redis manager
+        redis_manager = self._get_redis_manager()
 
         # Create a Lesson object
         lesson = Lesson(**lesson_data)
 
         # Generate a unique ID if not provided
         if not lesson.id:
-            lesson.id = int(datetime.now().timestamp())
-
-        # Create a dictionary from the lesson for Redis storage
-        lesson_dict = lesson.dict()
+            lesson.id = self._get_id_allocator().next_id("lesson")
 
-        # Convert datetime objects to strings for JSON serialization
-        lesson_dict["created_at"] = lesson_dict["created_at"].isoformat()
-        lesson_dict["updated_at"] = lesson_dict["updated_at"].isoformat()
-
-        # Store lesson in Redis
-        lesson_key = f"lesson:{lesson.id}"
-        redis_manager.set(lesson_key, json.dumps(lesson_dict))
-
-        # Add lesson ID to module's lessons set
         module_lessons_key = f"module:{lesson.module_id}:lessons"
-        redis_manager.sadd(module_lessons_key, lesson.id)
+        self._ensure_ordered_index(module_lessons_key, "lesson")
+
+        def queue_save(pipe):
+            self._queue_lesson(pipe, lesson)
+            pipe.zadd(module_lessons_key, {lesson.id: lesson.order})
+            if instructor_id is not None:
+                pipe.sadd(f"instructor:{instructor_id}:lessons", lesson.id)
+
+        def save(pipe, indexes):
+            pipe.multi()
+            queue_save(pipe)
+            indexes[module_lessons_key][lesson.id] = lesson.order
+
+        # Save the lesson, its index entries and the navigation in one transaction
+        module = await self.get_module(lesson.module_id)
+        if module:
+            saved = self._write_with_navigation(module.course_id, save, (module_lessons_key,)) is not None
+        else:
+            pipe = redis_manager.pipeline()
+            if pipe is None:
+                return lesson
+            queue_save(pipe)
+            queue_version_bump(pipe)
+            saved = redis_manager.execute(pipe) is not None
+        if not saved:
+            print(f"Failed to save lesson {lesson.id} to Redis!")
 
         return lesson
 
-    async def get_lesson(self, lesson_id: int) -> Optional[Lesson]:
-        """Get a lesson by ID."""
-        from services.redis_manager import RedisManager
-        import json
-        from datetime import datetime
-
-        # Initialize Redis manager
-        redis_manager = RedisManager()
+    async def get_lesson(self, lesson_id: int, with_content: bool = True) -> Optional[Lesson]:
+        """Get a lesson by ID, with its content unless `with_content` is False."""
+        # Use the shared Redis manager
+        redis_manager = self._get_redis_manager()
 
         # Get lesson from Redis
-        lesson_key = f"lesson:{lesson_id}"
-        lesson_json = redis_manager.get(lesson_key)
-
-        if not lesson_json:
-            return None
-
-        try:
-            # Parse JSON data
-            lesson_dict = json.loads(lesson_json)
-
-            # Convert string dates back to datetime objects
-            if "created_at" in lesson_dict:
-                lesson_dict["created_at"] = datetime.fromisoformat(lesson_dict["created_at"])
-            if "updated_at" in lesson_dict:
-                lesson_dict["updated_at"] = datetime.fromisoformat(lesson_dict["updated_at"])
-
-            # Create and return Lesson object
-            return Lesson(**lesson_dict)
-        except Exception as e:
-            print(f"Error parsing lesson data: {e}")
-            return None
+        lesson_doc = redis_manager.get_doc(f"lesson:{lesson_id}")
+        if lesson_doc and with_content and "content" not in lesson_doc:
+            lesson_doc["content"] = await self.get_lesson_content(lesson_id)
+        return self._parse_lesson(lesson_doc)
+
+    async def get_lesson_content(self, lesson_id: int) -> str:
+        """Get just the content of a lesson, e.g. for a lesson listed without it."""
+        redis_manager = self._get_redis_manager()
+        content = redis_manager.get_body(body_key(f"lesson:{lesson_id}", "content"))
+        if content is None:
+            # Documents written before content had its own key still hold it inline
+            lesson_doc = redis_manager.get_doc(f"lesson:{lesson_id}")
+            content = (lesson_doc or {}).get("content")
+        return content or ""
 
     async def update_lesson(self, lesson_id: int, lesson_data: dict) -> Optional[Lesson]:
         """Update a lesson's information."""
@@ -266,72 +573,122 @@ class ContentService:
 
     async def delete_lesson(self, lesson_id: int) -> bool:
         """Delete a lesson."""
-        from services.redis_manager import RedisManager
-
-        # Initialize Redis manager
-        redis_manager = RedisManager()
+        # Use the shared Redis manager
+        redis_manager = self._get_redis_manager()
 
         # Get the lesson to find its module_id
-        lesson = await self.get_lesson(lesson_id)
+        lesson = await self.get_lesson(lesson_id, with_content=False)
         if not lesson:
             return False
 
-        # Delete the lesson from Redis
-        lesson_key = f"lesson:{lesson_id}"
-        redis_manager.delete(lesson_key)
-
-        # Remove lesson ID from module's lessons set
         module_lessons_key = f"module:{lesson.module_id}:lessons"
-        redis_manager.srem(module_lessons_key, lesson_id)
-
-        return True
+        self._ensure_ordered_index(module_lessons_key, "lesson")
+
+        def queue_delete(pipe):
+            pipe.delete(f"lesson:{lesson_id}", body_key(f"lesson:{lesson_id}", "content"))
+            pipe.zrem(module_lessons_key, lesson_id)
+
+        def delete(pipe, indexes):
+            pipe.multi()
+            queue_delete(pipe)
+            indexes[module_lessons_key].pop(lesson_id, None)
+
+        # Delete the lesson, its index entry and the navigation in one transaction
+        module = await self.get_module(lesson.module_id)
+        if module:
+            return self._write_with_navigation(module.course_id, delete, (module_lessons_key,)) is not None
+        pipe = redis_manager.pipeline()
+        if pipe is None:
+            return False
+        queue_delete(pipe)
+        queue_version_bump(pipe)
+        return redis_manager.execute(pipe) is not None
 
     async def list_module_lessons(self, module_id: int) -> List[Lesson]:
         """List all lessons for a specific module."""
-        from services.redis_manager import RedisManager
+        return await self.get_lessons_by_module_id(module_id)
 
-        # Initialize Redis manager
-        redis_manager = RedisManager()
-
-        # Get lesson IDs from module's lessons set
-        module_lessons_key = f"module:{module_id}:lessons"
-        lesson_ids = redis_manager.smembers(module_lessons_key)
+    async def reorder_lessons(self, module_id: int, lesson_order: List[Dict[str, int]]) -> List[Lesson]:
+        """
+        Reorder lessons within a module.
 
+        lesson_order is a list of {"id": lesson_id, "order": new_order} items.
+        """
+        module = await self.get_module(module_id)
+        await self._reorder(f"module:{module_id}:lessons", "lesson", "module_id", module_id, lesson_order,
+                            module.course_id if module else None)
+        return await self.get_lessons_by_module_id(module_id)
+
+    async def get_lesson_ids_by_module_id(self, module_id: int) -> List[int]:
+        """Get the IDs of a module's lessons in order without loading the lessons."""
+        return self._get_ordered_ids(f"module:{module_id}:lessons", "lesson")
+
+    async def get_lessons_by_module_id(self, param: int, with_content: bool = False) -> List[Lesson]:
+        """Get all lessons of a module in order, with their content only if `with_content` is True."""
+        redis_manager = self._get_redis_manager()
+        lesson_ids = await self.get_lesson_ids_by_module_id(param)
         if not lesson_ids:
             return []
-
-        # Get lessons by IDs
+        # Fetch all lessons in one round-trip, already in order
+        lesson_docs = redis_manager.mget_docs([f"lesson:{lesson_id}" for lesson_id in lesson_ids])
+        if with_content:
+            # All the bodies in one more round-trip; older documents still hold theirs inline
+            bodies = redis_manager.mget_bodies([body_key(f"lesson:{lesson_id}", "content")
+                                                for lesson_id in lesson_ids])
+            for lesson_doc, body in zip(lesson_docs, bodies):
+                if lesson_doc and body is not None:
+                    lesson_doc["content"] = body
         lessons = []
-        for lesson_id in lesson_ids:
-            lesson = await self.get_lesson(int(lesson_id))
+        for lesson_doc in lesson_docs:
+            lesson = self._parse_lesson(lesson_doc)
             if lesson:
                 lessons.append(lesson)
+        return lessons
 
-        # Sort lessons by order
-        lessons.sort(key=lambda x: x.order)
+    # Navigation methods
+    async def rebuild_lesson_navigation(self, course_id: int) -> List[LessonNavigation]:
+        """
+        Rebuild the flattened lesson sequence of a course.
+
+        Each lesson gets one precomputed navigation entry in the
+        `course:{id}:lesson_nav` hash, so lookups never walk the course tree.
+        """
+        result = self._write_with_navigation(course_id)
+        if result is None:
+            return build_lesson_navigation(course_id, await self.get_course_tree(course_id))
+        return result[1]
+
+    async def rebuild_module_course_navigation(self, module_id: int) -> List[LessonNavigation]:
+        """Rebuild the lesson sequence of the course a module belongs to."""
+        module = await self.get_module(module_id)
+        if not module:
+            return []
+        return await self.rebuild_lesson_navigation(module.course_id)
 
-        return lessons
+    async def get_lesson_navigation(self, course_id: int, lesson_id: int) -> Optional[LessonNavigation]:
+        """
+        Get the prev/next/first/last navigation of a lesson within its course.
 
-    async def reorder_lessons(self, module_id: int, lesson_order: List[Dict[str, int]]) -> List[Lesson]:
-        """Reorder lessons within a module."""
-        # In a real implementation, this would update lesson orders in a database
-        return []
+        Read with one HMGET; the index is only rebuilt when it is missing or
+        in an older format, never for a lesson the course does not have.
+        """
+        import json
 
-    async def get_lessons_by_module_id(self, param: int) -> List[Lesson]:
-        """Get all lessons for a specific module."""
-        # In a real implementation, this would fetch from a database
+        redis_manager = self._get_redis_manager()
+        nav_json, nav_format = redis_manager.hmget(
+            f"course:{course_id}:lesson_nav", [str(lesson_id), NAVIGATION_FORMAT_FIELD]) or (None, None)
+        if nav_format == NAVIGATION_FORMAT:
+            # Every write keeps a current-format index complete, so a lesson missing from it is not in the course
+            if not nav_json:
+                return None
+            try:
+                return LessonNavigation(**json.loads(nav_json))
+            except Exception as e:
+                print(f"Error parsing lesson navigation data: {e}")
+                return None
 
-        from services.redis_manager import RedisManager
-        redis_manager = RedisManager()
-        module_lessons_key = f"module:{param}:lessons"
-        lesson_ids = redis_manager.smembers(module_lessons_key)
-        if not lesson_ids:
-            return []
-        lessons = []
-        for lesson_id in lesson_ids:
-            lesson = await self.get_lesson(int(lesson_id))
-            if lesson:
-                lessons.append(lesson)
-        # Sort lessons by order
-        lessons.sort(key=lambda x: x.order)
-        return lessons
+        # The index is missing, or was written before writes rebuilt it under WATCH and may be stale
+        for entry in await self.rebuild_lesson_navigation(course_id):
+            if entry.lesson_id == lesson_id:
+                return entry
+        return None
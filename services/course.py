@@ -2,7 +2,10 @@ from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 from datetime import datetime
 from enum import Enum
-import json
+from services.admin_stats import AdminStats, course_changes
+from services.catalog_version import CatalogVersions
+from services.id_allocator import IdAllocator
+from services.trending import TrendingService
 
 
 class CourseLevel(str, Enum):
@@ -38,6 +41,22 @@ class Course(BaseModel):
     class Config:
         orm_mode = True
 
+class CourseCard(BaseModel):
+    """The course fields shown on course cards in list pages and sidebars."""
+    id: int
+    title: str
+    description: str = ""
+    level: CourseLevel = CourseLevel.BEGINNER
+    price: float = 0.0
+    status: CourseStatus = CourseStatus.PENDING
+    start_date: Optional[datetime] = None
+    tags: List[str] = []
+    thumbnail_url: Optional[str] = None
+
+    class Config:
+        orm_mode = True
+
+
 class Module(BaseModel):
     id: Optional[int] = None
     course_id: int
@@ -64,36 +83,40 @@ class Lesson(BaseModel):
 class CourseService:
     """Service for managing courses in the online course platform."""
 
-    def __init__(self, featured_courses=None, trending_courses=None, redis_manager=None):
+    def __init__(self, featured_courses=None, trending_courses=None, redis_manager=None, id_allocator=None,
+                 trending_service=None):
         self.featured_courses = featured_courses or []
         self.trending_courses = trending_courses or []
         self.redis_manager = redis_manager
+        self.id_allocator = id_allocator or IdAllocator(redis_manager)
+        self.trending_service = trending_service or TrendingService(redis_manager)
+        self.stats = AdminStats(redis_manager)
+
+    def _stored_status(self, course_key: str) -> Optional[str]:
+        """Status of a stored course, or None if it is not stored yet."""
+        stored = self.redis_manager.hmget_docs([course_key], ["status"])[0]
+        return stored.get("status", CourseStatus.PENDING) if stored is not None else None
 
     async def create_course(self, course_data: dict) -> Course:
         """Create a new course."""
-        # Always ensure Redis is connected before saving
         if self.redis_manager:
             try:
-                if not self.redis_manager.is_connected():
-                    self.redis_manager.connect()
                 # Generate a unique ID if not provided
                 if course_data.get("id") is None:
-                    course_data["id"] = int(datetime.now().timestamp())
-                # Convert datetime objects to strings for JSON serialization
+                    course_data["id"] = self.id_allocator.next_id("course")
                 course_dict = course_data
-                course_dict["created_at"] = course_dict["created_at"].isoformat()
-                course_dict["updated_at"] = course_dict["updated_at"].isoformat()
-                if course_dict["start_date"]:
-                    course_dict["start_date"] = course_dict["start_date"].isoformat()
                 # Store individual course
                 course_key = f"course:{course_dict['id']}"
-                result = self.redis_manager.set(course_key, json.dumps(course_dict))
+                previous_status = self._stored_status(course_key)
+                result = self.redis_manager.set_doc(course_key, course_dict)
                 if not result:
                     print(f"Failed to save course {course_dict['id']} to Redis!")
                 else:
                     print(f"Course {course_dict['id']} saved to Redis")
                 # Add to all courses set
                 self.redis_manager.sadd("all_courses", course_dict["id"])
+                CatalogVersions(self.redis_manager).bump(course_dict["id"])
+                self.stats.apply(course_changes(previous_status, course_dict.get("status", CourseStatus.PENDING)))
             except Exception as e:
                 print(f"Error saving course to Redis: {e}")
         else:
@@ -105,18 +128,9 @@ class CourseService:
         # If Redis manager is available, try to fetch from Redis
         if self.redis_manager and self.redis_manager.is_connected():
             course_key = f"course:{course_id}"
-            course_data = self.redis_manager.get(course_key)
-            if course_data:
+            course_dict = self.redis_manager.get_doc(course_key)
+            if course_dict:
                 try:
-                    # Parse the JSON data
-                    course_dict = json.loads(course_data)
-                    # Convert ISO format strings back to datetime objects
-                    if "created_at" in course_dict:
-                        course_dict["created_at"] = datetime.fromisoformat(course_dict["created_at"])
-                    if "updated_at" in course_dict:
-                        course_dict["updated_at"] = datetime.fromisoformat(course_dict["updated_at"])
-                    if "start_date" in course_dict and course_dict["start_date"]:
-                        course_dict["start_date"] = datetime.fromisoformat(course_dict["start_date"])
                     return Course(**course_dict)
                 except Exception as e:
                     print(f"Error parsing course data from Redis: {e}")
@@ -162,20 +176,23 @@ class CourseService:
         # Save to Redis
         if self.redis_manager and self.redis_manager.is_connected():
             try:
-                # Convert datetime objects to strings for JSON serialization
-                course_dict = updated_course.dict()
-                course_dict["created_at"] = course_dict["created_at"].isoformat()
-                course_dict["updated_at"] = course_dict["updated_at"].isoformat()
-                if course_dict["start_date"]:
-                    course_dict["start_date"] = course_dict["start_date"].isoformat()
-
-                # Store updated course
+                # Write only the validated fields that were changed
                 course_key = f"course:{updated_course.id}"
-                result = self.redis_manager.set(course_key, json.dumps(course_dict))
+                updated_dict = updated_course.dict()
+                changes = {key: updated_dict[key] for key in course_data if key in updated_dict}
+                changes["updated_at"] = updated_dict["updated_at"]
+                result = self.redis_manager.update_doc(course_key, changes)
+                previous_status = existing_course.status
+                if result is None:
+                    # Not stored yet, e.g. one of the built-in sample courses
+                    result = self.redis_manager.set_doc(course_key, updated_dict)
+                    previous_status = None
                 if not result:
                     print(f"Failed to update course {updated_course.id} in Redis!")
                 else:
                     print(f"Course {updated_course.id} updated in Redis")
+                    CatalogVersions(self.redis_manager).bump(updated_course.id)
+                    self.stats.apply(course_changes(previous_status, updated_course.status))
             except Exception as e:
                 print(f"Error updating course in Redis: {e}")
 
@@ -191,6 +208,20 @@ class CourseService:
                           limit: int = 100, 
                           filters: Optional[Dict[str, Any]] = None) -> List[Course]:
         """List all courses with pagination and optional filtering."""
+        # Convert to Course objects; pydantic parses stored datetimes of any format
+        return [Course(**course) for course in self._list_course_docs(skip, limit, filters)]
+
+    async def list_course_cards(self,
+                                skip: int = 0,
+                                limit: int = 100,
+                                filters: Optional[Dict[str, Any]] = None) -> List[CourseCard]:
+        """List courses like list_courses, reading only the fields course cards render."""
+        fields = list(CourseCard.__fields__)
+        return [CourseCard(**course) for course in self._list_course_docs(skip, limit, filters, fields)]
+
+    def _list_course_docs(self, skip: int, limit: int, filters: Optional[Dict[str, Any]],
+                          fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Select, filter and paginate course documents, optionally reading only some fields."""
         # Initialize empty list for courses
         all_courses = []
 
@@ -198,21 +229,22 @@ class CourseService:
         if self.redis_manager and self.redis_manager.is_connected():
             try:
                 # Determine which set to use based on filters
-                set_key = "all_courses"
                 if filters and "featured" in filters and filters["featured"]:
-                    set_key = "featured_courses"
+                    course_ids = self.redis_manager.smembers("featured_courses")
                 elif filters and "trending" in filters and filters["trending"]:
-                    set_key = "trending_courses"
-
-                # Get all course IDs from the appropriate set
-                course_ids = self.redis_manager.smembers(set_key)
+                    # Ranked by engagement, most trending first, reading only as many as the page needs
+                    course_ids = self.trending_service.top_ids(skip + limit)
+                else:
+                    course_ids = self.redis_manager.smembers("all_courses")
 
-                # Fetch each course by ID
-                for course_id in course_ids:
-                    course_key = f"course:{course_id}"
-                    course_data = self.redis_manager.get(course_key)
-                    if course_data:
-                        course_dict = json.loads(course_data)
+                # Fetch all courses in one round-trip
+                course_keys = [f"course:{course_id}" for course_id in course_ids]
+                if fields:
+                    course_dicts = self.redis_manager.hmget_docs(course_keys, fields)
+                else:
+                    course_dicts = self.redis_manager.mget_docs(course_keys)
+                for course_dict in course_dicts:
+                    if course_dict:
                         all_courses.append(course_dict)
             except Exception as e:
                 print(f"Error fetching courses from Redis: {e}")
@@ -233,23 +265,7 @@ class CourseService:
                 all_courses = [c for c in all_courses if str(c["id"]) != filters["exclude"]]
 
         # Apply pagination
-        paginated_courses = all_courses[skip:skip + limit]
-
-        # Convert to Course objects and handle datetime conversion
-        result = []
-        for course in paginated_courses:
-            # Convert ISO format strings back to datetime objects if needed
-            course_copy = course.copy()
-            if isinstance(course_copy.get("created_at"), str):
-                course_copy["created_at"] = datetime.fromisoformat(course_copy["created_at"])
-            if isinstance(course_copy.get("updated_at"), str):
-                course_copy["updated_at"] = datetime.fromisoformat(course_copy["updated_at"])
-            if course_copy.get("start_date") and isinstance(course_copy["start_date"], str):
-                course_copy["start_date"] = datetime.fromisoformat(course_copy["start_date"])
-
-            result.append(Course(**course_copy))
-
-        return result
+        return all_courses[skip:skip + limit]
 
     async def publish_course(self, course_id: int) -> Optional[Course]:
         """Change course status to published."""
@@ -267,21 +283,11 @@ class CourseService:
         if self.redis_manager and self.redis_manager.is_connected():
             try:
                 course_ids = self.redis_manager.smembers("all_courses")
-                for course_id in course_ids:
-                    course_key = f"course:{course_id}"
-                    course_data = self.redis_manager.get(course_key)
-                    if course_data:
-                        course_dict = json.loads(course_data)
-                        # Match instructor_id
-                        if str(course_dict.get("instructor_id")) == str(instructor_id):
-                            # Convert datetimes
-                            if isinstance(course_dict.get("created_at"), str):
-                                course_dict["created_at"] = datetime.fromisoformat(course_dict["created_at"])
-                            if isinstance(course_dict.get("updated_at"), str):
-                                course_dict["updated_at"] = datetime.fromisoformat(course_dict["updated_at"])
-                            if course_dict.get("start_date") and isinstance(course_dict["start_date"], str):
-                                course_dict["start_date"] = datetime.fromisoformat(course_dict["start_date"])
-                            courses.append(Course(**course_dict))
+                course_keys = [f"course:{course_id}" for course_id in course_ids]
+                for course_dict in self.redis_manager.mget_docs(course_keys):
+                    # Match instructor_id
+                    if course_dict and str(course_dict.get("instructor_id")) == str(instructor_id):
+                        courses.append(Course(**course_dict))
             except Exception as e:
                 print(f"Error fetching instructor courses from Redis: {e}")
         return courses
@@ -306,29 +312,23 @@ class CourseService:
             print(f"Error creating Course object: {e}\nData: {course_data}")
             raise
 
-        # Always ensure Redis is connected before saving
         if self.redis_manager:
             try:
-                if not self.redis_manager.is_connected():
-                    self.redis_manager.connect()
                 # Generate a unique ID if not provided
                 if course.id is None:
-                    course.id = int(datetime.now().timestamp())
-                # Convert datetime objects to strings for JSON serialization
-                course_dict = course.dict()
-                course_dict["created_at"] = course_dict["created_at"].isoformat()
-                course_dict["updated_at"] = course_dict["updated_at"].isoformat()
-                if course_dict["start_date"]:
-                    course_dict["start_date"] = course_dict["start_date"].isoformat()
+                    course.id = self.id_allocator.next_id("course")
                 # Store individual course
                 course_key = f"course:{course.id}"
-                result = self.redis_manager.set(course_key, json.dumps(course_dict))
+                previous_status = self._stored_status(course_key)
+                result = self.redis_manager.set_doc(course_key, course.dict())
                 if not result:
                     print(f"Failed to save course {course.id} to Redis!")
                 else:
                     print(f"Course {course.id} saved to Redis")
                 # Add to all courses set
                 self.redis_manager.sadd("all_courses", course.id)
+                CatalogVersions(self.redis_manager).bump(course.id)
+                self.stats.apply(course_changes(previous_status, course.status))
             except Exception as e:
                 print(f"Error saving course to Redis: {e}")
         else:
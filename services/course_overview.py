@@ -0,0 +1,104 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from services.catalog_version import CatalogVersions
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Parse a `?fields=` selection such as "id,title,modules.title,modules.lessons.id"
+    into a nested spec where True selects a whole value. None or "" selects everything.
+    """
+    if not fields:
+        return None
+    spec: Dict[str, Any] = {}
+    for path in fields.split(","):
+        parts = [part for part in path.strip().split(".") if part]
+        if not parts:
+            continue
+        node = spec
+        for part in parts[:-1]:
+            child = node.get(part)
+            if child is True:
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = True
+    return spec or None
+
+
+def select_fields(value: Any, spec: Optional[Dict[str, Any]]) -> Any:
+    """Keep only the selected fields of a document, applying the spec to every item of lists."""
+    if spec is None:
+        return value
+    if isinstance(value, list):
+        return [select_fields(item, spec) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {key: value[key] if sub is True else select_fields(value[key], sub)
+            for key, sub in spec.items() if key in value}
+
+
+class CourseOverviewService:
+    """
+    The course -> modules -> lessons tree of a course as one document, without
+    lesson content.
+
+    Trees are read with a constant number of round-trips (see
+    ContentService.get_course_tree) and kept in a per-process LRU keyed by
+    course ID. An entry is only used while the course's version is unchanged,
+    so any write to the course, its modules or its lessons is seen at once.
+    """
+
+    def __init__(self, course_service, content_service, versions: Optional[CatalogVersions] = None,
+                 max_entries: int = 512):
+        self.course_service = course_service
+        self.content_service = content_service
+        self.versions = versions or CatalogVersions(course_service.redis_manager)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get_overview(self, course_id: int) -> Optional[Dict[str, Any]]:
+        """Get the overview of a course, or None if there is no such course."""
+        # Read the version before the tree, so a concurrent write can only make the entry older than its version
+        found = self.versions.get(course_id)
+        version = found[-1].number if found else None
+        if version is not None:
+            with self._lock:
+                entry = self._entries.get(course_id)
+                if entry is not None and entry[0] == version:
+                    self._entries.move_to_end(course_id)
+                    return entry[1]
+
+        overview = await self._build(course_id)
+        if overview is not None and version is not None:
+            with self._lock:
+                self._entries[course_id] = (version, overview)
+                self._entries.move_to_end(course_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return overview
+
+    async def _build(self, course_id: int) -> Optional[Dict[str, Any]]:
+        """Read a course and its tree and assemble the overview."""
+        course = await self.course_service.get_course(course_id)
+        if course is None:
+            return None
+        modules = await self.content_service.get_course_tree(course_id)
+
+        overview = course.dict()
+        module_dicts: List[Dict[str, Any]] = []
+        lesson_count = 0
+        duration_minutes = 0
+        for module in modules:
+            lessons = [lesson.dict(exclude={"content"}) for lesson in module.lessons]
+            lesson_count += len(lessons)
+            duration_minutes += sum(lesson["duration_minutes"] or 0 for lesson in lessons)
+            module_dicts.append({**module.dict(exclude={"lessons"}), "lessons": lessons})
+        overview["modules"] = module_dicts
+        overview["module_count"] = len(module_dicts)
+        overview["lesson_count"] = lesson_count
+        overview["duration_minutes"] = duration_minutes
+        return overview
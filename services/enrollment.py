@@ -1,7 +1,11 @@
-from typing import List, Optional
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum
+from services.id_allocator import IdAllocator
+from services.payment import user_paid_courses_key
 
 
 class EnrollmentStatus(str, Enum):
@@ -24,24 +28,229 @@ class Enrollment(BaseModel):
         orm_mode = True
 
 
+# Whether the course page's enroll form only enrolls users in paid courses after a completed
+# payment; off by default because the pages have no checkout flow to send them to yet
+ENROLLMENT_REQUIRES_PAYMENT = os.getenv("ENROLLMENT_REQUIRES_PAYMENT", "false").lower() == "true"
+
+# Days an enrollment gives access for; 0 means it never expires
+ENROLLMENT_ACCESS_DAYS = int(os.getenv("ENROLLMENT_ACCESS_DAYS", "0"))
+
+# Set once the active enrollments made before the per-course index existed have been indexed
+ENROLLMENT_INDEX_BUILT_KEY = "user_course_enrollments_built"
+
+# Sorted set of enrollment IDs due to expire, scored by their expiry timestamp
+ENROLLMENT_EXPIRIES_KEY = "enrollment_expiries"
+
+ENROLLED = "enrolled"
+ALREADY_ENROLLED = "already_enrolled"
+PAYMENT_REQUIRED = "payment_required"
+ENROLLMENT_FAILED = "failed"
+
+
+def user_enrollments_key(user_id: int) -> str:
+    return f"user:{user_id}:enrollments"
+
+
+def course_enrollments_key(course_id: int) -> str:
+    """
+    Set of every enrollment ID of a course, whatever its status. It is the
+    course's enrollment history, which exports read; who is enrolled now is
+    the roster.
+    """
+    return f"course:{course_id}:enrollments"
+
+
+def course_roster_key(course_id: int) -> str:
+    """Sorted set of a course's active enrollment IDs, scored by when they were made."""
+    return f"course:{course_id}:roster"
+
+
+def course_roster_built_key(course_id: int) -> str:
+    """Set once a course's roster holds the enrollments made before rosters existed."""
+    return f"course:{course_id}:roster_built"
+
+
+def user_course_enrollments_key(user_id: int) -> str:
+    """Hash of a user's enrollment ID per course, so a second enrollment is caught without reading documents."""
+    return f"user:{user_id}:course_enrollments"
+
+
+class EnrollResult(NamedTuple):
+    """Outcome of enroll_after_payment: one of the status constants and the enrollment, if there is one."""
+    status: str
+    enrollment: Optional[Enrollment] = None
+
+
 class EnrollmentService:
     """Service for managing course enrollments in the online course platform."""
-    
-    async def enroll_user(self, user_id: int, course_id: int) -> Enrollment:
-        """Enroll a user in a course."""
-        enrollment_data = {
-            "user_id": user_id,
-            "course_id": course_id,
-        }
-        enrollment = Enrollment(**enrollment_data)
-        # In a real implementation, this would save to a database
-        return enrollment
-    
+
+    def __init__(self, redis_manager=None, id_allocator=None):
+        self.redis_manager = redis_manager
+        self.id_allocator = id_allocator or IdAllocator(redis_manager)
+
+    def _active_enrollment(self, pipe, enrollment_ids, course_id: int) -> Optional[Enrollment]:
+        """The active enrollment in a course among some enrollment IDs, read through a client or watching pipeline."""
+        enrollment_ids = list(enrollment_ids)
+        if not enrollment_ids:
+            return None
+        for data in pipe.mget([f"enrollment:{enrollment_id}" for enrollment_id in enrollment_ids]):
+            enrollment_dict = self.redis_manager.decode_doc(data)
+            if (enrollment_dict and str(enrollment_dict["course_id"]) == str(course_id)
+                    and enrollment_dict["status"] == EnrollmentStatus.ACTIVE.value):
+                return Enrollment(**enrollment_dict)
+        return None
+
+    async def enroll_after_payment(self, user_id: int, course_id: int,
+                                   require_payment: bool = True,
+                                   access_days: int = ENROLLMENT_ACCESS_DAYS) -> EnrollResult:
+        """
+        Enroll a user in a course if they have paid for it and are not enrolled yet.
+
+        The payment and enrollment checks and the enrollment's writes run as
+        one WATCH/MULTI transaction on the user's per-course index and paid
+        courses, so simultaneous attempts (e.g. a double-click) create one
+        enrollment and the others return it. An enrollment with access_days
+        gets an expiry date and is expired by expire_due once it passes.
+        """
+        if self.redis_manager is None:
+            return EnrollResult(ENROLLMENT_FAILED)
+        enrolled_at = datetime.now()
+        enrollment = Enrollment(id=self.id_allocator.next_id("enrollment"), user_id=user_id, course_id=course_id,
+                                status=EnrollmentStatus.ACTIVE, enrolled_at=enrolled_at,
+                                expiry_date=enrolled_at + timedelta(days=access_days) if access_days else None)
+        index_key = user_course_enrollments_key(user_id)
+        user_key = user_enrollments_key(user_id)
+        paid_key = user_paid_courses_key(user_id)
+
+        def enroll(pipe):
+            existing_id = pipe.hget(index_key, course_id)
+            existing = self._active_enrollment(pipe, [existing_id] if existing_id else [], course_id)
+            if existing is not None:
+                return EnrollResult(ALREADY_ENROLLED, existing)
+            if require_payment and not pipe.hexists(paid_key, course_id):
+                return EnrollResult(PAYMENT_REQUIRED)
+
+            pipe.multi()
+            self.redis_manager.queue_set_doc(pipe, f"enrollment:{enrollment.id}", enrollment.dict())
+            pipe.hset(index_key, course_id, enrollment.id)
+            pipe.sadd(user_key, enrollment.id)
+            pipe.sadd(course_enrollments_key(course_id), enrollment.id)
+            pipe.zadd(course_roster_key(course_id), {enrollment.id: enrollment.enrolled_at.timestamp()})
+            if enrollment.expiry_date is not None:
+                pipe.zadd(ENROLLMENT_EXPIRIES_KEY, {enrollment.id: enrollment.expiry_date.timestamp()})
+            return EnrollResult(ENROLLED, enrollment)
+
+        result = self.redis_manager.transaction(enroll, index_key, paid_key, value_from_callable=True)
+        return result or EnrollResult(ENROLLMENT_FAILED)
+
+    def expire_due(self, now: Optional[float] = None, batch_size: int = 500) -> int:
+        """
+        Expire at most batch_size active enrollments whose expiry date has passed.
+
+        Due enrollments are read with one ZRANGEBYSCORE of the expiry index.
+        Each is claimed by removing it from the index, so when several
+        processes sweep at once every enrollment is expired once. Expiring
+        marks the document expired and drops it from its course's roster and
+        its user's per-course index in one transaction, so access checks only
+        ever look at the status. The enrollment stays in its course's
+        enrollments set, which is the history exports read.
+
+        Returns the number of due enrollments handled, including ones no
+        longer active that only left the index; 0 once none are due.
+        """
+        client = self.redis_manager.get_client() if self.redis_manager else None
+        if client is None:
+            return 0
+        now = datetime.now().timestamp() if now is None else now
+        try:
+            due = client.zrangebyscore(ENROLLMENT_EXPIRIES_KEY, "-inf", now, start=0, num=batch_size)
+            if not due:
+                return 0
+            claim = client.pipeline(transaction=False)
+            for enrollment_id in due:
+                claim.zrem(ENROLLMENT_EXPIRIES_KEY, enrollment_id)
+            claimed = [enrollment_id for enrollment_id, removed in zip(due, claim.execute()) if removed]
+        except Exception as e:
+            print(f"Error reading due enrollment expiries from Redis: {e}")
+            return 0
+
+        keys = [f"enrollment:{enrollment_id}" for enrollment_id in claimed]
+        pipe = self.redis_manager.pipeline()
+        if pipe is None:
+            return 0
+        expired = 0
+        for key, enrollment_dict in zip(keys, self.redis_manager.mget_docs(keys)):
+            # Completed or dropped enrollments just leave the index
+            if not enrollment_dict or enrollment_dict["status"] != EnrollmentStatus.ACTIVE.value:
+                continue
+            enrollment = Enrollment(**enrollment_dict)
+            self.redis_manager.queue_update_doc(pipe, key, enrollment_dict,
+                                                {"status": EnrollmentStatus.EXPIRED.value})
+            pipe.zrem(course_roster_key(enrollment.course_id), enrollment.id)
+            pipe.hdel(user_course_enrollments_key(enrollment.user_id), enrollment.course_id)
+            expired += 1
+        if expired and self.redis_manager.execute(pipe) is None:
+            # Put the claimed enrollments back so the next sweep retries them
+            self.redis_manager.zadd(ENROLLMENT_EXPIRIES_KEY, {enrollment_id: now for enrollment_id in claimed})
+            return 0
+        return len(claimed)
+
+    async def build_course_index(self, batch_size: int = 500) -> int:
+        """
+        Index the active enrollments made before each user's per-course index
+        existed, so enrollment checks never read a user's whole enrollment
+        set. Run at startup; once it has completed, the marker key makes it a
+        single EXISTS.
+
+        Returns:
+            int: The number of enrollments indexed.
+        """
+        client = self.redis_manager.get_client() if self.redis_manager else None
+        if client is None:
+            return 0
+
+        try:
+            if client.exists(ENROLLMENT_INDEX_BUILT_KEY):
+                return 0
+            indexed = 0
+            for course_ids in self.redis_manager.sscan("all_courses", count=batch_size):
+                for course_id in course_ids:
+                    for enrollment_ids in self.redis_manager.sscan(course_enrollments_key(course_id),
+                                                                   count=batch_size):
+                        pipe = self.redis_manager.pipeline(transaction=False)
+                        if pipe is None:
+                            return indexed
+                        for enrollment_dict in self.redis_manager.mget_docs(
+                                [f"enrollment:{eid}" for eid in enrollment_ids]):
+                            if enrollment_dict and enrollment_dict["status"] == EnrollmentStatus.ACTIVE.value:
+                                # Enrollments made meanwhile are indexed already
+                                pipe.hsetnx(user_course_enrollments_key(enrollment_dict["user_id"]),
+                                            enrollment_dict["course_id"], enrollment_dict["id"])
+                                indexed += 1
+                        if self.redis_manager.execute(pipe) is None:
+                            return indexed
+            client.set(ENROLLMENT_INDEX_BUILT_KEY, int(time.time()))
+            return indexed
+        except Exception as e:
+            print(f"Error building the enrollment index: {e}")
+            return 0
+
+    async def enroll_user(self, user_id: int, course_id: int) -> Optional[Enrollment]:
+        """
+        Enroll a user in a course without checking for a payment. Returns the
+        user's existing enrollment if they are already enrolled, or None if
+        the enrollment could not be saved.
+        """
+        result = await self.enroll_after_payment(user_id, course_id, require_payment=False)
+        return result.enrollment
+
     async def get_enrollment(self, enrollment_id: int) -> Optional[Enrollment]:
         """Get an enrollment by ID."""
-        # In a real implementation, this would fetch from a database
-        return None
-    
+        if self.redis_manager is None:
+            return None
+        enrollment_dict = self.redis_manager.get_doc(f"enrollment:{enrollment_id}")
+        return Enrollment(**enrollment_dict) if enrollment_dict else None
+
     async def update_enrollment_status(self, enrollment_id: int, status: EnrollmentStatus) -> Optional[Enrollment]:
         """Update an enrollment's status."""
         # In a real implementation, this would update in a database
@@ -58,16 +267,105 @@ class EnrollmentService:
         return None
     
     async def get_user_enrollments(self, user_id: int) -> List[Enrollment]:
-        """Get all enrollments for a specific user."""
-        # In a real implementation, this would fetch from a database
-        return []
-    
-    async def get_course_enrollments(self, course_id: int) -> List[Enrollment]:
-        """Get all enrollments for a specific course."""
-        # In a real implementation, this would fetch from a database
-        return []
+        """Get all enrollments for a specific user, read with one MGET."""
+        if self.redis_manager is None:
+            return []
+        enrollment_ids = self.redis_manager.smembers(user_enrollments_key(user_id))
+        enrollments = []
+        for enrollment_dict in self.redis_manager.mget_docs([f"enrollment:{eid}" for eid in enrollment_ids]):
+            if enrollment_dict:
+                try:
+                    enrollments.append(Enrollment(**enrollment_dict))
+                except Exception as e:
+                    print(f"Error parsing enrollment data: {e}")
+        return enrollments
+
+    def _rebuild_roster(self, course_id: int) -> int:
+        """
+        Fill a course's roster from its enrollments set, for enrollments made
+        before the roster existed, and mark it built so this happens once,
+        even if the course has no active enrollments. Returns the roster size.
+        """
+        scores = {}
+        for enrollment_ids in self.redis_manager.sscan(course_enrollments_key(course_id), count=500):
+            for enrollment_dict in self.redis_manager.mget_docs([f"enrollment:{eid}" for eid in enrollment_ids]):
+                if enrollment_dict and enrollment_dict["status"] == EnrollmentStatus.ACTIVE.value:
+                    enrollment = Enrollment(**enrollment_dict)
+                    scores[enrollment.id] = enrollment.enrolled_at.timestamp()
+
+        pipe = self.redis_manager.pipeline(transaction=False)
+        if pipe is None:
+            return len(scores)
+        if scores:
+            pipe.zadd(course_roster_key(course_id), scores)
+        pipe.set(course_roster_built_key(course_id), 1)
+        pipe.zcard(course_roster_key(course_id))
+        results = self.redis_manager.execute(pipe)
+        return results[-1] if results else len(scores)
+
+    async def get_enrollment_counts(self, course_ids: List[int]) -> Dict[int, int]:
+        """
+        Active enrollments per course, read with one pipelined ZCARD per course.
+
+        Courses with enrollments but no roster_built marker had enrollments
+        before rosters existed; their roster is rebuilt once.
+        """
+        course_ids = list(course_ids)
+        pipe = self.redis_manager.pipeline(transaction=False) if self.redis_manager else None
+        if pipe is None:
+            return {course_id: 0 for course_id in course_ids}
+        for course_id in course_ids:
+            pipe.zcard(course_roster_key(course_id))
+            pipe.exists(course_enrollments_key(course_id))
+            pipe.exists(course_roster_built_key(course_id))
+        results = self.redis_manager.execute(pipe) or [0, 0, 0] * len(course_ids)
+
+        counts = {}
+        for course_id, count, has_enrollments, built in zip(course_ids, results[::3], results[1::3],
+                                                            results[2::3]):
+            if has_enrollments and not built:
+                count = self._rebuild_roster(course_id)
+            counts[course_id] = count
+        return counts
+
+    async def get_enrollment_count(self, course_id: int) -> int:
+        """Number of active enrollments in a course."""
+        return (await self.get_enrollment_counts([course_id]))[course_id]
+
+    async def get_course_enrollments(self, course_id: int, skip: int = 0, limit: int = 100) -> List[Enrollment]:
+        """
+        Get a page of a course's active enrollments, oldest first.
+
+        The page is a ZRANGE of the course's roster and one MGET of its
+        enrollments, so it costs the same for the first student and the
+        100,000th.
+        """
+        if self.redis_manager is None or limit <= 0:
+            return []
+        if not await self.get_enrollment_count(course_id):
+            return []
+        enrollment_ids = self.redis_manager.zrange(course_roster_key(course_id), skip, skip + limit - 1)
+        enrollments = []
+        for enrollment_dict in self.redis_manager.mget_docs([f"enrollment:{eid}" for eid in enrollment_ids]):
+            if enrollment_dict:
+                enrollments.append(Enrollment(**enrollment_dict))
+        return enrollments
     
     async def is_user_enrolled(self, user_id: int, course_id: int) -> bool:
-        """Check if a user is enrolled in a specific course."""
-        # In a real implementation, this would check in a database
-        return False
\ No newline at end of file
+        """
+        Check if a user has an active enrollment in a specific course.
+
+        Looks the enrollment up in the user's per-course index (see
+        build_course_index); only an enrollment found there is read.
+        """
+        client = self.redis_manager.get_client() if self.redis_manager else None
+        if client is None:
+            return False
+        try:
+            enrollment_id = client.hget(user_course_enrollments_key(user_id), course_id)
+            if not enrollment_id:
+                return False
+            return self._active_enrollment(client, [enrollment_id], course_id) is not None
+        except Exception as e:
+            print(f"Error checking enrollment in Redis: {e}")
+            return False
@@ -0,0 +1,60 @@
+import asyncio
+import os
+import time
+from typing import Optional
+
+
+class EnrollmentExpirySweeper:
+    """
+    Expires enrollments in the background once their expiry date passes.
+
+    Every `interval` seconds it asks the enrollment service to expire due
+    enrollments, `batch_size` at a time, until none are left. Finding them is
+    a range read of the expiry index, so a sweep costs the same however many
+    enrollments never expire, and requests never compare expiry dates.
+    """
+
+    def __init__(self, enrollment_service, interval: Optional[float] = None, batch_size: Optional[int] = None):
+        self.enrollment_service = enrollment_service
+        self.interval = interval or float(os.getenv("ENROLLMENT_SWEEP_SECONDS", "60"))
+        self.batch_size = batch_size or int(os.getenv("ENROLLMENT_SWEEP_BATCH", "500"))
+        self.swept_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def sweep(self, now: Optional[float] = None) -> int:
+        """Expire every enrollment due by now. Returns the number of due enrollments handled."""
+        handled = 0
+        while True:
+            try:
+                count = self.enrollment_service.expire_due(now=now, batch_size=self.batch_size)
+            except Exception as e:
+                print(f"Error expiring enrollments: {e}")
+                break
+            handled += count
+            if count < self.batch_size:
+                break
+            # Let requests run between batches
+            await asyncio.sleep(0)
+        self.swept_at = time.time()
+        return handled
+
+    async def _run(self) -> None:
+        while True:
+            await self.sweep()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start sweeping in the background on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background sweep."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
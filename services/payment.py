@@ -1,7 +1,11 @@
-from typing import List, Optional, Dict, Any
+import os
+import uuid
+from typing import Callable, List, Optional, Dict, Any
 from pydantic import BaseModel
 from datetime import datetime
 from enum import Enum
+from services.id_allocator import IdAllocator
+from services.payment_gateway import GatewayError, PaymentGateway
 
 
 class PaymentStatus(str, Enum):
@@ -27,6 +31,8 @@ class Payment(BaseModel):
     status: PaymentStatus = PaymentStatus.PENDING
     payment_method: PaymentMethod
     transaction_id: Optional[str] = None
+    refund_transaction_id: Optional[str] = None
+    failure_reason: Optional[str] = None
     created_at: datetime = datetime.now()
     updated_at: datetime = datetime.now()
     
@@ -34,51 +40,343 @@ class Payment(BaseModel):
         orm_mode = True
 
 
+
+
+ALL_PAYMENTS_KEY = "all_payments"
+# How long a retried create_payment with the same idempotency key returns the first payment
+IDEMPOTENCY_TTL = int(os.getenv("PAYMENT_IDEMPOTENCY_TTL_HOURS", "24")) * 3600
+# How long one process may hold a payment while the gateway answers
+PAYMENT_LOCK_TTL = 60
+
+
+def user_payments_key(user_id: int) -> str:
+    return f"user:{user_id}:payments"
+
+
+def course_payments_key(course_id: int) -> str:
+    return f"course:{course_id}:payments"
+
+
+def status_payments_key(status: PaymentStatus) -> str:
+    return f"payments:{PaymentStatus(status).value}"
+
+
+def user_paid_courses_key(user_id: int) -> str:
+    """Hash of the completed payment ID per course a user has paid for, checked when enrolling."""
+    return f"user:{user_id}:paid_courses"
+
+
 class PaymentService:
-    """Service for managing payments in the online course platform."""
-    
-    async def create_payment(self, payment_data: dict) -> Payment:
-        """Create a new payment."""
+    """
+    Service for managing payments in the online course platform.
+
+    Payments are stored as `payment:{id}` documents and indexed, newest
+    first, in sorted sets scored by `created_at`: per user, per course, per
+    status and overall, so every listing reads one page of IDs and then
+    only those documents.
+
+    Clients may send an idempotency key with create_payment, so a retried
+    checkout returns the payment the first request created. process_payment
+    and refund_payment only act on a payment in the right status, hold a
+    short lock while the gateway answers, and pass the gateway an
+    idempotency key, so retries never charge or refund twice.
+
+    Charging and refunding need a gateway; without one (PAYMENT_GATEWAY is
+    not set) payments are unavailable and `available` is False.
+    """
+
+    def __init__(self, redis_manager=None, id_allocator=None, gateway: Optional[PaymentGateway] = None,
+                 analytics=None):
+        self.redis_manager = redis_manager
+        self.id_allocator = id_allocator or IdAllocator(redis_manager)
+        self.gateway = gateway
+        self.analytics = analytics
+
+    @property
+    def available(self) -> bool:
+        """Whether a gateway is configured, so payments can be charged and refunded."""
+        return self.gateway is not None
+
+    def _require_gateway(self) -> PaymentGateway:
+        if self.gateway is None:
+            raise RuntimeError("No payment gateway is configured; set PAYMENT_GATEWAY")
+        return self.gateway
+
+    @staticmethod
+    def _idempotency_key(user_id: int, key: str) -> str:
+        # Scoped to the user, so one user's key can never return another user's payment
+        return f"payment_idempotency:{user_id}:{key}"
+
+    def _queue_indexes(self, pipe, payment: Payment, previous_status: Optional[PaymentStatus] = None) -> None:
+        score = payment.created_at.timestamp()
+        pipe.zadd(ALL_PAYMENTS_KEY, {payment.id: score})
+        pipe.zadd(user_payments_key(payment.user_id), {payment.id: score})
+        pipe.zadd(course_payments_key(payment.course_id), {payment.id: score})
+        if previous_status is not None and previous_status != payment.status:
+            pipe.zrem(status_payments_key(previous_status), payment.id)
+        pipe.zadd(status_payments_key(payment.status), {payment.id: score})
+        if payment.status == PaymentStatus.COMPLETED:
+            pipe.hset(user_paid_courses_key(payment.user_id), payment.course_id, payment.id)
+        elif previous_status == PaymentStatus.COMPLETED:
+            pipe.hdel(user_paid_courses_key(payment.user_id), payment.course_id)
+
+    async def create_payment(self, payment_data: dict, idempotency_key: Optional[str] = None) -> Optional[Payment]:
+        """
+        Create a new payment.
+
+        With an idempotency key, a repeated request returns the payment the
+        first one created instead of creating another.
+        """
+        now = datetime.now()
+        payment_data = {"created_at": now, **payment_data, "updated_at": now}
         payment = Payment(**payment_data)
-        # In a real implementation, this would save to a database
+        if not self.redis_manager:
+            return payment
+
+        scoped_key = self._idempotency_key(payment.user_id, idempotency_key) if idempotency_key else None
+        if scoped_key:
+            existing_id = self.redis_manager.get(scoped_key)
+            if existing_id:
+                return await self.get_payment(int(existing_id))
+
+        if payment.id is None:
+            payment.id = self.id_allocator.next_id("payment")
+
+        def write(pipe):
+            if scoped_key:
+                # A concurrent retry may have created the payment since the check above
+                existing = pipe.get(scoped_key)
+                if existing:
+                    return int(existing)
+            pipe.multi()
+            if scoped_key:
+                pipe.set(scoped_key, payment.id, ex=IDEMPOTENCY_TTL)
+            self.redis_manager.queue_set_doc(pipe, f"payment:{payment.id}", payment.dict())
+            self._queue_indexes(pipe, payment)
+            return payment.id
+
+        watches = (scoped_key,) if scoped_key else ()
+        stored_id = self.redis_manager.transaction(write, *watches, value_from_callable=True)
+        if stored_id is None:
+            print(f"Failed to save payment {payment.id} to Redis!")
+            return None
+        if stored_id != payment.id:
+            return await self.get_payment(stored_id)
         return payment
-    
+
     async def get_payment(self, payment_id: int) -> Optional[Payment]:
         """Get a payment by ID."""
-        # In a real implementation, this would fetch from a database
-        return None
-    
+        if not self.redis_manager:
+            return None
+        payment_dict = self.redis_manager.get_doc(f"payment:{payment_id}")
+        if not payment_dict:
+            return None
+        try:
+            return Payment(**payment_dict)
+        except Exception as e:
+            print(f"Error parsing payment data: {e}")
+            return None
+
+    def _save(self, payment: Payment, previous_status: PaymentStatus) -> bool:
+        """Write a changed payment and move it between status indexes."""
+        payment.updated_at = datetime.now()
+        pipe = self.redis_manager.pipeline()
+        if pipe is None:
+            return False
+        self.redis_manager.queue_set_doc(pipe, f"payment:{payment.id}", payment.dict())
+        self._queue_indexes(pipe, payment, previous_status)
+        return self.redis_manager.execute(pipe) is not None
+
     async def update_payment(self, payment_id: int, payment_data: dict) -> Optional[Payment]:
-        """Update a payment's information."""
-        # In a real implementation, this would update in a database
-        return None
-    
-    async def list_payments(self, 
-                           skip: int = 0, 
-                           limit: int = 100, 
+        """Update a payment's information. Its ID, user, course and creation time cannot change."""
+        payment = await self.get_payment(payment_id)
+        if payment is None:
+            return None
+        previous_status = payment.status
+        fixed = {"id", "user_id", "course_id", "created_at"}
+        try:
+            payment = Payment(**{**payment.dict(),
+                                 **{key: value for key, value in payment_data.items() if key not in fixed}})
+        except Exception as e:
+            print(f"Error updating payment {payment_id}: {e}")
+            return None
+        return payment if self._save(payment, previous_status) else None
+
+    def _page(self, index_key: str, skip: int, limit: int,
+              matches: Optional[Callable[[Payment], bool]] = None) -> List[Payment]:
+        """A page of an index, newest first, keeping only payments that match."""
+        if not self.redis_manager or limit <= 0:
+            return []
+        if matches is None:
+            payment_ids = self.redis_manager.zrevrange(index_key, skip, skip + limit - 1)
+            docs = self.redis_manager.mget_docs([f"payment:{payment_id}" for payment_id in payment_ids])
+            return [Payment(**doc) for doc in docs if doc]
+
+        # Filter the index in batches until the page is full
+        payments: List[Payment] = []
+        skipped = 0
+        batch_size = max(limit, 100)
+        start = 0
+        while len(payments) < limit:
+            payment_ids = self.redis_manager.zrevrange(index_key, start, start + batch_size - 1)
+            if not payment_ids:
+                break
+            start += batch_size
+            for doc in self.redis_manager.mget_docs([f"payment:{payment_id}" for payment_id in payment_ids]):
+                if not doc:
+                    continue
+                payment = Payment(**doc)
+                if not matches(payment):
+                    continue
+                if skipped < skip:
+                    skipped += 1
+                    continue
+                payments.append(payment)
+                if len(payments) == limit:
+                    break
+        return payments
+
+    async def list_payments(self,
+                           skip: int = 0,
+                           limit: int = 100,
                            filters: Optional[Dict[str, Any]] = None) -> List[Payment]:
-        """List all payments with pagination and optional filtering."""
-        # In a real implementation, this would fetch from a database with filters
-        return []
-    
-    async def get_user_payments(self, user_id: int) -> List[Payment]:
-        """Get all payments made by a specific user."""
-        # In a real implementation, this would fetch from a database
-        return []
-    
-    async def get_course_payments(self, course_id: int) -> List[Payment]:
-        """Get all payments for a specific course."""
-        # In a real implementation, this would fetch from a database
-        return []
-    
-    async def process_payment(self, payment_id: int) -> Optional[Payment]:
-        """Process a pending payment."""
-        # In a real implementation, this would interact with a payment gateway
-        # and update the payment status accordingly
-        return None
-    
-    async def refund_payment(self, payment_id: int) -> Optional[Payment]:
-        """Refund a completed payment."""
-        # In a real implementation, this would interact with a payment gateway
-        # to process the refund and update the payment status
-        return None
\ No newline at end of file
+        """
+        List payments, newest first, with pagination and optional filtering
+        by `user_id`, `course_id` and `status`.
+        """
+        filters = dict(filters or {})
+        if "status" in filters:
+            filters["status"] = PaymentStatus(filters["status"])
+        # Page through the most selective index and check the other filters on each payment
+        if "user_id" in filters:
+            index_key = user_payments_key(filters.pop("user_id"))
+        elif "course_id" in filters:
+            index_key = course_payments_key(filters.pop("course_id"))
+        elif "status" in filters:
+            index_key = status_payments_key(filters.pop("status"))
+        else:
+            index_key = ALL_PAYMENTS_KEY
+
+        matches = None
+        if filters:
+            def matches(payment: Payment) -> bool:
+                return all(getattr(payment, key, None) == value for key, value in filters.items())
+        return self._page(index_key, skip, limit, matches)
+
+    async def get_user_payments(self, user_id: int, skip: int = 0, limit: int = 100) -> List[Payment]:
+        """Get the payments made by a specific user, newest first."""
+        return self._page(user_payments_key(user_id), skip, limit)
+
+    async def get_course_payments(self, course_id: int, skip: int = 0, limit: int = 100) -> List[Payment]:
+        """Get the payments for a specific course, newest first."""
+        return self._page(course_payments_key(course_id), skip, limit)
+
+    def _lock(self, payment_id: int) -> Optional[str]:
+        """Take the payment's lock; returns its token, or None if another process holds it."""
+        client = self.redis_manager.get_client() if self.redis_manager else None
+        if client is None:
+            return None
+        token = uuid.uuid4().hex
+        try:
+            return token if client.set(f"payment:{payment_id}:lock", token, nx=True, ex=PAYMENT_LOCK_TTL) else None
+        except Exception as e:
+            print(f"Error locking payment {payment_id}: {e}")
+            return None
+
+    def _unlock(self, payment_id: int, token: str) -> None:
+        lock_key = f"payment:{payment_id}:lock"
+
+        def release(pipe):
+            if pipe.get(lock_key) == token:
+                pipe.multi()
+                pipe.delete(lock_key)
+
+        self.redis_manager.transaction(release, lock_key)
+
+    async def process_payment(self, payment_id: int, idempotency_key: Optional[str] = None) -> Optional[Payment]:
+        """
+        Process a pending payment by charging it with the gateway.
+
+        Payments that are not pending, or that another request is processing
+        right now, are returned unchanged. Returns None if the payment does
+        not exist or the gateway could not be reached; it stays pending then.
+        """
+        try:
+            return await self.charge(payment_id, idempotency_key)
+        except GatewayError as e:
+            print(f"Error processing payment {payment_id}: {e}")
+            return None
+
+    async def charge(self, payment_id: int, idempotency_key: Optional[str] = None) -> Optional[Payment]:
+        """Like process_payment, but raises GatewayError when the gateway fails, for callers that retry."""
+        gateway = self._require_gateway()
+        payment = await self.get_payment(payment_id)
+        if payment is None or payment.status != PaymentStatus.PENDING:
+            return payment
+        token = self._lock(payment_id)
+        if token is None:
+            return payment
+        try:
+            # Read again under the lock: another process may have finished it meanwhile
+            payment = await self.get_payment(payment_id)
+            if payment is None or payment.status != PaymentStatus.PENDING:
+                return payment
+            result = await gateway.charge(payment.amount, payment.currency, payment.payment_method.value,
+                                          idempotency_key or f"charge:{payment.id}")
+            if result.success:
+                payment.status = PaymentStatus.COMPLETED
+                payment.transaction_id = result.transaction_id
+            else:
+                payment.status = PaymentStatus.FAILED
+                payment.failure_reason = result.error
+            if not self._save(payment, PaymentStatus.PENDING):
+                print(f"Failed to save processed payment {payment.id} to Redis!")
+                return None
+            if payment.status == PaymentStatus.COMPLETED and self.analytics is not None:
+                await self.analytics.record_payment(payment.amount)
+            return payment
+        finally:
+            self._unlock(payment_id, token)
+
+    async def refund_payment(self, payment_id: int, idempotency_key: Optional[str] = None) -> Optional[Payment]:
+        """
+        Refund a completed payment.
+
+        A payment that is already refunded is returned unchanged. Returns None
+        if the payment was never completed or the gateway could not be reached.
+        """
+        try:
+            return await self.refund(payment_id, idempotency_key)
+        except GatewayError as e:
+            print(f"Error refunding payment {payment_id}: {e}")
+            return None
+
+    async def refund(self, payment_id: int, idempotency_key: Optional[str] = None) -> Optional[Payment]:
+        """Like refund_payment, but raises GatewayError when the gateway fails, for callers that retry."""
+        gateway = self._require_gateway()
+        payment = await self.get_payment(payment_id)
+        if payment is None or payment.status == PaymentStatus.REFUNDED:
+            return payment
+        if payment.status != PaymentStatus.COMPLETED:
+            print(f"Payment {payment_id} is {payment.status.value} and cannot be refunded")
+            return None
+        token = self._lock(payment_id)
+        if token is None:
+            return payment
+        try:
+            payment = await self.get_payment(payment_id)
+            if payment is None or payment.status != PaymentStatus.COMPLETED:
+                return payment
+            result = await gateway.refund(payment.transaction_id, payment.amount,
+                                          idempotency_key or f"refund:{payment.id}")
+            if not result.success:
+                print(f"Refund of payment {payment_id} was rejected: {result.error}")
+                return None
+            payment.status = PaymentStatus.REFUNDED
+            payment.refund_transaction_id = result.transaction_id
+            if not self._save(payment, PaymentStatus.COMPLETED):
+                print(f"Failed to save refunded payment {payment.id} to Redis!")
+                return None
+            return payment
+        finally:
+            self._unlock(payment_id, token)
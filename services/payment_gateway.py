@@ -0,0 +1,112 @@
+import asyncio
+import os
+from abc import ABC, abstractmethod
+import uuid
+from collections import OrderedDict
+from typing import Iterable, List, NamedTuple, Optional
+
+
+class GatewayError(Exception):
+    """The gateway could not be reached or failed; the same request may be retried."""
+
+
+class GatewayResult(NamedTuple):
+    """Outcome of a charge or refund the gateway answered."""
+    success: bool
+    transaction_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class PaymentGateway(ABC):
+    """
+    What PaymentService needs from a payment provider.
+
+    Both calls take an idempotency key: a provider must answer a repeated
+    key with the original result instead of charging or refunding again, so
+    a request retried after a timeout is safe.
+    """
+
+    @abstractmethod
+    async def charge(self, amount: float, currency: str, payment_method: str,
+                     idempotency_key: str) -> GatewayResult:
+        """Charge a payment method; raises GatewayError if the provider could not be reached."""
+
+    @abstractmethod
+    async def refund(self, transaction_id: str, amount: float, idempotency_key: str) -> GatewayResult:
+        """Refund a charge; raises GatewayError if the provider could not be reached."""
+
+
+class FakePaymentGateway(PaymentGateway):
+    """
+    An in-process gateway for tests and local development.
+
+    Every charge succeeds unless its amount is in `declined_amounts`. The
+    first `failures` calls raise GatewayError, as a timeout would, and each
+    call waits `latency` seconds. The results of the last `max_results`
+    idempotency keys are remembered.
+    """
+
+    def __init__(self, declined_amounts: Iterable[float] = (), failures: int = 0, latency: float = 0.0,
+                 max_results: int = 10000):
+        self.declined_amounts = set(declined_amounts)
+        self.failures = failures
+        self.latency = latency
+        self.max_results = max_results
+        self.charges: List[str] = []
+        self.refunds: List[str] = []
+        self._results: "OrderedDict[str, GatewayResult]" = OrderedDict()
+
+    def _remember(self, idempotency_key: str, result: GatewayResult) -> None:
+        self._results[idempotency_key] = result
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+
+    async def _call(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failures > 0:
+            self.failures -= 1
+            raise GatewayError("Gateway timed out")
+
+    async def charge(self, amount: float, currency: str, payment_method: str,
+                     idempotency_key: str) -> GatewayResult:
+        await self._call()
+        if idempotency_key not in self._results:
+            if amount in self.declined_amounts:
+                result = GatewayResult(success=False, error="Card declined")
+            else:
+                result = GatewayResult(success=True, transaction_id=f"ch_{uuid.uuid4().hex[:16]}")
+                self.charges.append(result.transaction_id)
+            self._remember(idempotency_key, result)
+            return result
+        return self._results[idempotency_key]
+
+    async def refund(self, transaction_id: str, amount: float, idempotency_key: str) -> GatewayResult:
+        await self._call()
+        if idempotency_key not in self._results:
+            if transaction_id not in self.charges:
+                result = GatewayResult(success=False, error="Unknown charge")
+            else:
+                result = GatewayResult(success=True, transaction_id=f"re_{uuid.uuid4().hex[:16]}")
+                self.refunds.append(transaction_id)
+            self._remember(idempotency_key, result)
+            return result
+        return self._results[idempotency_key]
+
+
+# Gateways PAYMENT_GATEWAY can name; "fake" approves every charge and is only for tests and local development
+PAYMENT_GATEWAYS = {"fake": FakePaymentGateway}
+
+
+def get_payment_gateway(name: Optional[str] = None) -> Optional[PaymentGateway]:
+    """
+    The gateway named by `name`, or by the PAYMENT_GATEWAY environment
+    variable; None if neither names one. Raises ValueError for a name that
+    is not in PAYMENT_GATEWAYS.
+    """
+    name = (name if name is not None else os.getenv("PAYMENT_GATEWAY", "")).strip().lower()
+    if not name:
+        return None
+    if name not in PAYMENT_GATEWAYS:
+        raise ValueError(f"Unknown payment gateway {name!r}; expected one of {', '.join(sorted(PAYMENT_GATEWAYS))}")
+    return PAYMENT_GATEWAYS[name]()
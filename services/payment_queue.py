@@ -0,0 +1,283 @@
+import asyncio
+import os
+import socket
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from services.payment_gateway import GatewayError
+
+JOBS_STREAM = "payment_jobs"
+DEAD_LETTER_STREAM = "payment_jobs:dead"
+# Jobs waiting for their next retry, scored by when it is due
+DELAYED_JOBS_KEY = "payment_jobs:delayed"
+CONSUMER_GROUP = "payment_workers"
+
+CHARGE = "charge"
+REFUND = "refund"
+JOB_KINDS = (CHARGE, REFUND)
+
+QUEUED = "queued"
+RUNNING = "running"
+RETRYING = "retrying"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+DEAD = "dead"
+# A job in one of these states is not enqueued again
+ACTIVE_STATES = (QUEUED, RUNNING, RETRYING, SUCCEEDED)
+
+# How long job statuses can be polled after their last change
+JOB_TTL = 24 * 3600
+
+
+def job_key(job_id: str) -> str:
+    return f"payment_job:{job_id}"
+
+
+class PaymentQueue:
+    """
+    Charges and refunds processed off the request path by a pool of workers.
+
+    Jobs are entries of a Redis stream read by a consumer group, so each job
+    goes to one worker of one process, and a job whose worker died is claimed
+    by another after `claim_idle` seconds. A job that hits a gateway error is
+    retried with exponential backoff through a sorted set of delayed jobs;
+    after `max_attempts` it is moved to a dead-letter stream.
+
+    Each job's progress is kept in a `payment_job:{id}` hash for polling. Job
+    IDs are derived from the kind and payment, so enqueuing the same charge
+    twice, e.g. from a retried checkout, returns the existing job.
+
+    Idle workers wait for jobs with a blocking XREADGROUP run in a thread,
+    so they neither poll Redis nor block the event loop. Promoting due
+    retries and claiming abandoned jobs is done by one task per process,
+    every `maintenance_interval` seconds.
+    """
+
+    def __init__(self, redis_manager, payment_service, workers: Optional[int] = None,
+                 max_attempts: Optional[int] = None, base_delay: Optional[float] = None,
+                 poll_interval: Optional[float] = None, claim_idle: float = 60.0,
+                 maintenance_interval: Optional[float] = None):
+        self.redis_manager = redis_manager
+        self.payment_service = payment_service
+        self.workers = workers or int(os.getenv("PAYMENT_WORKERS", "2"))
+        self.max_attempts = max_attempts or int(os.getenv("PAYMENT_MAX_ATTEMPTS", "5"))
+        self.base_delay = base_delay if base_delay is not None else float(os.getenv("PAYMENT_RETRY_DELAY", "1"))
+        self.poll_interval = poll_interval or float(os.getenv("PAYMENT_QUEUE_POLL_SECONDS", "2"))
+        # A blocked read must return before the client gives up on the socket
+        socket_timeout = getattr(redis_manager, "socket_timeout", None)
+        if socket_timeout:
+            self.poll_interval = min(self.poll_interval, socket_timeout / 2)
+        self.maintenance_interval = maintenance_interval or float(
+            os.getenv("PAYMENT_QUEUE_MAINTENANCE_SECONDS", "5"))
+        self.claim_idle = claim_idle
+        self.consumer_prefix = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._group_ready = False
+        self._tasks: List[asyncio.Task] = []
+
+    def _client(self):
+        return self.redis_manager.get_client() if self.redis_manager else None
+
+    def _ensure_group(self, client) -> None:
+        if self._group_ready:
+            return
+        try:
+            client.xgroup_create(JOBS_STREAM, CONSUMER_GROUP, id="0", mkstream=True)
+        except Exception as e:
+            # BUSYGROUP: another process created it first
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    def enqueue(self, kind: str, payment_id: int, user_id: Optional[int] = None) -> Optional[str]:
+        """
+        Queue a charge or refund of a payment and return its job ID, or None
+        if it could not be queued. An active or finished job for the same
+        kind and payment is returned instead of queuing another.
+        """
+        if kind not in JOB_KINDS:
+            return None
+        client = self._client()
+        if client is None:
+            return None
+        job_id = f"{kind}-{payment_id}"
+        key = job_key(job_id)
+
+        def add(pipe):
+            if pipe.hget(key, "status") in ACTIVE_STATES:
+                return job_id
+            pipe.multi()
+            pipe.delete(key)
+            pipe.hset(key, mapping={"kind": kind, "payment_id": payment_id, "user_id": user_id or "",
+                                    "status": QUEUED, "attempts": 0, "updated_at": time.time()})
+            pipe.expire(key, JOB_TTL)
+            pipe.xadd(JOBS_STREAM, {"job_id": job_id})
+            return job_id
+
+        return self.redis_manager.transaction(add, key, value_from_callable=True)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """The status of a job for polling, or None if it is unknown or has expired."""
+        client = self._client()
+        if client is None:
+            return None
+        try:
+            job = client.hgetall(job_key(job_id))
+        except Exception as e:
+            print(f"Error getting payment job from Redis: {e}")
+            return None
+        if not job:
+            return None
+        job["id"] = job_id
+        job["payment_id"] = int(job["payment_id"])
+        job["user_id"] = int(job["user_id"]) if job.get("user_id") else None
+        job["attempts"] = int(job["attempts"])
+        job["updated_at"] = float(job["updated_at"])
+        return job
+
+    def _set_job(self, pipe, job_id: str, **fields) -> None:
+        pipe.hset(job_key(job_id), mapping={**fields, "updated_at": time.time()})
+        pipe.expire(job_key(job_id), JOB_TTL)
+
+    async def run_once(self, consumer: str) -> int:
+        """
+        Promote due retries, then read and run at most one job, claiming an
+        abandoned one if none is new. Returns the number of jobs run.
+        """
+        client = self._client()
+        if client is None:
+            return 0
+        self._ensure_group(client)
+        self._promote_due(client)
+        ran = await self._read_and_run(client, consumer)
+        return ran or await self._claim_and_run(client, consumer)
+
+    async def _read_and_run(self, client, consumer: str, block: Optional[float] = None) -> int:
+        """Read and run at most one new job, waiting up to `block` seconds for one in a thread."""
+        if block:
+            entries = await asyncio.to_thread(client.xreadgroup, CONSUMER_GROUP, consumer, {JOBS_STREAM: ">"},
+                                              count=1, block=int(block * 1000))
+        else:
+            entries = client.xreadgroup(CONSUMER_GROUP, consumer, {JOBS_STREAM: ">"}, count=1)
+        messages = entries[0][1] if entries else []
+        for message_id, fields in messages:
+            await self._run(client, message_id, fields["job_id"])
+        return len(messages)
+
+    async def _claim_and_run(self, client, consumer: str) -> int:
+        """Take over and run at most one job whose worker stopped before acknowledging it."""
+        _, messages, _ = client.xautoclaim(JOBS_STREAM, CONSUMER_GROUP, consumer,
+                                           min_idle_time=int(self.claim_idle * 1000), count=1)
+        for message_id, fields in messages:
+            await self._run(client, message_id, fields["job_id"])
+        return len(messages)
+
+    def _promote_due(self, client) -> None:
+        """Move retries whose backoff has passed back onto the stream."""
+        due = client.zrangebyscore(DELAYED_JOBS_KEY, "-inf", time.time(), start=0, num=100)
+        for job_id in due:
+            # Whoever removes the entry re-queues it, so each retry is queued once
+            if client.zrem(DELAYED_JOBS_KEY, job_id):
+                client.xadd(JOBS_STREAM, {"job_id": job_id})
+
+    async def _run(self, client, message_id: str, job_id: str) -> None:
+        job = self.get_job(job_id)
+        pipe = client.pipeline()
+        if job is None or job["status"] not in (QUEUED, RETRYING, RUNNING):
+            # Expired, or already finished by a worker that claimed it earlier
+            pipe.xack(JOBS_STREAM, CONSUMER_GROUP, message_id)
+            pipe.xdel(JOBS_STREAM, message_id)
+            pipe.execute()
+            return
+
+        attempts = job["attempts"] + 1
+        client.hset(job_key(job_id), mapping={"status": RUNNING, "attempts": attempts, "updated_at": time.time()})
+        action = self.payment_service.charge if job["kind"] == CHARGE else self.payment_service.refund
+        # The status a payment still has if another process is charging or refunding it right now
+        unfinished = "pending" if job["kind"] == CHARGE else "completed"
+        try:
+            payment = await action(job["payment_id"])
+        except GatewayError as e:
+            self._retry_or_bury(pipe, job_id, attempts, str(e))
+        except Exception as e:
+            print(f"Error running payment job {job_id}: {e}")
+            self._bury(pipe, job_id, attempts, str(e))
+        else:
+            if payment is None:
+                self._set_job(pipe, job_id, status=FAILED,
+                              error=f"Payment not found or cannot be {'charged' if job['kind'] == CHARGE else 'refunded'}")
+            elif payment.status.value == unfinished:
+                self._retry_or_bury(pipe, job_id, attempts, "Payment is being processed by another worker")
+            else:
+                status = SUCCEEDED if payment.status.value in ("completed", "refunded") else FAILED
+                self._set_job(pipe, job_id, status=status, payment_status=payment.status.value,
+                              error=payment.failure_reason or "")
+        pipe.xack(JOBS_STREAM, CONSUMER_GROUP, message_id)
+        pipe.xdel(JOBS_STREAM, message_id)
+        pipe.execute()
+
+    def _retry_or_bury(self, pipe, job_id: str, attempts: int, error: str) -> None:
+        """Retry a job after an exponential backoff, or dead-letter it after its last attempt."""
+        if attempts >= self.max_attempts:
+            self._bury(pipe, job_id, attempts, error)
+            return
+        retry_at = time.time() + self.base_delay * 2 ** (attempts - 1)
+        self._set_job(pipe, job_id, status=RETRYING, error=error, retry_at=retry_at)
+        pipe.zadd(DELAYED_JOBS_KEY, {job_id: retry_at})
+
+    def _bury(self, pipe, job_id: str, attempts: int, error: str) -> None:
+        self._set_job(pipe, job_id, status=DEAD, error=error)
+        pipe.xadd(DEAD_LETTER_STREAM, {"job_id": job_id, "error": error, "attempts": attempts})
+
+    async def _work(self, consumer: str) -> None:
+        while True:
+            started = time.monotonic()
+            try:
+                client = self._client()
+                if client is None:
+                    ran = 0
+                else:
+                    self._ensure_group(client)
+                    ran = await self._read_and_run(client, consumer, block=self.poll_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in payment worker {consumer}: {e}")
+                ran = 0
+            # Wait out the interval when the read did not block, e.g. because Redis is unavailable
+            if not ran:
+                await asyncio.sleep(max(0.0, self.poll_interval - (time.monotonic() - started)))
+
+    async def _maintain(self, consumer: str) -> None:
+        while True:
+            try:
+                client = self._client()
+                if client is not None:
+                    self._ensure_group(client)
+                    self._promote_due(client)
+                    while await self._claim_and_run(client, consumer):
+                        pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in payment queue maintenance: {e}")
+            await asyncio.sleep(self.maintenance_interval)
+
+    def start(self) -> None:
+        """Start the worker pool and its maintenance task on the running event loop."""
+        if self._tasks:
+            return
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._work(f"{self.consumer_prefix}-{i}")) for i in range(self.workers)]
+        self._tasks.append(loop.create_task(self._maintain(f"{self.consumer_prefix}-maintenance")))
+
+    async def stop(self) -> None:
+        """Stop the workers; jobs they were running are claimed by others later."""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
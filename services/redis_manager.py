@@ -1,6 +1,14 @@
 import redis
+from redis.backoff import ExponentialBackoff
+from redis.retry import Retry
 import os
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Callable, Iterator
+from services.circuit_breaker import OPEN, CircuitBreaker, guard_client
+from services.redis_metrics import RedisMetrics, instrument_client, redis_metrics
+from services.codec import (
+    get_codec, codec_for, decode_document, encode_fields, decode_fields, HashDocument,
+    get_body_compression, encode_body, decode_body, body_fields, body_key, DOCUMENT_PATTERNS, DOCUMENT_KEY, HASH_DOCUMENT_KEY
+)
 
 
 class RedisManager:
@@ -10,7 +18,10 @@ class RedisManager:
     """
 
     def __init__(self, host: Optional[str] = None, port: Optional[int] = None, 
-                 password: Optional[str] = None, decode_responses: bool = True):
+                 password: Optional[str] = None, decode_responses: bool = True,
+                 client: Optional[redis.Redis] = None, codec: Optional[str] = None,
+                 storage: Optional[str] = None, body_compression: Optional[str] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None, metrics: Optional[RedisMetrics] = None):
         """
         Initialize the RedisManager with connection parameters.
 
@@ -19,14 +30,60 @@ class RedisManager:
             port: Redis port. If None, will use REDIS_PORT env var or default.
             password: Redis password. If None, will use REDIS_PASSWORD env var or default.
             decode_responses: Whether to decode Redis responses to strings.
+            client: An already configured Redis client to use instead of connecting.
+            codec: Format for new documents ("json" or "compact"). If None, will use REDIS_CODEC env var or json.
+            storage: "hash" to store courses, modules and lessons as hashes, "string" for one encoded value.
+                If None, will use REDIS_DOCUMENT_STORAGE env var or string.
+            body_compression: "zlib" to compress large text bodies, "none" to store them as is.
+                If None, will use LESSON_CONTENT_COMPRESSION env var or none.
+            circuit_breaker: Breaker every command goes through. If None, one configured by the
+                REDIS_CIRCUIT_FAILURES and REDIS_CIRCUIT_RESET_SECONDS env vars is used.
+            metrics: Where round-trips are recorded. If None, the process-wide redis_metrics.
         """
         # Load Redis configuration from environment variables with defaults
         self.redis_host = host or os.getenv("REDIS_HOST", "localhost")
         self.redis_port = port or int(os.getenv("REDIS_PORT", "14345"))
         self.redis_password = password or os.getenv("REDIS_PASSWORD", "")
         self.decode_responses = decode_responses
-        self.redis_client = None
-        self.connect()
+        self.codec = get_codec(codec)
+        self.hash_documents = (storage or os.getenv("REDIS_DOCUMENT_STORAGE", "string")) == "hash"
+        self.body_compression = get_body_compression(body_compression)
+        self.body_compression_min_size = int(os.getenv("LESSON_CONTENT_COMPRESSION_MIN_BYTES", "1024"))
+        self.socket_timeout = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+        self.connect_timeout = float(os.getenv("REDIS_CONNECT_TIMEOUT", "2"))
+        # Failures are handled by the circuit breaker, so the client itself retries little
+        self.retries = int(os.getenv("REDIS_RETRIES", "1"))
+        self.circuit = circuit_breaker or CircuitBreaker()
+        self.metrics = metrics or redis_metrics
+        if client is not None:
+            self._wrap(client)
+        # Connecting is deferred to the first command, so building a manager
+        # (and the services using it) costs nothing at import time
+        self._redis_client = client
+        self._connect_attempted = client is not None
+
+    @property
+    def redis_client(self) -> Optional[redis.Redis]:
+        """
+        The Redis client, connecting on first use. None if there is no
+        connection or the circuit is open, so callers fall back at once
+        instead of waiting on an unreachable server.
+        """
+        if self._redis_client is None and not self._connect_attempted:
+            self._connect_attempted = True
+            self.connect()
+        if self._redis_client is not None and self.circuit.state == OPEN:
+            return None
+        return self._redis_client
+
+    @redis_client.setter
+    def redis_client(self, client: Optional[redis.Redis]) -> None:
+        self._redis_client = self._wrap(client) if client is not None else None
+        self._connect_attempted = True
+
+    def _wrap(self, client: redis.Redis) -> redis.Redis:
+        """Send the client's commands through the circuit breaker, recording them in the metrics."""
+        return instrument_client(guard_client(client, self.circuit), self.metrics)
 
     def connect(self) -> bool:
         """
@@ -39,7 +96,10 @@ class RedisManager:
             connection_params = {
                 "host": self.redis_host,
                 "port": self.redis_port,
-                "decode_responses": self.decode_responses
+                "decode_responses": self.decode_responses,
+                "socket_timeout": self.socket_timeout,
+                "socket_connect_timeout": self.connect_timeout,
+                "retry": Retry(ExponentialBackoff(), self.retries),
             }
 
             # Add password if provided
@@ -53,12 +113,13 @@ class RedisManager:
             print(f"Redis URL: {redis_url}")
 
             # Test connection
-            self.redis_client.ping()
+            self._redis_client.ping()
             print("Successfully connected to Redis database")
             return True
         except redis.ConnectionError as e:
             print(f"Failed to connect to Redis: {e}")
-            self.redis_client = None
+            # Keep the client: once the circuit half-opens, a command tries the server again
+            self.circuit.trip()
             return False
         except Exception as e:
             print(f"Unexpected error connecting to Redis: {e}")
@@ -76,17 +137,27 @@ class RedisManager:
 
     def is_connected(self) -> bool:
         """
-        Check if connected to Redis.
+        Check if Redis can be used, without a round-trip: there is a client
+        and the circuit is not open. Use ping() to reach the server.
 
         Returns:
             bool: True if connected, False otherwise.
         """
+        return self.redis_client is not None
+
+    def ping(self) -> bool:
+        """
+        Check that the Redis server answers.
+
+        Returns:
+            bool: True if it answered, False otherwise.
+        """
         if not self.redis_client:
             return False
         try:
-            self.redis_client.ping()
-            return True
-        except:
+            return bool(self.redis_client.ping())
+        except Exception as e:
+            print(f"Error pinging Redis: {e}")
             return False
 
     def set(self, key: str, value: str) -> bool:
@@ -127,6 +198,326 @@ class RedisManager:
             print(f"Error getting key from Redis: {e}")
             return None
 
+    def encode_doc(self, doc: Dict[str, Any]) -> str:
+        """
+        Encode a document (e.g. a model's .dict()) in the configured format.
+
+        Args:
+            doc: The document; datetime values are allowed.
+
+        Returns:
+            str: The value to store.
+        """
+        return self.codec.encode(doc)
+
+    def decode_doc(self, data: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Decode a stored document written in any format version.
+
+        Args:
+            data: The stored value.
+
+        Returns:
+            Optional[Dict[str, Any]]: The document or None if missing or invalid.
+        """
+        if not data:
+            return None
+        try:
+            return decode_document(data)
+        except Exception as e:
+            print(f"Error decoding document from Redis: {e}")
+            return None
+
+    def _stores_as_hash(self, key: str) -> bool:
+        """Whether documents under this key are written as hashes."""
+        return self.hash_documents and bool(HASH_DOCUMENT_KEY.match(key))
+
+    def _hgetall_docs(self, keys: List[str]) -> List[Optional[HashDocument]]:
+        """Read hash documents in one round-trip; None for missing or string keys."""
+        pipe = self.pipeline(transaction=False)
+        if pipe is None or not keys:
+            return [None] * len(keys)
+        for key in keys:
+            pipe.hgetall(key)
+        results = self.execute(pipe, raise_on_error=False) or [None] * len(keys)
+        # HGETALL on a string document fails with WRONGTYPE; those come back as errors
+        return [decode_fields(fields) if isinstance(fields, dict) and fields else None for fields in results]
+
+    def get_doc(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get and decode a document stored either as a string or as a hash.
+
+        Args:
+            key: The document key.
+
+        Returns:
+            Optional[Dict[str, Any]]: The document or None if not found or error.
+        """
+        return self.mget_docs([key])[0]
+
+    def mget_docs(self, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Get and decode several documents, whichever way each is stored.
+
+        The layout of the current storage mode is tried first, with one more
+        round-trip for keys that were not found that way.
+
+        Args:
+            keys: The document keys.
+
+        Returns:
+            List[Optional[Dict[str, Any]]]: Documents in key order, None for missing keys.
+        """
+        if not keys:
+            return []
+        if self.hash_documents:
+            docs = self._hgetall_docs(keys)
+            missing = [i for i, doc in enumerate(docs) if doc is None]
+            if missing:
+                for i, value in zip(missing, self.mget([keys[i] for i in missing])):
+                    docs[i] = self.decode_doc(value)
+        else:
+            docs = [self.decode_doc(value) for value in self.mget(keys)]
+            missing = [i for i, doc in enumerate(docs) if doc is None]
+            if missing:
+                for i, doc in zip(missing, self._hgetall_docs([keys[i] for i in missing])):
+                    docs[i] = doc
+        return docs
+
+    def hmget_docs(self, keys: List[str], fields: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Get only some fields of several documents, e.g. what a list page renders.
+
+        Hash documents are read with one HMGET each in a single pipeline;
+        string documents have to be read whole and are trimmed afterwards.
+
+        Args:
+            keys: The document keys.
+            fields: The fields to read.
+
+        Returns:
+            List[Optional[Dict[str, Any]]]: Partial documents in key order, None for missing keys.
+        """
+        def pick(doc):
+            return {field: doc[field] for field in fields if field in doc} if doc else None
+
+        if not self.hash_documents:
+            return [pick(doc) for doc in self.mget_docs(keys)]
+
+        pipe = self.pipeline(transaction=False)
+        if pipe is None or not keys:
+            return [None] * len(keys)
+        for key in keys:
+            pipe.hmget(key, fields)
+        results = self.execute(pipe, raise_on_error=False) or [None] * len(keys)
+
+        docs = []
+        fallback = []
+        for i, values in enumerate(results):
+            if isinstance(values, list) and any(value is not None for value in values):
+                docs.append(decode_fields({f: v for f, v in zip(fields, values) if v is not None}))
+            else:
+                # A string document (WRONGTYPE) or a missing key
+                docs.append(None)
+                fallback.append(i)
+        if fallback:
+            for i, value in zip(fallback, self.mget([keys[i] for i in fallback])):
+                docs[i] = pick(self.decode_doc(value))
+        return docs
+
+    def queue_set_doc(self, pipe, key: str, doc: Dict[str, Any]) -> None:
+        """
+        Queue the commands that store a whole document on a pipeline.
+
+        Args:
+            pipe: The pipeline.
+            key: The document key.
+            doc: The document.
+        """
+        doc = self._queue_split_bodies(pipe, key, doc)
+        if self._stores_as_hash(key):
+            # Replace any older layout and drop fields the document no longer has
+            pipe.delete(key)
+            pipe.hset(key, mapping=encode_fields(doc))
+        else:
+            pipe.set(key, self.encode_doc(doc))
+
+    def queue_update_doc(self, pipe, key: str, doc: Dict[str, Any], changes: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Queue the commands that apply changes to a document read earlier.
+
+        Hash documents only get the changed fields written; string documents
+        are rewritten whole. Changed body fields are written to their own keys.
+
+        Args:
+            pipe: The pipeline.
+            key: The document key.
+            doc: The current document, as returned by get_doc or mget_docs.
+            changes: The fields to change.
+
+        Returns:
+            Dict[str, Any]: The updated document.
+        """
+        updated = dict(doc)
+        updated.update(changes)
+        if self._stores_as_hash(key) and isinstance(doc, HashDocument):
+            changes = self._queue_split_bodies(pipe, key, changes)
+            if changes:
+                pipe.hset(key, mapping=encode_fields(changes))
+        else:
+            self.queue_set_doc(pipe, key, updated)
+        return updated
+
+    def _queue_split_bodies(self, pipe, key: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue writes of a document's body fields to their own keys; returns the rest of the document."""
+        fields = [field for field in body_fields(key) if field in doc]
+        if not fields:
+            return doc
+        doc = dict(doc)
+        for field in fields:
+            self.queue_set_body(pipe, body_key(key, field), doc.pop(field) or "")
+        return doc
+
+    def queue_set_body(self, pipe, key: str, text: str) -> None:
+        """
+        Queue the write of a large text body, compressed if configured and worthwhile.
+
+        Args:
+            pipe: The pipeline.
+            key: The body key.
+            text: The body.
+        """
+        pipe.set(key, encode_body(text, self.body_compression, self.body_compression_min_size))
+
+    def get_body(self, key: str) -> Optional[str]:
+        """
+        Get a text body written by queue_set_body.
+
+        Args:
+            key: The body key.
+
+        Returns:
+            Optional[str]: The body or None if not found or error.
+        """
+        return self.mget_bodies([key])[0]
+
+    def mget_bodies(self, keys: List[str]) -> List[Optional[str]]:
+        """
+        Get several text bodies in one round-trip.
+
+        Args:
+            keys: The body keys.
+
+        Returns:
+            List[Optional[str]]: The bodies in key order, None where missing or invalid.
+        """
+        bodies = []
+        for value in self.mget(keys):
+            try:
+                bodies.append(decode_body(value))
+            except Exception as e:
+                print(f"Error decoding body from Redis: {e}")
+                bodies.append(None)
+        return bodies
+
+    def set_doc(self, key: str, doc: Dict[str, Any]) -> bool:
+        """
+        Encode and store a document.
+
+        Args:
+            key: The document key.
+            doc: The document.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        if not self._stores_as_hash(key) and not body_fields(key):
+            return self.set(key, self.encode_doc(doc))
+        pipe = self.pipeline()
+        if pipe is None:
+            return False
+        self.queue_set_doc(pipe, key, doc)
+        return self.execute(pipe) is not None
+
+    def update_doc(self, key: str, changes: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Atomically change some fields of an existing document.
+
+        The document is read under WATCH, so concurrent updates of other
+        fields are never lost.
+
+        Args:
+            key: The document key.
+            changes: The fields to change.
+
+        Returns:
+            Optional[Dict[str, Any]]: The updated document or None if not found or error.
+        """
+        def apply(pipe):
+            doc = self.get_doc(key)
+            if doc is None:
+                return None
+            pipe.multi()
+            return self.queue_update_doc(pipe, key, doc, changes)
+
+        return self.transaction(apply, key, value_from_callable=True)
+
+    def migrate_documents(self, patterns=DOCUMENT_PATTERNS, batch_size: int = 500) -> Dict[str, int]:
+        """
+        Rewrite stored documents in the current codec and storage mode.
+
+        Body fields still stored inline, as written before they were split
+        out, are moved to their own keys.
+
+        Keys are walked with SCAN and rewritten one batch per WATCH/MULTI
+        transaction, so a document updated during the migration is re-read
+        rather than overwritten with its old contents.
+
+        Args:
+            patterns: Key patterns to walk; only document keys are rewritten.
+            batch_size: Number of keys per SCAN call and transaction.
+
+        Returns:
+            Dict[str, int]: Number of document keys scanned and rewritten.
+        """
+        counts = {"scanned": 0, "migrated": 0}
+        for pattern in patterns:
+            for keys in self.scan(pattern, count=batch_size):
+                keys = [key for key in keys if DOCUMENT_KEY.match(key)]
+                if not keys:
+                    continue
+                counts["scanned"] += len(keys)
+                migrated = self.transaction(lambda pipe: self._rewrite_documents(pipe, keys), *keys,
+                                            value_from_callable=True)
+                counts["migrated"] += migrated or 0
+        return counts
+
+    def _rewrite_documents(self, pipe, keys: List[str]) -> int:
+        """Queue rewrites for the documents not yet in the current format; returns how many."""
+        values = self.mget(keys)
+        hash_keys = [key for key, value in zip(keys, values) if value is None]
+        hash_docs = dict(zip(hash_keys, self._hgetall_docs(hash_keys)))
+
+        pipe.multi()
+        rewritten = 0
+        for key, value in zip(keys, values):
+            if value is not None:
+                codec = codec_for(value)
+                if codec is None:
+                    continue
+                doc = codec.decode(value)
+                current = codec is self.codec and not self._stores_as_hash(key)
+            else:
+                doc = hash_docs.get(key)
+                if doc is None:
+                    continue
+                current = self._stores_as_hash(key)
+            if current and not any(field in doc for field in body_fields(key)):
+                continue
+            self.queue_set_doc(pipe, key, doc)
+            rewritten += 1
+        return rewritten
+
     def delete(self, key: str) -> bool:
         """
         Delete a key from Redis.
@@ -184,6 +575,56 @@ class RedisManager:
             print(f"Error getting set members from Redis: {e}")
             return set()
 
+    def sscan(self, key: str, count: int = 100) -> Iterator[List[str]]:
+        """
+        Walk a Redis set in batches with SSCAN instead of loading it whole.
+
+        Args:
+            key: The set key.
+            count: Hint for how many members each SSCAN call returns.
+
+        Yields:
+            List[str]: Non-empty batches of members; stops early on error.
+        """
+        if not self.redis_client:
+            return
+        cursor = 0
+        while True:
+            try:
+                cursor, members = self.redis_client.sscan(key, cursor=cursor, count=count)
+            except Exception as e:
+                print(f"Error scanning set in Redis: {e}")
+                return
+            if members:
+                yield members
+            if cursor == 0:
+                return
+
+    def scan(self, pattern: str, count: int = 100) -> Iterator[List[str]]:
+        """
+        Walk the keys matching a pattern in batches with SCAN.
+
+        Args:
+            pattern: Glob-style key pattern.
+            count: Hint for how many keys each SCAN call examines.
+
+        Yields:
+            List[str]: Non-empty batches of keys; stops early on error.
+        """
+        if not self.redis_client:
+            return
+        cursor = 0
+        while True:
+            try:
+                cursor, keys = self.redis_client.scan(cursor=cursor, match=pattern, count=count)
+            except Exception as e:
+                print(f"Error scanning keys in Redis: {e}")
+                return
+            if keys:
+                yield keys
+            if cursor == 0:
+                return
+
     def srem(self, key: str, *values) -> bool:
         """
         Remove values from a Redis set.
@@ -203,3 +644,234 @@ class RedisManager:
         except Exception as e:
             print(f"Error removing from set in Redis: {e}")
             return False
+
+    def mget(self, keys: List[str]) -> List[Optional[str]]:
+        """
+        Get the values of several keys in one round-trip.
+
+        Args:
+            keys: The keys to get.
+
+        Returns:
+            List[Optional[str]]: Values in key order, None for missing keys.
+        """
+        if not self.redis_client or not keys:
+            return [None] * len(keys)
+        try:
+            return self.redis_client.mget(keys)
+        except Exception as e:
+            print(f"Error getting keys from Redis: {e}")
+            return [None] * len(keys)
+
+    def type(self, key: str) -> Optional[str]:
+        """
+        Get the Redis type of a key.
+
+        Args:
+            key: The key to inspect.
+
+        Returns:
+            Optional[str]: The type name ("none" if missing) or None if error.
+        """
+        if not self.redis_client:
+            return None
+        try:
+            return self.redis_client.type(key)
+        except Exception as e:
+            print(f"Error getting key type from Redis: {e}")
+            return None
+
+    def zadd(self, key: str, mapping: Dict[Any, float]) -> bool:
+        """
+        Add members with scores to a Redis sorted set.
+
+        Args:
+            key: The sorted set key.
+            mapping: Member/score pairs to add or update.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        if not self.redis_client:
+            return False
+        try:
+            self.redis_client.zadd(key, mapping)
+            return True
+        except Exception as e:
+            print(f"Error adding to sorted set in Redis: {e}")
+            return False
+
+    def zrange(self, key: str, start: int = 0, end: int = -1) -> List[str]:
+        """
+        Get members of a Redis sorted set ordered by score.
+
+        Args:
+            key: The sorted set key.
+            start: Index of the first member to return.
+            end: Index of the last member to return (inclusive).
+
+        Returns:
+            List[str]: Members in score order or empty list if not found or error.
+        """
+        if not self.redis_client:
+            return []
+        try:
+            return self.redis_client.zrange(key, start, end)
+        except Exception as e:
+            print(f"Error getting sorted set members from Redis: {e}")
+            return []
+
+    def zrevrange(self, key: str, start: int = 0, end: int = -1) -> List[str]:
+        """
+        Get members of a Redis sorted set, highest score first.
+
+        Args:
+            key: The sorted set key.
+            start: Index of the first member to return.
+            end: Index of the last member to return (inclusive).
+
+        Returns:
+            List[str]: Members in descending score order or empty list if not found or error.
+        """
+        if not self.redis_client:
+            return []
+        try:
+            return self.redis_client.zrevrange(key, start, end)
+        except Exception as e:
+            print(f"Error getting sorted set members from Redis: {e}")
+            return []
+
+    def zrem(self, key: str, *values) -> bool:
+        """
+        Remove members from a Redis sorted set.
+
+        Args:
+            key: The sorted set key.
+            *values: Members to remove.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        if not self.redis_client:
+            return False
+        try:
+            self.redis_client.zrem(key, *values)
+            return True
+        except Exception as e:
+            print(f"Error removing from sorted set in Redis: {e}")
+            return False
+
+    def hset(self, key: str, mapping: Dict[str, Any]) -> bool:
+        """
+        Set multiple fields of a Redis hash.
+
+        Args:
+            key: The hash key.
+            mapping: Field/value pairs to set.
+
+        Returns:
+            bool: True if successful, False otherwise.
+        """
+        if not self.redis_client:
+            return False
+        try:
+            self.redis_client.hset(key, mapping=mapping)
+            return True
+        except Exception as e:
+            print(f"Error setting hash fields in Redis: {e}")
+            return False
+
+    def hget(self, key: str, field: str) -> Optional[str]:
+        """
+        Get a single field of a Redis hash.
+
+        Args:
+            key: The hash key.
+            field: The field to get.
+
+        Returns:
+            Optional[str]: The value or None if not found or error.
+        """
+        if not self.redis_client:
+            return None
+        try:
+            return self.redis_client.hget(key, field)
+        except Exception as e:
+            print(f"Error getting hash field from Redis: {e}")
+            return None
+
+    def hmget(self, key: str, fields: List[str]) -> Optional[List[Optional[str]]]:
+        """
+        Get several fields of a Redis hash.
+
+        Args:
+            key: The hash key.
+            fields: The fields to get.
+
+        Returns:
+            Optional[List[Optional[str]]]: The values in field order (None where missing), or None on error.
+        """
+        if not self.redis_client:
+            return None
+        try:
+            return self.redis_client.hmget(key, fields)
+        except Exception as e:
+            print(f"Error getting hash fields from Redis: {e}")
+            return None
+
+    def pipeline(self, transaction: bool = True):
+        """
+        Create a pipeline for sending several commands in one round-trip.
+
+        Args:
+            transaction: Whether to wrap the commands in MULTI/EXEC.
+
+        Returns:
+            The pipeline or None if not connected.
+        """
+        if not self.redis_client:
+            return None
+        return self.redis_client.pipeline(transaction=transaction)
+
+    def execute(self, pipe, raise_on_error: bool = True) -> Optional[List[Any]]:
+        """
+        Execute a pipeline created by pipeline().
+
+        Args:
+            pipe: The pipeline to execute.
+            raise_on_error: If False, failed commands return their exception as
+                their result instead of failing the whole pipeline.
+
+        Returns:
+            Optional[List[Any]]: The command results or None if failed.
+        """
+        if pipe is None:
+            return None
+        try:
+            return pipe.execute(raise_on_error=raise_on_error)
+        except Exception as e:
+            print(f"Error executing Redis pipeline: {e}")
+            return None
+
+    def transaction(self, func: Callable, *watches: str, value_from_callable: bool = False) -> Optional[Any]:
+        """
+        Run func(pipe) as an optimistic WATCH/MULTI/EXEC transaction.
+
+        func may read the watched keys before calling pipe.multi(); it is
+        retried whenever one of them changes before EXEC.
+
+        Args:
+            func: Callable receiving the pipeline.
+            *watches: Keys to WATCH.
+            value_from_callable: Return what func returned instead of the command results.
+
+        Returns:
+            Optional[Any]: The command results (or func's return value) or None if failed.
+        """
+        if not self.redis_client:
+            return None
+        try:
+            return self.redis_client.transaction(func, *watches, value_from_callable=value_from_callable)
+        except Exception as e:
+            print(f"Error running Redis transaction: {e}")
+            return None
@@ -0,0 +1,241 @@
+import contextvars
+import functools
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Round-trips that send a queued pipeline are labelled with this command
+PIPELINE = "PIPELINE"
+
+# Modules whose frames are skipped when looking for the code that issued a command
+_PLUMBING = ("redis", "fakeredis", "services.redis_manager", "services.circuit_breaker", "services.redis_metrics")
+_CALLER_MODULES = ("services.", "web.", "main")
+
+
+def _caller() -> str:
+    """The service method (or other app function) that issued the current command."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if not module.startswith(_PLUMBING) and module.startswith(_CALLER_MODULES):
+            name = getattr(frame.f_code, "co_qualname", frame.f_code.co_name)
+            # Methods are named by their class, plain functions by their module
+            return name if "." in name else f"{module.rsplit('.', 1)[-1]}.{name}"
+        frame = frame.f_back
+    return "other"
+
+
+def _labels(**values) -> str:
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for value in values.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(values, escaped)) + "}"
+
+
+def _size(value: Any) -> int:
+    """Approximate payload size of command arguments or replies, in bytes."""
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, dict):
+        return sum(_size(k) + _size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sum(_size(item) for item in value)
+    return len(str(value))
+
+
+class RequestStats:
+    """Redis usage of one request, for the debug summary header."""
+
+    __slots__ = ("commands", "round_trips", "seconds", "sent", "received", "callers")
+
+    def __init__(self):
+        self.commands = 0
+        self.round_trips = 0
+        self.seconds = 0.0
+        self.sent = 0
+        self.received = 0
+        self.callers: Dict[str, int] = {}
+
+    def header(self) -> str:
+        """The summary, with the callers that made the most round-trips first."""
+        callers = ",".join(f"{caller}={count}" for caller, count in
+                           sorted(self.callers.items(), key=lambda item: -item[1])[:5])
+        return (f"round-trips={self.round_trips}; commands={self.commands}; time-ms={self.seconds * 1000:.2f}; "
+                f"sent={self.sent}; received={self.received}; callers={callers}")
+
+
+_request_stats: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "redis_request_stats", default=None)
+
+
+def start_request_stats() -> Tuple[RequestStats, contextvars.Token]:
+    """Start collecting the Redis usage of the current request; pass the token to end_request_stats."""
+    stats = RequestStats()
+    return stats, _request_stats.set(stats)
+
+
+def end_request_stats(token: contextvars.Token) -> None:
+    _request_stats.reset(token)
+
+
+class RedisMetrics:
+    """
+    Per-process counters of the Redis commands sent, by command and by the
+    service method that sent them: round-trips (a pipeline is one), commands
+    (every command in a pipeline counts), errors, payload bytes sent and
+    received, and a latency histogram per round-trip. `render` writes them in
+    the Prometheus text format.
+
+    Byte counts are the sizes of the arguments and replies, not of the
+    protocol framing around them.
+    """
+
+    def __init__(self, enabled: Optional[bool] = None):
+        if enabled is None:
+            enabled = os.getenv("REDIS_METRICS", "true").lower() in ("1", "true", "yes")
+        self.enabled = enabled
+        self._round_trips: Dict[Tuple[str, str], int] = {}
+        self._commands: Dict[Tuple[str, str], int] = {}
+        self._errors: Dict[Tuple[str, str], int] = {}
+        self._sent: Dict[str, int] = {}
+        self._received: Dict[str, int] = {}
+        self._latency: Dict[Tuple[str, str], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, command: str, caller: str, seconds: float, commands: Iterable[str] = (),
+               sent: int = 0, received: int = 0, failed: bool = False) -> None:
+        """Record one round-trip. `commands` are the commands it sent, if more than `command` itself."""
+        commands = list(commands) or [command]
+        key = (command, caller)
+        with self._lock:
+            self._round_trips[key] = self._round_trips.get(key, 0) + 1
+            for name in commands:
+                self._commands[(name, caller)] = self._commands.get((name, caller), 0) + 1
+            if failed:
+                self._errors[key] = self._errors.get(key, 0) + 1
+            self._sent[caller] = self._sent.get(caller, 0) + sent
+            self._received[caller] = self._received.get(caller, 0) + received
+            # Bucket counts, then the sum of all observations
+            histogram = self._latency.setdefault(key, [0] * (len(LATENCY_BUCKETS) + 1) + [0.0])
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[len(LATENCY_BUCKETS)] += 1
+            histogram[-1] += seconds
+
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.round_trips += 1
+            stats.commands += len(commands)
+            stats.seconds += seconds
+            stats.sent += sent
+            stats.received += received
+            stats.callers[caller] = stats.callers.get(caller, 0) + 1
+
+    def call(self, func, command: Optional[str], *args, **kwargs) -> Any:
+        """Call func, which sends one round-trip, and record it."""
+        queued = kwargs.pop("_queued", None)
+        caller = _caller()
+        if queued is not None:
+            commands = [str(cmd_args[0]).upper() for cmd_args, _ in queued]
+            sent = sum(_size(cmd_args) for cmd_args, _ in queued)
+        else:
+            commands = ()
+            command = str(args[0]).upper() if args else "UNKNOWN"
+            sent = _size(args)
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record(command, caller, time.perf_counter() - start, commands, sent, failed=True)
+            raise
+        self.record(command, caller, time.perf_counter() - start, commands, sent, _size(result))
+        return result
+
+    def reset(self) -> None:
+        with self._lock:
+            for counters in (self._round_trips, self._commands, self._errors, self._sent, self._received,
+                             self._latency):
+                counters.clear()
+
+    def render(self, circuit_states: Iterable[Tuple[str, bool]] = ()) -> str:
+        """The metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            for name, help_text, counters in (
+                ("redis_round_trips_total", "Round-trips to Redis; a pipeline or transaction is one.",
+                 self._round_trips),
+                ("redis_commands_total", "Commands sent to Redis, including those inside pipelines.",
+                 self._commands),
+                ("redis_command_errors_total", "Round-trips that failed or were refused by the circuit breaker.",
+                 self._errors),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for (command, caller), count in sorted(counters.items()):
+                    lines.append(f"{name}{_labels(command=command, caller=caller)} {count}")
+
+            for name, help_text, counters in (
+                ("redis_sent_bytes_total", "Payload bytes of command arguments sent to Redis.", self._sent),
+                ("redis_received_bytes_total", "Payload bytes of replies received from Redis.", self._received),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for caller, count in sorted(counters.items()):
+                    lines.append(f"{name}{_labels(caller=caller)} {count}")
+
+            name = "redis_round_trip_duration_seconds"
+            lines += [f"# HELP {name} Time from sending a round-trip to Redis to receiving its reply.",
+                      f"# TYPE {name} histogram"]
+            for (command, caller), histogram in sorted(self._latency.items()):
+                for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), histogram):
+                    lines.append(f"{name}_bucket{_labels(command=command, caller=caller, le=bound)} {count}")
+                lines.append(f"{name}_sum{_labels(command=command, caller=caller)} {histogram[-1]:.6f}")
+                lines.append(f"{name}_count{_labels(command=command, caller=caller)} {histogram[len(LATENCY_BUCKETS)]}")
+
+        circuit_states = list(circuit_states)
+        if circuit_states:
+            name = "redis_circuit_open"
+            lines += [f"# HELP {name} Whether commands to Redis are being refused by the circuit breaker.",
+                      f"# TYPE {name} gauge"]
+            for client, is_open in circuit_states:
+                lines.append(f"{name}{_labels(client=client)} {int(is_open)}")
+        return "\n".join(lines) + "\n"
+
+
+# The metrics of every RedisManager in this process
+redis_metrics = RedisMetrics()
+
+
+def instrument_client(client, metrics: RedisMetrics):
+    """
+    Record every round-trip of a client, including those of its pipelines
+    and transactions, in metrics. A client is only instrumented once.
+    """
+    if not metrics.enabled or getattr(client, "redis_metrics", None) is not None:
+        return client
+    client.redis_metrics = metrics
+    client.execute_command = functools.partial(metrics.call, client.execute_command, None)
+    pipeline = client.pipeline
+
+    def instrumented_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        execute = pipe.execute
+
+        def instrumented_execute(*execute_args, **execute_kwargs):
+            # Copy the stack: execute empties it
+            return metrics.call(execute, PIPELINE, *execute_args, _queued=list(pipe.command_stack),
+                                **execute_kwargs)
+
+        pipe.execute = instrumented_execute
+        pipe.immediate_execute_command = functools.partial(metrics.call, pipe.immediate_execute_command, None)
+        return pipe
+
+    client.pipeline = instrumented_pipeline
+    return client
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import time
+from typing import Any, List, Optional, Sequence
+
+from services.course import CourseStatus
+
+
+class SidebarSnapshot:
+    """
+    The featured and trending course lists shown on every page, computed once
+    per process and refreshed in the background.
+
+    Pages read the current lists without touching Redis; a background task
+    recomputes them every `refresh_seconds` and swaps both lists in at once,
+    so a page never sees featured courses from one refresh and trending
+    courses from another. If a list cannot be read, or Redis has none yet,
+    the previous list (initially the given fallback) is kept.
+    """
+
+    def __init__(self, course_service, size: Optional[int] = None, refresh_seconds: Optional[float] = None,
+                 fallback_featured: Sequence[Any] = (), fallback_trending: Sequence[Any] = ()):
+        self.course_service = course_service
+        self.size = size or int(os.getenv("SIDEBAR_SIZE", "5"))
+        self.refresh_seconds = refresh_seconds or float(os.getenv("SIDEBAR_REFRESH_SECONDS", "60"))
+        self._lists = (list(fallback_featured), list(fallback_trending))
+        self.refreshed_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def featured(self) -> List[Any]:
+        return self._lists[0]
+
+    @property
+    def trending(self) -> List[Any]:
+        return self._lists[1]
+
+    async def refresh(self) -> bool:
+        """Recompute both lists. Returns False if they could not be read."""
+        try:
+            featured = await self.course_service.list_course_cards(
+                limit=self.size, filters={"status": CourseStatus.PUBLISHED, "featured": True})
+            trending = await self.course_service.list_course_cards(
+                limit=self.size, filters={"status": CourseStatus.PUBLISHED, "trending": True})
+        except Exception as e:
+            print(f"Error refreshing sidebar courses: {e}")
+            return False
+        self._lists = (featured or self._lists[0], trending or self._lists[1])
+        self.refreshed_at = time.time()
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self) -> None:
+        """Start refreshing in the background on the running event loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background refresh."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,111 @@
+import math
+import os
+import time
+from typing import List, Optional
+
+TRENDING_KEY_PREFIX = "trending:scores"
+# The hand-filled set used before scores existed; served until there is engagement to rank
+LEGACY_TRENDING_KEY = "trending_courses"
+
+# Scores are kept per epoch of this many half-lives, so increments never grow past 2**EPOCH_HALF_LIVES
+EPOCH_HALF_LIVES = 32
+
+
+class TrendingService:
+    """
+    Trending courses ranked by time-decayed engagement.
+
+    Each view or enrollment adds `weight * 2 ** ((now - epoch_start) / half_life)`
+    to the course's score in a sorted set ("forward decay"). Newer events
+    count exponentially more than older ones, which ranks courses exactly as
+    if every score halved each half-life, but no score is ever rewritten to
+    decay it: an event is one ZINCRBY and the top k is one ZREVRANGE.
+
+    To keep increments small, scores live in one sorted set per epoch of
+    EPOCH_HALF_LIVES half-lives. The first process to reach a new epoch
+    carries the previous epoch's scores over, scaled to the new start, so the
+    ranking continues seamlessly.
+    """
+
+    def __init__(self, redis_manager=None, half_life_hours: Optional[float] = None,
+                 view_weight: Optional[float] = None, enrollment_weight: Optional[float] = None,
+                 max_size: int = 10000):
+        self.redis_manager = redis_manager
+        self.half_life = 3600 * (half_life_hours or float(os.getenv("TRENDING_HALF_LIFE_HOURS", "24")))
+        self.view_weight = view_weight or float(os.getenv("TRENDING_VIEW_WEIGHT", "1"))
+        self.enrollment_weight = enrollment_weight or float(os.getenv("TRENDING_ENROLLMENT_WEIGHT", "10"))
+        self.max_size = max_size
+        self._current_epoch = None
+
+    async def record_view(self, course_id: int, now: Optional[float] = None) -> bool:
+        """Count a view of a course's page."""
+        return self._record(course_id, self.view_weight, now)
+
+    async def record_enrollment(self, course_id: int, now: Optional[float] = None) -> bool:
+        """Count an enrollment in a course."""
+        return self._record(course_id, self.enrollment_weight, now)
+
+    def _epoch(self, now: float) -> int:
+        return math.floor(now / (self.half_life * EPOCH_HALF_LIVES))
+
+    @staticmethod
+    def _scores_key(epoch: int) -> str:
+        return f"{TRENDING_KEY_PREFIX}:{epoch}"
+
+    def _enter_epoch(self, epoch: int) -> None:
+        """Carry the previous epoch's scores into this one, once across all processes."""
+        if epoch == self._current_epoch:
+            return
+        marker = f"{self._scores_key(epoch)}:carried"
+        previous = self._scores_key(epoch - 1)
+        current = self._scores_key(epoch)
+
+        def carry(pipe):
+            if pipe.exists(marker):
+                return True
+            pipe.multi()
+            # Sum rather than overwrite: other processes may already be counting into this epoch
+            pipe.zunionstore(current, {current: 1, previous: 2 ** -EPOCH_HALF_LIVES})
+            pipe.set(marker, 1)
+            # The previous epoch is only needed until it is carried over
+            pipe.expire(previous, int(self.half_life))
+            pipe.expire(marker, int(self.half_life * EPOCH_HALF_LIVES * 2))
+            return True
+
+        if self.redis_manager.transaction(carry, marker, value_from_callable=True):
+            self._current_epoch = epoch
+
+    def _record(self, course_id: int, weight: float, now: Optional[float]) -> bool:
+        if self.redis_manager is None:
+            return False
+        now = time.time() if now is None else now
+        epoch = self._epoch(now)
+        self._enter_epoch(epoch)
+
+        epoch_start = epoch * self.half_life * EPOCH_HALF_LIVES
+        key = self._scores_key(epoch)
+        pipe = self.redis_manager.pipeline(transaction=False)
+        if pipe is None:
+            return False
+        pipe.zincrby(key, weight * 2 ** ((now - epoch_start) / self.half_life), course_id)
+        # Drop the least engaged courses so the set stays bounded
+        pipe.zremrangebyrank(key, 0, -self.max_size - 1)
+        return self.redis_manager.execute(pipe) is not None
+
+    def top_ids(self, k: int, now: Optional[float] = None) -> List[int]:
+        """IDs of the k most trending courses, most trending first."""
+        if k <= 0 or self.redis_manager is None:
+            return []
+        client = self.redis_manager.get_client()
+        if client is None:
+            return []
+        epoch = self._epoch(time.time() if now is None else now)
+        self._enter_epoch(epoch)
+        try:
+            course_ids = client.zrevrange(self._scores_key(epoch), 0, k - 1)
+            if not course_ids:
+                course_ids = sorted(client.smembers(LEGACY_TRENDING_KEY))[:k]
+        except Exception as e:
+            print(f"Error getting trending courses from Redis: {e}")
+            return []
+        return [int(course_id) for course_id in course_ids]
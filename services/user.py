@@ -3,11 +3,17 @@ from pydantic import BaseModel, EmailStr
 from enum import Enum
 from datetime import datetime
 import json
+import time
 import uuid
 from services.redis_manager import RedisManager
+from services.admin_stats import AdminStats, user_changes
 from passlib.context import CryptContext
 
 
+# Set once the users stored before the user ID index existed have been indexed
+USER_ID_INDEX_BUILT_KEY = "user_id_index_built"
+
+
 class DateTimeEncoder(json.JSONEncoder):
     """Custom JSON encoder that handles datetime objects."""
     def default(self, obj):
@@ -43,11 +49,21 @@ class UserService:
     # Password hashing context
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-    def __init__(self):
+    def __init__(self, redis_manager: Optional[RedisManager] = None):
         """Initialize the UserService with Redis connection."""
         # Initialize the Redis manager
-        self.redis_manager = RedisManager()
-        self.redis_client = self.redis_manager.get_client()
+        self.redis_manager = redis_manager or RedisManager()
+        self.stats = AdminStats(self.redis_manager)
+
+    @property
+    def redis_client(self):
+        """The manager's Redis client, which connects on first use."""
+        return self.redis_manager.get_client()
+
+    @staticmethod
+    def _id_key(user_id) -> str:
+        """Key mapping a user ID to the username the user is stored under."""
+        return f"user_id:{user_id}"
 
     async def create_user(self, user_data: dict) -> User:
         """Create a new user and store in a Redis database."""
@@ -65,12 +81,14 @@ class UserService:
         # Store user in Redis
         if self.redis_client:
             try:
-                # Convert user to JSON string using custom encoder for datetime
-                user_json = json.dumps(user.dict(), cls=DateTimeEncoder)
+                # Encode the user in the configured document format
+                user_json = self.redis_manager.encode_doc(user.dict())
 
                 # Store in Redis using username as key
                 user_key = f"user:{user.username}"
+                previous = self.redis_manager.decode_doc(self.redis_client.get(user_key))
                 self.redis_client.set(user_key, user_json)
+                self.redis_client.set(self._id_key(user.id), user.username)
 
                 # Also store by email for lookup
                 email_key = f"email:{user.email}"
@@ -84,6 +102,8 @@ class UserService:
 
                 # Add to users set
                 self.redis_client.sadd("users", user.username)
+                self.stats.apply(user_changes(previous.get("role", UserRole.STUDENT) if previous else None,
+                                              user.role))
             except Exception as e:
                 print(f"Error storing user in Redis: {e}")
 
@@ -95,17 +115,76 @@ class UserService:
             return None
 
         try:
-            # In our implementation, we're using username as the primary key
-            # So we need to scan through users to find by ID
-            all_users = await self.list_users()
-            for user in all_users:
-                if str(user.id) == str(user_id):
+            # Users are stored by username; the ID index points to it (see build_id_index)
+            username = self.redis_client.get(self._id_key(user_id))
+            if username:
+                user = await self.get_user_by_username(username)
+                if user and str(user.id) == str(user_id):
                     return user
             return None
         except Exception as e:
             print(f"Error retrieving user from Redis: {e}")
             return None
 
+    async def build_id_index(self, batch_size: int = 500) -> int:
+        """
+        Index the users stored before the user ID index existed, so lookups by
+        ID never scan the users set. Run at startup; once it has completed,
+        the marker key makes it a single EXISTS.
+
+        Returns:
+            int: The number of users indexed.
+        """
+        if not self.redis_client:
+            return 0
+
+        try:
+            if self.redis_client.exists(USER_ID_INDEX_BUILT_KEY):
+                return 0
+            indexed = 0
+            for usernames in self.redis_manager.sscan("users", count=batch_size):
+                pipe = self.redis_manager.pipeline(transaction=False)
+                if pipe is None:
+                    return indexed
+                for user_data in self.redis_manager.mget_docs([f"user:{name}" for name in usernames]):
+                    if user_data and user_data.get("id") is not None:
+                        # Users written meanwhile are indexed already
+                        pipe.set(self._id_key(user_data["id"]), user_data["username"], nx=True)
+                        indexed += 1
+                if self.redis_manager.execute(pipe) is None:
+                    return indexed
+            self.redis_client.set(USER_ID_INDEX_BUILT_KEY, int(time.time()))
+            return indexed
+        except Exception as e:
+            print(f"Error building the user ID index: {e}")
+            return 0
+
+    async def get_users(self, user_ids: List[int]) -> List[Optional[User]]:
+        """
+        Get several users by ID with two MGETs, in the order given. Users
+        stored before the ID index existed are found once build_id_index has
+        run at startup; IDs of users that do not exist come back as None.
+        """
+        user_ids = list(user_ids)
+        if not self.redis_client or not user_ids:
+            return [None] * len(user_ids)
+
+        try:
+            usernames = self.redis_client.mget([self._id_key(user_id) for user_id in user_ids])
+            found = [username for username in usernames if username]
+            docs = iter(self.redis_manager.mget_docs([f"user:{username}" for username in found]))
+            users = []
+            for user_id, username in zip(user_ids, usernames):
+                user_data = next(docs) if username else None
+                if user_data and str(user_data.get("id")) == str(user_id):
+                    users.append(User(**user_data))
+                else:
+                    users.append(None)
+            return users
+        except Exception as e:
+            print(f"Error retrieving users from Redis: {e}")
+            return [None] * len(user_ids)
+
     async def get_user_by_username(self, username: str) -> Optional[User]:
         """Get a user by username."""
         if not self.redis_client:
@@ -113,9 +192,8 @@ class UserService:
 
         try:
             user_key = f"user:{username}"
-            user_json = self.redis_client.get(user_key)
-            if user_json:
-                user_data = json.loads(user_json)
+            user_data = self.redis_manager.decode_doc(self.redis_client.get(user_key))
+            if user_data:
                 return User(**user_data)
             return None
         except Exception as e:
@@ -146,7 +224,9 @@ class UserService:
 
             # Store in Redis
             user_key = f"user:{updated_user.username}"
-            self.redis_client.set(user_key, json.dumps(updated_user.dict(), cls=DateTimeEncoder))
+            self.redis_client.set(user_key, self.redis_manager.encode_doc(updated_user.dict()))
+            self.redis_client.set(self._id_key(updated_user.id), updated_user.username)
+            self.stats.apply(user_changes(existing_user.role, updated_user.role))
 
             # Update password if provided (with hashing)
             if password:
@@ -178,7 +258,9 @@ class UserService:
             self.redis_client.delete(user_key)
             self.redis_client.delete(email_key)
             self.redis_client.delete(password_key)
-            self.redis_client.srem("users", existing_user.username)
+            self.redis_client.delete(self._id_key(existing_user.id))
+            if self.redis_client.srem("users", existing_user.username):
+                self.stats.apply(user_changes(existing_user.role, None))
 
             return True
         except Exception as e:
@@ -191,19 +273,19 @@ class UserService:
             return []
 
         try:
-            # Get all usernames from the users set
-            usernames = self.redis_client.smembers("users")
+            # Walk the users set only as far as the page, instead of loading all of it
+            usernames = []
+            for batch in self.redis_manager.sscan("users", count=max(skip + limit, 100)):
+                usernames.extend(batch)
+                if len(usernames) >= skip + limit:
+                    break
+            page = usernames[skip:skip + limit]
 
             users = []
-            for username in usernames:
-                user_key = f"user:{username}"
-                user_json = self.redis_client.get(user_key)
-                if user_json:
-                    user_data = json.loads(user_json)
+            for user_data in self.redis_manager.mget_docs([f"user:{username}" for username in page]):
+                if user_data:
                     users.append(User(**user_data))
-
-            # Apply pagination
-            return users[skip:skip+limit]
+            return users
         except Exception as e:
             print(f"Error listing users from Redis: {e}")
             return []
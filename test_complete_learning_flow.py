@@ -6,6 +6,8 @@ from services.course import CourseService, Course, CourseLevel, CourseStatus
 from services.content import ContentService, Module, Lesson, ContentType
 from services.enrollment import EnrollmentService, Enrollment, EnrollmentStatus
 from services.progress import ProgressService, LessonProgress, ModuleProgress, CourseProgress, ProgressStatus
+from services.id_allocator import IdAllocator
+from services.codec import get_codec, decode_document
 
 # Mock Redis implementation for testing
 class MockRedisManager:
@@ -59,17 +61,28 @@ class MockRedisManager:
         print(f"Mock Redis: DEL {key}")
         return True
 
+    def encode_doc(self, doc):
+        return get_codec("json").encode(doc)
+
+    def decode_doc(self, data):
+        return decode_document(data) if data else None
+
+    def pipeline(self, transaction=True):
+        # Pipelines are not mocked; callers fall back to their non-Redis paths
+        return None
+
 class EnhancedEnrollmentService(EnrollmentService):
     """Enhanced enrollment service with Redis storage"""
 
-    def __init__(self, redis_manager):
+    def __init__(self, redis_manager, id_allocator=None):
         super().__init__()
         self.redis_manager = redis_manager
+        self.id_allocator = id_allocator or IdAllocator(redis_manager)
 
     async def enroll_user(self, user_id: int, course_id: int) -> Enrollment:
         """Enroll a user in a course and save to Redis."""
         enrollment_data = {
-            "id": int(datetime.now().timestamp()),
+            "id": self.id_allocator.next_id("enrollment"),
             "user_id": user_id,
             "course_id": course_id,
             "status": EnrollmentStatus.ACTIVE,
@@ -77,14 +90,9 @@ class EnhancedEnrollmentService(EnrollmentService):
         }
         enrollment = Enrollment(**enrollment_data)
 
-        # Convert to dict for Redis storage
-        enrollment_dict = enrollment.dict()
-        enrollment_dict["enrolled_at"] = enrollment_dict["enrolled_at"].isoformat()
-        enrollment_dict["status"] = enrollment_dict["status"].value
-
         # Save to Redis
         enrollment_key = f"enrollment:{enrollment.id}"
-        self.redis_manager.set(enrollment_key, json.dumps(enrollment_dict))
+        self.redis_manager.set(enrollment_key, self.redis_manager.encode_doc(enrollment.dict()))
 
         # Add to user enrollments set
         user_enrollments_key = f"user:{user_id}:enrollments"
@@ -103,9 +111,8 @@ class EnhancedEnrollmentService(EnrollmentService):
 
         for enrollment_id in enrollment_ids:
             enrollment_key = f"enrollment:{enrollment_id}"
-            enrollment_json = self.redis_manager.get(enrollment_key)
-            if enrollment_json:
-                enrollment_dict = json.loads(enrollment_json)
+            enrollment_dict = self.redis_manager.decode_doc(self.redis_manager.get(enrollment_key))
+            if enrollment_dict:
                 if enrollment_dict["course_id"] == course_id and enrollment_dict["status"] == EnrollmentStatus.ACTIVE.value:
                     return True
 
@@ -113,31 +120,15 @@ class EnhancedEnrollmentService(EnrollmentService):
 
     async def get_user_enrollments(self, user_id: int) -> List[Enrollment]:
         """Get all enrollments for a specific user."""
-        from datetime import datetime
-
         user_enrollments_key = f"user:{user_id}:enrollments"
         enrollment_ids = self.redis_manager.smembers(user_enrollments_key)
         enrollments = []
 
         for enrollment_id in enrollment_ids:
             enrollment_key = f"enrollment:{enrollment_id}"
-            enrollment_json = self.redis_manager.get(enrollment_key)
-            if enrollment_json:
+            enrollment_dict = self.redis_manager.decode_doc(self.redis_manager.get(enrollment_key))
+            if enrollment_dict:
                 try:
-                    enrollment_dict = json.loads(enrollment_json)
-
-                    # Convert string dates back to datetime objects
-                    if "enrolled_at" in enrollment_dict:
-                        enrollment_dict["enrolled_at"] = datetime.fromisoformat(enrollment_dict["enrolled_at"])
-                    if "completed_at" in enrollment_dict and enrollment_dict["completed_at"]:
-                        enrollment_dict["completed_at"] = datetime.fromisoformat(enrollment_dict["completed_at"])
-                    if "expiry_date" in enrollment_dict and enrollment_dict["expiry_date"]:
-                        enrollment_dict["expiry_date"] = datetime.fromisoformat(enrollment_dict["expiry_date"])
-
-                    # Convert status string back to enum
-                    if "status" in enrollment_dict:
-                        enrollment_dict["status"] = EnrollmentStatus(enrollment_dict["status"])
-
                     enrollments.append(Enrollment(**enrollment_dict))
                 except Exception as e:
                     print(f"Error parsing enrollment data: {e}")
@@ -148,8 +139,7 @@ class EnhancedContentService(ContentService):
     """Enhanced content service that uses the provided Redis manager"""
 
     def __init__(self, redis_manager):
-        super().__init__()
-        self.redis_manager = redis_manager
+        super().__init__(redis_manager, IdAllocator(redis_manager))
 
     async def create_module(self, module_data: dict) -> Module:
         """Create a new module and save to Redis using the provided Redis manager."""
@@ -158,7 +148,7 @@ class EnhancedContentService(ContentService):
 
         module = Module(**module_data)
         if not module.id:
-            module.id = int(datetime.now().timestamp())
+            module.id = self._get_id_allocator().next_id("module")
 
         # Convert datetime objects to strings for JSON serialization
         module_dict = module.dict()
@@ -184,7 +174,7 @@ class EnhancedContentService(ContentService):
 
         # Generate a unique ID if not provided
         if not lesson.id:
-            lesson.id = int(datetime.now().timestamp())
+            lesson.id = self._get_id_allocator().next_id("lesson")
 
         # Create a dictionary from the lesson for Redis storage
         lesson_dict = lesson.dict()
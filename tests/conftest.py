@@ -0,0 +1,25 @@
+import pytest
+
+from services.redis_manager import RedisManager
+
+
+@pytest.fixture
+def redis_manager():
+    """A RedisManager backed by an in-memory fake Redis server."""
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisManager(client=fakeredis.FakeRedis(decode_responses=True))
+
+
+@pytest.fixture
+def app(monkeypatch):
+    """The main module, with its shared manager pointed at a fake Redis server."""
+    fakeredis = pytest.importorskip("fakeredis")
+    import main
+    from services.circuit_breaker import CircuitBreaker
+
+    # Without it trying to connect first
+    manager = main.redis_manager
+    monkeypatch.setattr(manager, "circuit", CircuitBreaker())
+    monkeypatch.setattr(manager, "_connect_attempted", True)
+    monkeypatch.setattr(manager, "_redis_client", manager._wrap(fakeredis.FakeRedis(decode_responses=True)))
+    return main
@@ -0,0 +1,105 @@
+import asyncio
+
+from services.admin_stats import STATS_KEY, AdminStats, courses_field, users_field
+from services.course import CourseService, CourseStatus
+from services.user import UserRole, UserService
+
+
+def test_counters_follow_user_writes(redis_manager):
+    async def run():
+        user_service = UserService(redis_manager)
+        stats = AdminStats(redis_manager)
+        alice = await user_service.create_user({"id": 1, "username": "alice", "email": "a@example.com",
+                                                "full_name": "Alice"})
+        await user_service.create_user({"id": 2, "username": "bob", "email": "b@example.com",
+                                        "full_name": "Bob", "role": UserRole.INSTRUCTOR})
+        # Writing an existing user again does not count them twice
+        await user_service.create_user({"id": 2, "username": "bob", "email": "b@example.com",
+                                        "full_name": "Bob", "role": UserRole.INSTRUCTOR})
+        counts = stats.get()
+        assert counts[users_field()] == 2
+        assert counts[users_field(UserRole.STUDENT)] == 1
+        assert counts[users_field(UserRole.INSTRUCTOR)] == 1
+
+        await user_service.update_user(alice.id, {"role": UserRole.ADMIN})
+        await user_service.delete_user(2)
+        counts = stats.get()
+        assert counts[users_field()] == 1
+        assert counts[users_field(UserRole.ADMIN)] == 1
+        assert counts[users_field(UserRole.STUDENT)] == 0
+        assert counts[users_field(UserRole.INSTRUCTOR)] == 0
+
+    asyncio.run(run())
+
+
+def test_counters_follow_course_writes(redis_manager):
+    async def run():
+        course_service = CourseService(redis_manager=redis_manager)
+        for course_id in (1, 2):
+            await course_service.create_course({"id": course_id, "title": "C", "description": "", "instructor_id": 1})
+        await course_service.update_course(2, {"status": "published"})
+        await course_service.update_course(2, {"title": "Renamed"})
+        counts = AdminStats(redis_manager).get()
+        assert counts[courses_field()] == 2
+        assert counts[courses_field(CourseStatus.PENDING)] == 1
+        assert counts[courses_field(CourseStatus.PUBLISHED)] == 1
+
+    asyncio.run(run())
+
+
+def test_existing_data_is_counted_once_at_startup(redis_manager):
+    redis_manager.set("user:carol", redis_manager.encode_doc(
+        {"id": 3, "username": "carol", "email": "c@example.com", "full_name": "Carol", "role": "admin"}))
+    redis_manager.sadd("users", "carol")
+    redis_manager.set_doc("course:5", {"id": 5, "title": "C", "status": "archived"})
+    redis_manager.sadd("all_courses", 5)
+    # A counter for a status nothing has any more
+    redis_manager.get_client().hset(STATS_KEY, courses_field("draft"), 4)
+
+    stats = AdminStats(redis_manager)
+    counts = asyncio.run(stats.count_existing())
+    assert counts[users_field()] == 1 and counts[users_field("admin")] == 1
+    assert counts[courses_field()] == 1 and counts[courses_field("archived")] == 1
+    assert stats.get() == {**counts, courses_field("draft"): 0}
+
+    # Later startups and reads use the counters without recounting
+    stats.recount = None
+    assert asyncio.run(stats.count_existing()) is None
+    assert stats.get()[users_field()] == 1
+
+
+def test_recount_retries_when_a_counter_changes_meanwhile(redis_manager):
+    redis_manager.set("user:carol", redis_manager.encode_doc(
+        {"id": 3, "username": "carol", "email": "c@example.com", "full_name": "Carol"}))
+    redis_manager.sadd("users", "carol")
+    stats = AdminStats(redis_manager)
+    count = stats._count
+    calls = []
+
+    def count_while_a_user_is_created():
+        calls.append(1)
+        if len(calls) == 1:
+            # Created after the scan read the users set
+            counts = count()
+            redis_manager.set("user:dora", redis_manager.encode_doc(
+                {"id": 4, "username": "dora", "email": "d@example.com", "full_name": "Dora"}))
+            redis_manager.sadd("users", "dora")
+            stats.apply({users_field(): 1, users_field("student"): 1})
+            return counts
+        return count()
+
+    stats._count = count_while_a_user_is_created
+    assert stats.recount()[users_field()] == 2
+    assert len(calls) == 2 and stats.get()[users_field()] == 2
+
+
+def test_users_are_found_by_id_through_the_index(redis_manager):
+    async def run():
+        user_service = UserService(redis_manager)
+        await user_service.create_user({"id": 7, "username": "dave", "email": "d@example.com", "full_name": "Dave"})
+        redis_manager.sadd("users", *[f"ghost{i}" for i in range(50)])
+        assert (await user_service.get_user(7)).username == "dave"
+        assert await user_service.get_user(8) is None
+        assert len(await user_service.list_users(limit=10)) <= 10
+
+    asyncio.run(run())
@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+from services.analytics import DAY, HOUR, MINUTE, AnalyticsService, choose_resolution, parse_range
+
+
+def test_parse_range_and_resolution():
+    assert parse_range("90m") == 90 * MINUTE
+    assert parse_range("24h") == DAY
+    assert parse_range("2w") == 14 * DAY
+    assert parse_range("0h") is None and parse_range("soon") is None and parse_range(None) is None
+
+    assert choose_resolution(DAY).name == "minute"
+    assert choose_resolution(7 * DAY).name == "hour"
+    assert choose_resolution(365 * DAY).name == "day"
+    assert choose_resolution(10 * 365 * DAY) is None
+
+
+def test_events_are_counted_at_every_resolution(redis_manager):
+    analytics = AnalyticsService(redis_manager)
+    now = time.time() // DAY * DAY + 12 * HOUR
+    analytics.record("enrollments", now=now - 90)
+    analytics.record("enrollments", now=now - 30)
+    analytics.record("enrollments", now=now - 2 * HOUR)
+
+    minutes = analytics.series("enrollments", 5 * MINUTE, now=now)
+    assert minutes["resolution"] == "minute"
+    assert [point["value"] for point in minutes["points"]] == [0, 0, 1, 1, 0]
+    assert minutes["total"] == 2
+
+    hours = analytics.series("enrollments", 7 * DAY, now=now)
+    assert hours["resolution"] == "hour" and len(hours["points"]) == 7 * 24
+    assert [point["value"] for point in hours["points"][-3:]] == [1, 2, 0]
+
+    days = analytics.series("enrollments", 365 * DAY, now=now)
+    assert days["resolution"] == "day" and days["points"][-1]["value"] == 3
+
+
+def test_payments_add_revenue(redis_manager):
+    analytics = AnalyticsService(redis_manager)
+    asyncio.run(analytics.record_payment(49.99))
+    asyncio.run(analytics.record_payment(10))
+    assert analytics.series("payments", HOUR)["total"] == 2
+    assert round(analytics.series("revenue", HOUR)["total"], 2) == 59.99
+    assert analytics.series("refunds", HOUR) is None
+    # Nothing records completions yet, so they are not offered as a metric
+    assert analytics.series("completions", HOUR) is None
+
+
+def test_buckets_expire_with_their_resolution(redis_manager):
+    analytics = AnalyticsService(redis_manager)
+    analytics.record("page_views")
+    client = redis_manager.get_client()
+    ttls = {key.split(":")[2]: client.ttl(key) for key in client.keys("analytics:page_views:*")}
+    assert 2 * DAY <= ttls["minute"] <= 2 * DAY + HOUR
+    assert ttls["minute"] < ttls["hour"] < ttls["day"]
+
+    # Events older than a resolution's retention are gone at that resolution
+    analytics.record("page_views", now=time.time() - 3 * DAY)
+    assert len(client.keys("analytics:page_views:minute:*")) == 1
@@ -0,0 +1,88 @@
+import asyncio
+from services.content import ContentService, ContentType
+
+
+def lesson_data(lesson_id, module_id, order):
+    return {
+        "id": lesson_id,
+        "module_id": module_id,
+        "title": f"Lesson {lesson_id}",
+        "description": "",
+        "content_type": ContentType.TEXT,
+        "content": "",
+        "order": order
+    }
+
+
+def test_create_lesson_writes_all_keys_in_one_transaction(redis_manager):
+    async def run():
+        content_service = ContentService(redis_manager)
+        await content_service.create_module({"id": 1, "course_id": 9, "title": "M", "description": "", "order": 1})
+
+        client = redis_manager.redis_client
+        pipelines = []
+        original_pipeline = client.pipeline
+
+        def recording_pipeline(*args, **kwargs):
+            pipe = original_pipeline(*args, **kwargs)
+            pipelines.append(pipe)
+            return pipe
+
+        client.pipeline = recording_pipeline
+        await content_service.create_lesson(lesson_data(11, 1, 1), instructor_id=5)
+
+        # Reads of the course's indexes are not transactions; the writes are one
+        assert len([pipe for pipe in pipelines if pipe.transaction]) == 1
+        assert redis_manager.get("lesson:11") is not None
+        assert redis_manager.zrange("module:1:lessons") == ["11"]
+        assert redis_manager.smembers("instructor:5:lessons") == {"11"}
+        assert redis_manager.hget("course:9:lesson_nav", "11") is not None
+
+    asyncio.run(run())
+
+
+def test_failed_write_leaves_nothing_behind(redis_manager):
+    async def run():
+        content_service = ContentService(redis_manager)
+        await content_service.create_module({"id": 1, "course_id": 9, "title": "M", "description": "", "order": 1})
+
+        # Make EXEC fail after the commands have been queued
+        client = redis_manager.redis_client
+        original_pipeline = client.pipeline
+
+        def lost_connection(*args, **kwargs):
+            raise ConnectionError("lost connection")
+
+        def failing_pipeline(*args, **kwargs):
+            pipe = original_pipeline(*args, **kwargs)
+            if pipe.transaction:
+                pipe.execute = lost_connection
+            return pipe
+
+        client.pipeline = failing_pipeline
+        await content_service.create_lesson(lesson_data(11, 1, 1))
+
+        assert redis_manager.get("lesson:11") is None
+        assert redis_manager.zrange("module:1:lessons") == []
+
+    asyncio.run(run())
+
+
+def test_delete_module_cascades_in_one_batch(redis_manager):
+    async def run():
+        content_service = ContentService(redis_manager)
+        await content_service.create_module({"id": 1, "course_id": 9, "title": "A", "description": "", "order": 1})
+        await content_service.create_module({"id": 2, "course_id": 9, "title": "B", "description": "", "order": 2})
+        for lesson_id in (11, 12, 13):
+            await content_service.create_lesson(lesson_data(lesson_id, 1, lesson_id))
+        await content_service.create_lesson(lesson_data(21, 2, 1))
+
+        assert await content_service.delete_module(1)
+
+        assert redis_manager.mget(["lesson:11", "lesson:12", "lesson:13", "module:1"]) == [None] * 4
+        assert redis_manager.type("module:1:lessons") == "none"
+        assert redis_manager.zrange("course:9:modules") == ["2"]
+        nav = await content_service.get_lesson_navigation(9, 21)
+        assert (nav.position, nav.total) == (1, 1)
+
+    asyncio.run(run())
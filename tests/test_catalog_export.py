@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+from services.catalog_export import CatalogExportService
+from services.catalog_import import CatalogImportService
+from services.content import ContentService
+from services.id_allocator import IdAllocator
+
+
+def test_export_round_trips_through_import(redis_manager):
+    async def run():
+        lines = [json.dumps({
+            "id": 7, "title": "Course", "description": "", "instructor_id": 1,
+            "modules": [{"id": 70, "title": "M", "description": "", "order": 1, "lessons": [
+                {"id": 700, "title": "L2", "description": "", "content_type": "text", "content": "b", "order": 2},
+                {"id": 701, "title": "L1", "description": "", "content_type": "text", "content": "a", "order": 1},
+            ]}]
+        })]
+        await CatalogImportService(redis_manager, IdAllocator(redis_manager)).import_ndjson(lines)
+
+        exported = list(CatalogExportService(redis_manager, batch_size=1).iter_ndjson(["courses"]))
+        assert len(exported) == 1 and exported[0].endswith("\n")
+        course = json.loads(exported[0])
+        assert course["type"] == "course"
+        assert [l["id"] for l in course["modules"][0]["lessons"]] == [701, 700]
+
+        redis_manager.redis_client.flushall()
+        await CatalogImportService(redis_manager, IdAllocator(redis_manager)).import_ndjson(exported)
+        tree = await ContentService(redis_manager).get_course_tree(7)
+        assert [l.title for l in tree[0].lessons] == ["L1", "L2"]
+
+    asyncio.run(run())
+
+
+def test_export_users_and_enrollments_without_passwords(redis_manager):
+    redis_manager.set("user:alice", json.dumps({"id": 1, "username": "alice", "password": "secret"}))
+    redis_manager.set("user_password:alice", "hash")
+    redis_manager.sadd("users", "alice")
+    redis_manager.sadd("all_courses", 7)
+    redis_manager.set("course:7", json.dumps({"id": 7, "title": "Course"}))
+    for enrollment_id in range(5):
+        redis_manager.set(f"enrollment:{enrollment_id}", json.dumps({"id": enrollment_id, "user_id": 1, "course_id": 7}))
+        redis_manager.sadd("course:7:enrollments", enrollment_id)
+
+    records = [json.loads(line) for line in CatalogExportService(redis_manager, batch_size=2).iter_ndjson()]
+
+    users = [r for r in records if r["type"] == "user"]
+    assert users == [{"type": "user", "id": 1, "username": "alice"}]
+    enrollments = [r for r in records if r["type"] == "enrollment"]
+    assert sorted(e["id"] for e in enrollments) == [0, 1, 2, 3, 4]
+    assert "hash" not in "".join(json.dumps(r) for r in records)
@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+from services.catalog_import import CatalogImportService, iter_ndjson_lines
+from services.content import ContentService
+from services.id_allocator import IdAllocator
+
+
+def course_line(title, modules, **extra):
+    course = {"type": "course", "title": title, "description": "", "instructor_id": 3, "modules": modules}
+    course.update(extra)
+    return json.dumps(course)
+
+
+def module(title, lessons):
+    return {"title": title, "description": "", "lessons": lessons}
+
+
+def lesson(title):
+    return {"title": title, "description": "", "content_type": "text", "content": title}
+
+
+def test_import_writes_courses_with_ordered_content(redis_manager):
+    async def run():
+        service = CatalogImportService(redis_manager, IdAllocator(redis_manager), batch_size=2)
+        lines = [
+            course_line("A", [module("A1", [lesson("a"), lesson("b")]), module("A2", [lesson("c")])]),
+            course_line("B", [], id=500),
+            course_line("C", [module("C1", [])]),
+        ]
+        batches = []
+        report = await service.import_ndjson(lines, progress=lambda r: batches.append(r.courses))
+
+        assert (report.courses, report.modules, report.lessons) == (3, 3, 3)
+        assert batches == [2, 3]
+        assert redis_manager.get("course:500") is not None
+        assert len(redis_manager.smembers("all_courses")) == 3
+
+        course_a = next(json.loads(redis_manager.get(f"course:{i}")) for i in redis_manager.smembers("all_courses")
+                        if json.loads(redis_manager.get(f"course:{i}"))["title"] == "A")
+        tree = await ContentService(redis_manager).get_course_tree(course_a["id"])
+        assert [m.title for m in tree] == ["A1", "A2"]
+        assert [l.title for l in tree[0].lessons] == ["a", "b"]
+        assert tree[0].lessons[0].module_id == tree[0].id
+
+        nav = await ContentService(redis_manager).get_lesson_navigation(course_a["id"], tree[1].lessons[0].id)
+        assert (nav.position, nav.total) == (3, 3)
+
+    asyncio.run(run())
+
+
+def test_reimport_deletes_the_content_it_replaces(redis_manager):
+    async def run():
+        service = CatalogImportService(redis_manager, IdAllocator(redis_manager))
+        await service.import_ndjson([course_line("A", [module("A1", [lesson("a"), lesson("b")])], id=500)])
+        old_module_id = int(redis_manager.zrange("course:500:modules")[0])
+        old_lesson_ids = redis_manager.zrange(f"module:{old_module_id}:lessons")
+
+        await service.import_ndjson([course_line("A", [module("A1", [lesson("c")])], id=500)])
+
+        assert redis_manager.redis_client.keys(f"module:{old_module_id}*") == []
+        for lesson_id in old_lesson_ids:
+            assert redis_manager.redis_client.keys(f"lesson:{lesson_id}*") == []
+        assert len(redis_manager.redis_client.keys("module:*:lessons")) == 1
+        assert redis_manager.smembers("instructor:3:lessons") == set(
+            redis_manager.zrange(redis_manager.redis_client.keys("module:*:lessons")[0]))
+
+    asyncio.run(run())
+
+
+def test_invalid_lines_are_reported_and_rejected_whole(redis_manager):
+    async def run():
+        service = CatalogImportService(redis_manager, IdAllocator(redis_manager))
+        lines = [
+            "not json",
+            course_line("Bad lesson", [module("M", [{"title": "no content"}])]),
+            json.dumps({"type": "user", "username": "x"}),
+            "",
+            course_line("Good", []),
+        ]
+        report = await service.import_ndjson(lines)
+
+        assert report.courses == 1 and report.modules == 0
+        assert report.skipped == 1
+        assert [e["line"] for e in report.errors] == [1, 2]
+        assert redis_manager.redis_client.keys("module:*") == []
+
+    asyncio.run(run())
+
+
+def test_ndjson_lines_split_across_chunks():
+    async def chunks():
+        for chunk in [b'{"a": "\xc3', b'\xa9"}\n{"b"', b': 1}']:
+            yield chunk
+
+    async def run():
+        return [line async for line in iter_ndjson_lines(chunks())]
+
+    assert asyncio.run(run()) == ['{"a": "é"}', '{"b": 1}']
@@ -0,0 +1,68 @@
+import fakeredis
+import pytest
+
+from services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from services.redis_manager import RedisManager
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_after_consecutive_failures_and_probes_once():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10, clock=clock)
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "never sent")
+
+    clock.now = 10
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow() and not breaker.allow()
+    # A failed probe opens the circuit again for another reset timeout
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    clock.now = 20
+    assert breaker.call(lambda: "pong") == "pong"
+    assert breaker.state == CLOSED
+
+
+def test_manager_fails_fast_while_redis_is_down_and_recovers():
+    clock = Clock()
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    manager = RedisManager(client=client, circuit_breaker=CircuitBreaker(failure_threshold=2, reset_timeout=5,
+                                                                         clock=clock))
+    assert manager.set("greeting", "hello")
+
+    server.connected = False
+    assert manager.get("greeting") is None
+    assert manager.get("greeting") is None
+    assert manager.circuit.state == OPEN
+    # Callers see no client and take their fallbacks without touching the socket
+    assert manager.get_client() is None and not manager.is_connected()
+    assert manager.pipeline() is None and manager.transaction(lambda pipe: None) is None
+
+    server.connected = True
+    clock.now = 5
+    assert manager.get("greeting") == "hello"
+    assert manager.circuit.state == CLOSED
+
+
+def test_errors_redis_answers_do_not_open_the_circuit(redis_manager):
+    redis_manager.set("text", "value")
+    for _ in range(10):
+        assert redis_manager.smembers("text") == set()
+    assert redis_manager.circuit.state == CLOSED
@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from services.codec import CODECS, decode_document
+from services.content import ContentService
+from services.course import Course, CourseService
+from services.redis_manager import RedisManager
+
+
+def sample_doc():
+    return {
+        "id": 1, "title": "Course", "created_at": datetime(2024, 5, 1, 12, 30, 15, 123456),
+        "start_date": None, "tags": ["a"], "custom_field": {"nested": True},
+    }
+
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_codecs_round_trip_through_models(name):
+    doc = sample_doc()
+    data = CODECS[name].encode(doc)
+    decoded = decode_document(data)
+
+    assert decoded["custom_field"] == {"nested": True}
+    course = Course(**decoded, description="", instructor_id=2)
+    assert course.created_at == doc["created_at"]
+
+
+def test_compact_format_is_smaller_and_keeps_unknown_fields():
+    doc = sample_doc()
+    compact = CODECS["compact"].encode(doc)
+    assert len(compact) < len(CODECS["json"].encode(doc))
+    # Known datetime fields decode straight to datetime objects
+    assert CODECS["compact"].decode(compact)["created_at"] == doc["created_at"]
+
+
+def test_services_read_documents_in_any_format():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeRedis(decode_responses=True)
+
+    async def run():
+        legacy = CourseService(redis_manager=RedisManager(client=client, codec="json"))
+        await legacy.create_course({"id": 1, "title": "Old", "description": "", "instructor_id": 2})
+        current = CourseService(redis_manager=RedisManager(client=client, codec="compact"))
+        await current.create_course({"id": 2, "title": "New", "description": "", "instructor_id": 2})
+
+        assert client.get("course:1").startswith("{")
+        assert client.get("course:2").startswith("\x02")
+        assert sorted(c.title for c in await current.list_courses()) == ["New", "Old"]
+        assert (await legacy.get_course(2)).title == "New"
+
+    asyncio.run(run())
+
+
+def test_migrate_documents_rewrites_only_documents(redis_manager):
+    async def run():
+        content_service = ContentService(redis_manager)
+        await content_service.create_module({"id": 1, "course_id": 9, "title": "M", "description": "", "order": 1})
+        redis_manager.set("email:someone@example.com", "someone")
+
+        target = RedisManager(client=redis_manager.redis_client, codec="compact")
+        counts = target.migrate_documents(batch_size=2)
+
+        assert counts["migrated"] == 1
+        assert redis_manager.get("module:1").startswith("\x02")
+        assert redis_manager.get("email:someone@example.com") == "someone"
+        assert redis_manager.type("course:9:modules") == "zset"
+        assert (await content_service.get_module(1)).title == "M"
+
+        # Running again finds nothing left to rewrite
+        assert target.migrate_documents()["migrated"] == 0
+
+    asyncio.run(run())
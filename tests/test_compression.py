@@ -0,0 +1,79 @@
+import gzip
+import json
+import zlib
+
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.testclient import TestClient
+
+from services.course import Course
+from web import CompressionMiddleware, FastJSONResponse
+from web.compression import accepted_encodings
+
+BIG_TEXT = "Learn the fundamentals of Python programming. " * 100
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get("/big")
+    async def big():
+        return PlainTextResponse(BIG_TEXT, headers={"ETag": '"v1"'})
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("tiny")
+
+    @app.get("/stream")
+    async def stream():
+        async def lines():
+            for i in range(50):
+                yield json.dumps({"line": i, "text": BIG_TEXT[:200]}) + "\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    return app
+
+
+def raw_get(client, url, accept_encoding):
+    """Get a response without letting the client decode it."""
+    response = client.get(url, headers={"Accept-Encoding": accept_encoding}, stream=True)
+    return response, response.raw.read(decode_content=False)
+
+
+def test_large_responses_are_gzipped():
+    client = TestClient(make_app())
+    response, body = raw_get(client, "/big", "gzip, deflate")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == 'W/"v1"'
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert gzip.decompress(body).decode() == BIG_TEXT
+    assert len(body) < len(BIG_TEXT)
+
+
+def test_small_or_refused_responses_are_not_compressed():
+    client = TestClient(make_app())
+    response, _ = raw_get(client, "/small", "gzip")
+    assert "content-encoding" not in response.headers
+    response, body = raw_get(client, "/big", "gzip;q=0, identity")
+    assert "content-encoding" not in response.headers
+    assert body.decode() == BIG_TEXT
+
+
+def test_streaming_responses_are_compressed_chunk_by_chunk():
+    client = TestClient(make_app())
+    response, body = raw_get(client, "/stream", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    lines = zlib.decompress(body, 16 + zlib.MAX_WBITS).decode().splitlines()
+    assert [json.loads(line)["line"] for line in lines] == list(range(50))
+
+
+def test_accept_encoding_parsing():
+    assert accepted_encodings("br;q=1.0, gzip;q=0.8, *;q=0") == ["br", "gzip"]
+    assert accepted_encodings("") == []
+
+
+def test_fast_json_matches_fastapi_encoding():
+    course = Course(id=1, title="T", description="D", instructor_id=2, tags=["a"])
+    assert json.loads(FastJSONResponse([course.dict()]).body) == jsonable_encoder([course])
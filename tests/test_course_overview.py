@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from services.content import ContentService, ContentType
+from services.course import CourseService
+from services.course_overview import CourseOverviewService, parse_fields, select_fields
+
+
+@pytest.fixture
+def services(redis_manager):
+    course_service = CourseService(redis_manager=redis_manager)
+    content_service = ContentService(redis_manager)
+    return course_service, content_service, CourseOverviewService(course_service, content_service)
+
+
+def build_course(course_service, content_service):
+    async def run():
+        await course_service.create_course({"id": 9, "title": "C", "description": "", "instructor_id": 1})
+        for module_id in (1, 2):
+            await content_service.create_module(
+                {"id": module_id, "course_id": 9, "title": f"M{module_id}", "description": "", "order": module_id})
+            for order in (1, 2):
+                await content_service.create_lesson({
+                    "id": module_id * 10 + order, "module_id": module_id, "title": f"L{module_id}{order}",
+                    "description": "", "content_type": ContentType.TEXT, "content": "body",
+                    "duration_minutes": 5, "order": order,
+                })
+    asyncio.run(run())
+
+
+def test_overview_is_the_tree_without_content(services):
+    course_service, content_service, overview_service = services
+    build_course(course_service, content_service)
+
+    overview = asyncio.run(overview_service.get_overview(9))
+    assert [m["title"] for m in overview["modules"]] == ["M1", "M2"]
+    assert [l["title"] for l in overview["modules"][1]["lessons"]] == ["L21", "L22"]
+    assert "content" not in overview["modules"][0]["lessons"][0]
+    assert (overview["module_count"], overview["lesson_count"], overview["duration_minutes"]) == (2, 4, 20)
+    assert asyncio.run(overview_service.get_overview(404)) is None
+
+
+def test_overview_is_cached_until_the_course_changes(services):
+    course_service, content_service, overview_service = services
+    build_course(course_service, content_service)
+
+    builds = []
+    original_build = overview_service._build
+
+    async def counting_build(course_id):
+        builds.append(course_id)
+        return await original_build(course_id)
+
+    overview_service._build = counting_build
+    asyncio.run(overview_service.get_overview(9))
+    asyncio.run(overview_service.get_overview(9))
+    assert builds == [9]
+
+    asyncio.run(content_service.update_module(2, {"title": "Renamed"}))
+    overview = asyncio.run(overview_service.get_overview(9))
+    assert builds == [9, 9]
+    assert overview["modules"][1]["title"] == "Renamed"
+
+
+def test_field_selection():
+    spec = parse_fields("id, modules.title,modules.lessons.id")
+    assert spec == {"id": True, "modules": {"title": True, "lessons": {"id": True}}}
+    # Selecting a whole value wins over selecting parts of it
+    assert parse_fields("modules.title,modules") == {"modules": True}
+    assert parse_fields("modules,modules.title") == {"modules": True}
+    assert parse_fields("") is None
+
+    doc = {"id": 1, "title": "C", "modules": [{"title": "M", "order": 1, "lessons": [{"id": 5, "title": "L"}]}]}
+    assert select_fields(doc, spec) == {"id": 1, "modules": [{"title": "M", "lessons": [{"id": 5}]}]}
+    assert select_fields(doc, parse_fields("nope")) == {}
@@ -0,0 +1,130 @@
+import asyncio
+import threading
+
+import fakeredis
+
+from services.enrollment import (
+    ALREADY_ENROLLED, ENROLLED, PAYMENT_REQUIRED, Enrollment, EnrollmentService, EnrollmentStatus
+)
+from services.id_allocator import IdAllocator
+from services.payment import PaymentMethod, PaymentService
+from services.payment_gateway import FakePaymentGateway
+from services.redis_manager import RedisManager
+
+
+def pay(redis_manager, user_id, course_id):
+    async def run():
+        payment_service = PaymentService(redis_manager, gateway=FakePaymentGateway())
+        payment = await payment_service.create_payment(
+            {"user_id": user_id, "course_id": course_id, "amount": 10.0, "payment_method": PaymentMethod.PAYPAL})
+        return await payment_service.process_payment(payment.id)
+    return asyncio.run(run())
+
+
+def test_enrollment_requires_a_completed_payment(redis_manager):
+    service = EnrollmentService(redis_manager)
+    assert asyncio.run(service.enroll_after_payment(1, 5)).status == PAYMENT_REQUIRED
+    assert asyncio.run(service.enroll_after_payment(1, 5, require_payment=False)).status == ENROLLED
+
+    payment = pay(redis_manager, 2, 5)
+    result = asyncio.run(service.enroll_after_payment(2, 5))
+    assert result.status == ENROLLED and result.enrollment.course_id == 5
+    again = asyncio.run(service.enroll_after_payment(2, 5))
+    assert again.status == ALREADY_ENROLLED and again.enrollment.id == result.enrollment.id
+
+    # A refunded payment no longer allows enrolling
+    asyncio.run(PaymentService(redis_manager, gateway=FakePaymentGateway()).update_payment(
+        payment.id, {"status": "refunded"}))
+    assert asyncio.run(service.enroll_after_payment(2, 6)).status == PAYMENT_REQUIRED
+
+
+def test_enrollments_made_before_the_index_are_indexed_once(redis_manager):
+    for enrollment_id, status in ((77, EnrollmentStatus.ACTIVE), (78, EnrollmentStatus.EXPIRED)):
+        legacy = Enrollment(id=enrollment_id, user_id=3, course_id=enrollment_id - 72, status=status)
+        redis_manager.set(f"enrollment:{enrollment_id}", redis_manager.encode_doc(legacy.dict()))
+        redis_manager.sadd("user:3:enrollments", enrollment_id)
+        redis_manager.sadd(f"course:{legacy.course_id}:enrollments", enrollment_id)
+        redis_manager.sadd("all_courses", legacy.course_id)
+
+    service = EnrollmentService(redis_manager)
+    assert asyncio.run(service.build_course_index()) == 1
+    assert asyncio.run(service.build_course_index()) == 0
+
+    result = asyncio.run(service.enroll_after_payment(3, 5, require_payment=False))
+    assert result.status == ALREADY_ENROLLED and result.enrollment.id == 77
+    assert asyncio.run(service.is_user_enrolled(3, 5))
+    assert not asyncio.run(service.is_user_enrolled(3, 6))
+
+
+def test_checking_a_course_the_user_is_not_in_reads_only_the_index(redis_manager):
+    service = EnrollmentService(redis_manager)
+    for course_id in range(1, 51):
+        asyncio.run(service.enroll_after_payment(1, course_id, require_payment=False))
+
+    client = redis_manager.get_client()
+    commands = []
+    execute_command = client.execute_command
+    client.execute_command = lambda *args, **kwargs: commands.append(args[0]) or execute_command(*args, **kwargs)
+    assert not asyncio.run(service.is_user_enrolled(1, 99))
+    assert commands == ["HGET"]
+
+
+def test_simultaneous_enroll_attempts_create_one_enrollment():
+    server = fakeredis.FakeServer()
+    setup = RedisManager(client=fakeredis.FakeRedis(server=server, decode_responses=True))
+    pay(setup, 4, 9)
+
+    attempts = 20
+    barrier = threading.Barrier(attempts)
+    results = []
+
+    def attempt():
+        # Each thread has its own connection, like separate workers
+        redis_manager = RedisManager(client=fakeredis.FakeRedis(server=server, decode_responses=True))
+        service = EnrollmentService(redis_manager, IdAllocator(redis_manager, block_size=1))
+        barrier.wait()
+        results.append(asyncio.run(service.enroll_after_payment(4, 9)))
+
+    threads = [threading.Thread(target=attempt) for _ in range(attempts)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(result.status for result in results).count(ENROLLED) == 1
+    assert all(result.status in (ENROLLED, ALREADY_ENROLLED) for result in results)
+    assert len({result.enrollment.id for result in results}) == 1
+    assert len(setup.smembers("user:4:enrollments")) == 1
+    assert len(setup.smembers("course:9:enrollments")) == 1
+
+
+def test_enrollment_lookups(redis_manager):
+    service = EnrollmentService(redis_manager)
+    enrollment = asyncio.run(service.enroll_user(1, 5))
+    assert asyncio.run(service.enroll_user(1, 5)).id == enrollment.id
+    asyncio.run(service.enroll_user(1, 6))
+
+    assert asyncio.run(service.is_user_enrolled(1, 5))
+    assert not asyncio.run(service.is_user_enrolled(1, 7))
+    assert not asyncio.run(service.is_user_enrolled(2, 5))
+    assert asyncio.run(service.get_enrollment(enrollment.id)).course_id == 5
+    assert sorted(e.course_id for e in asyncio.run(service.get_user_enrollments(1))) == [5, 6]
+
+
+def test_enroll_form_enrolls_in_paid_courses_by_default(app, monkeypatch):
+    from starlette.testclient import TestClient
+
+    monkeypatch.setattr(app, "ENROLLMENT_REQUIRES_PAYMENT", False)
+
+    async def setup():
+        await app.user_service.create_user({
+            "id": 8, "username": "learner", "email": "learner@example.com", "full_name": "L"})
+        return await app.course_service.create_course({
+            "title": "Course", "description": "", "level": "beginner", "instructor_id": 1, "price": 20.0})
+
+    course = asyncio.run(setup())
+    client = TestClient(app.app)
+    client.cookies.set("access_token", "Bearer learner:student")
+    response = client.post(f"/courses/{course.id}/enroll", allow_redirects=False)
+    assert response.status_code == 303 and response.headers["location"] == f"/courses/{course.id}/session"
+    assert asyncio.run(app.enrollment_service.is_user_enrolled(8, course.id))
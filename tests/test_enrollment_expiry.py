@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+from services.catalog_export import CatalogExportService
+from services.enrollment import (
+    ALREADY_ENROLLED, ENROLLED, ENROLLMENT_EXPIRIES_KEY, EnrollmentService, EnrollmentStatus
+)
+from services.enrollment_expiry import EnrollmentExpirySweeper
+
+DAY = 86400
+
+
+def enroll(service, user_id, course_id, access_days):
+    return asyncio.run(service.enroll_after_payment(user_id, course_id, require_payment=False,
+                                                    access_days=access_days)).enrollment
+
+
+def test_due_enrollments_are_expired_and_leave_the_indexes(redis_manager):
+    service = EnrollmentService(redis_manager)
+    short = enroll(service, 1, 5, access_days=1)
+    long = enroll(service, 2, 5, access_days=30)
+    forever = enroll(service, 3, 5, access_days=0)
+    assert forever.expiry_date is None
+    assert redis_manager.zrange(ENROLLMENT_EXPIRIES_KEY) == [str(short.id), str(long.id)]
+
+    assert service.expire_due(now=time.time()) == 0
+    assert service.expire_due(now=time.time() + 2 * DAY) == 1
+
+    assert redis_manager.get_doc(f"enrollment:{short.id}")["status"] == EnrollmentStatus.EXPIRED.value
+    assert redis_manager.get_doc(f"enrollment:{long.id}")["status"] == EnrollmentStatus.ACTIVE.value
+    assert redis_manager.zrange(ENROLLMENT_EXPIRIES_KEY) == [str(long.id)]
+    assert asyncio.run(service.get_enrollment_count(5)) == 2
+    assert redis_manager.hget("user:1:course_enrollments", 5) is None
+
+    # The course's history keeps it, so exports still include it
+    assert str(short.id) in redis_manager.smembers("course:5:enrollments")
+    redis_manager.sadd("all_courses", 5)
+    exported = {e["id"]: e["status"] for e in CatalogExportService(redis_manager).iter_enrollments()}
+    assert exported[short.id] == EnrollmentStatus.EXPIRED.value
+
+    # The expired student can enroll again; the others are still enrolled
+    assert asyncio.run(service.enroll_after_payment(1, 5, require_payment=False)).status == ENROLLED
+    assert asyncio.run(service.enroll_after_payment(2, 5, require_payment=False)).status == ALREADY_ENROLLED
+
+
+def test_sweep_expires_every_due_enrollment_in_batches(redis_manager):
+    service = EnrollmentService(redis_manager)
+    for user_id in range(1, 8):
+        enroll(service, user_id, 5, access_days=1)
+    enroll(service, 8, 5, access_days=10)
+
+    sweeper = EnrollmentExpirySweeper(service, batch_size=3)
+    assert asyncio.run(sweeper.sweep(now=time.time() + 2 * DAY)) == 7
+    assert asyncio.run(service.get_enrollment_count(5)) == 1
+    assert asyncio.run(sweeper.sweep(now=time.time() + 2 * DAY)) == 0
+
+
+def test_enrollments_no_longer_active_just_leave_the_index(redis_manager):
+    service = EnrollmentService(redis_manager)
+    enrollment = enroll(service, 1, 5, access_days=1)
+    redis_manager.update_doc(f"enrollment:{enrollment.id}", {"status": EnrollmentStatus.COMPLETED.value})
+
+    assert service.expire_due(now=time.time() + 2 * DAY) == 1
+    assert redis_manager.get_doc(f"enrollment:{enrollment.id}")["status"] == EnrollmentStatus.COMPLETED.value
+    assert redis_manager.zrange(ENROLLMENT_EXPIRIES_KEY) == []
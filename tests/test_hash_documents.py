@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from services.content import ContentService, ContentType
+from services.course import CourseService, CourseStatus
+from services.redis_manager import RedisManager
+
+
+@pytest.fixture
+def hash_manager(redis_manager):
+    """A RedisManager in hash storage mode sharing the fake server of redis_manager."""
+    return RedisManager(client=redis_manager.redis_client, storage="hash")
+
+
+def lesson_data(lesson_id, module_id, order):
+    return {
+        "id": lesson_id, "module_id": module_id, "title": f"Lesson {lesson_id}", "description": "",
+        "content_type": ContentType.TEXT, "content": "body", "order": order
+    }
+
+
+def test_content_round_trips_through_hashes(hash_manager):
+    async def run():
+        content_service = ContentService(hash_manager)
+        await content_service.create_module({"id": 1, "course_id": 9, "title": "M", "description": "", "order": 1})
+        await content_service.create_lesson(lesson_data(11, 1, 2))
+        await content_service.create_lesson(lesson_data(12, 1, 1))
+
+        assert hash_manager.type("module:1") == "hash"
+        assert hash_manager.redis_client.hget("lesson:11", "title") == '"Lesson 11"'
+
+        await content_service.reorder_lessons(1, [{"id": 11, "order": 0}])
+        tree = await content_service.get_course_tree(9)
+        assert [l.id for l in tree[0].lessons] == [11, 12]
+        assert (await content_service.get_lesson(11)).content == "body"
+
+    asyncio.run(run())
+
+
+def test_update_writes_only_changed_fields(hash_manager):
+    async def run():
+        content_service = ContentService(hash_manager)
+        await content_service.create_module({"id": 1, "course_id": 9, "title": "M", "description": "old", "order": 1})
+
+        # A field changed behind the service's back must survive an update of another field
+        hash_manager.redis_client.hset("module:1", "description", '"changed elsewhere"')
+        module = await content_service.update_module(1, {"title": "New title"})
+
+        assert module.title == "New title"
+        assert module.description == "changed elsewhere"
+        stored = await content_service.get_module(1)
+        assert (stored.title, stored.description) == ("New title", "changed elsewhere")
+
+    asyncio.run(run())
+
+
+def test_course_cards_read_only_rendered_fields(redis_manager, hash_manager):
+    async def run():
+        # One course stored as a string document, one as a hash
+        for manager, course_id in ((redis_manager, 1), (hash_manager, 2)):
+            await CourseService(redis_manager=manager).create_course({
+                "id": course_id, "title": f"Course {course_id}", "description": "d" * 1000,
+                "instructor_id": 5, "status": CourseStatus.PUBLISHED
+            })
+        assert hash_manager.type("course:1") == "string" and hash_manager.type("course:2") == "hash"
+
+        cards = await CourseService(redis_manager=hash_manager).list_course_cards(
+            filters={"status": CourseStatus.PUBLISHED})
+        assert sorted(card.title for card in cards) == ["Course 1", "Course 2"]
+
+        docs = hash_manager.hmget_docs(["course:1", "course:2", "course:3"], ["title", "price"])
+        assert docs == [{"title": "Course 1", "price": 0.0}, {"title": "Course 2", "price": 0.0}, None]
+
+        updated = await CourseService(redis_manager=hash_manager).update_course(1, {"price": 10})
+        assert updated.price == 10.0 and hash_manager.type("course:1") == "hash"
+
+    asyncio.run(run())
+
+
+def test_migrate_between_storage_modes(redis_manager, hash_manager):
+    async def run():
+        content_service = ContentService(redis_manager)
+        await content_service.create_module({"id": 1, "course_id": 9, "title": "M", "description": "", "order": 1})
+        await content_service.create_lesson(lesson_data(11, 1, 1))
+        redis_manager.set("user:alice", redis_manager.encode_doc({"id": 1, "username": "alice"}))
+
+        assert hash_manager.migrate_documents()["migrated"] == 2
+        assert hash_manager.type("lesson:11") == "hash"
+        assert hash_manager.type("user:alice") == "string"
+        assert hash_manager.type("course:9:lesson_nav") == "hash"
+
+        assert redis_manager.migrate_documents()["migrated"] == 2
+        assert redis_manager.type("lesson:11") == "string"
+        assert (await content_service.get_lesson(11)).title == "Lesson 11"
+
+    asyncio.run(run())
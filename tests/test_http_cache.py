@@ -0,0 +1,68 @@
+from fastapi import FastAPI, Request, Response
+from starlette.testclient import TestClient
+
+from services.catalog_version import CatalogVersions
+from web import conditional_response, version_validators
+
+
+def make_app(versions):
+    """An app serving one course resource, counting how often it is read."""
+    app = FastAPI()
+    app.state.reads = 0
+
+    @app.get("/courses/{course_id}")
+    async def get_course(request: Request, response: Response, course_id: int):
+        validators = version_validators(versions, f"course:{course_id}", course_id)
+        not_modified = conditional_response(request, response, validators)
+        if not_modified:
+            return not_modified
+        app.state.reads += 1
+        return {"id": course_id}
+
+    return app
+
+
+def test_validators_follow_the_course_version(redis_manager):
+    versions = CatalogVersions(redis_manager)
+    before = version_validators(versions, "course:1", 1)
+    assert before.last_modified is None
+
+    versions.bump(2)
+    assert version_validators(versions, "course:1", 1) == before
+    assert version_validators(versions, "courses") != version_validators(versions, "trending-courses")
+
+    versions.bump(1)
+    after = version_validators(versions, "course:1", 1)
+    assert after.etag != before.etag
+    assert after.last_modified is not None
+
+
+def test_unchanged_resources_get_304_without_being_read(redis_manager):
+    versions = CatalogVersions(redis_manager)
+    versions.bump(1)
+    app = make_app(versions)
+    client = TestClient(app)
+
+    response = client.get("/courses/1")
+    assert response.status_code == 200
+    assert response.headers["cache-control"].startswith("public")
+    etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+
+    assert client.get("/courses/1", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/courses/1", headers={"If-Modified-Since": last_modified}).status_code == 304
+    # If-None-Match wins over If-Modified-Since
+    assert client.get("/courses/1", headers={"If-None-Match": '"other"',
+                                              "If-Modified-Since": last_modified}).status_code == 200
+    assert app.state.reads == 2
+
+    versions.bump(1)
+    changed = client.get("/courses/1", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+def test_no_validators_without_redis():
+    app = make_app(CatalogVersions(None))
+    response = TestClient(app).get("/courses/1", headers={"If-None-Match": "*"})
+    assert response.status_code == 200
+    assert "etag" not in response.headers
@@ -0,0 +1,75 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from services.content import ContentService, ContentType
+from services.id_allocator import IdAllocator
+
+
+def test_ids_are_unique_across_allocators(redis_manager):
+    # Two allocators on the same Redis behave like two worker processes
+    first = IdAllocator(redis_manager, block_size=10)
+    second = IdAllocator(redis_manager, block_size=10)
+
+    ids = [allocator.next_id("lesson") for _ in range(25) for allocator in (first, second)]
+
+    assert len(set(ids)) == len(ids)
+    assert int(redis_manager.get("id_counter:lesson")) >= max(ids)
+
+
+def test_concurrent_next_id_never_collides(redis_manager):
+    allocator = IdAllocator(redis_manager, block_size=7)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        ids = list(pool.map(lambda _: allocator.next_id("course"), range(2000)))
+
+    assert len(set(ids)) == 2000
+
+
+def test_ids_start_above_legacy_timestamp_ids(redis_manager):
+    allocator = IdAllocator(redis_manager)
+    block = allocator.allocate_block("module", 500)
+
+    assert len(block) == 500
+    # Legacy IDs were Unix timestamps in seconds
+    assert block[0] > 10 ** 10
+    assert allocator.next_id("module") > block[-1]
+
+
+def test_falls_back_to_local_ids_without_redis():
+    allocator = IdAllocator(None)
+    ids = [allocator.next_id("enrollment") for _ in range(1000)]
+
+    assert len(set(ids)) == 1000
+
+
+def test_lessons_created_in_the_same_second_do_not_collide(redis_manager):
+    async def run():
+        content_service = ContentService(redis_manager)
+        module = await content_service.create_module({"course_id": 1, "title": "M", "description": "", "order": 1})
+        lessons = [
+            await content_service.create_lesson({
+                "module_id": module.id,
+                "title": f"Lesson {i}",
+                "description": "",
+                "content_type": ContentType.TEXT,
+                "content": "",
+                "order": i
+            })
+            for i in range(20)
+        ]
+
+        assert len({lesson.id for lesson in lessons}) == 20
+        assert len(await content_service.get_lessons_by_module_id(module.id)) == 20
+
+    asyncio.run(run())
+
+
+def test_local_ids_of_different_processes_do_not_collide(monkeypatch):
+    monkeypatch.setattr("time.time_ns", lambda: 1_700_000_000_000_000_000)
+    ids = []
+    for pid in (100, 101):
+        # Two worker processes on one host, both without Redis in the same millisecond
+        monkeypatch.setattr("os.getpid", lambda: pid)
+        allocator = IdAllocator(None)
+        ids += [allocator.next_id("payment") for _ in range(50)] + list(allocator.allocate_block("lesson", 50))
+
+    assert len(set(ids)) == 200
+    assert min(ids) > 10 ** 15
@@ -0,0 +1,121 @@
+import asyncio
+
+from services.catalog_export import CatalogExportService
+from services.codec import decode_body, encode_body
+from services.content import ContentService, ContentType
+from services.redis_manager import RedisManager
+
+
+def lesson_data(lesson_id, content):
+    return {
+        "id": lesson_id, "module_id": 1, "title": f"Lesson {lesson_id}", "description": "",
+        "content_type": ContentType.TEXT, "content": content, "order": lesson_id
+    }
+
+
+def test_body_encoding_round_trips():
+    long_text = "Lorem ipsum dolor sit amet. " * 200
+    compressed = encode_body(long_text, "zlib", min_size=1024)
+    assert compressed.startswith("\x00zlib:")
+    assert len(compressed) < len(long_text)
+    assert decode_body(compressed) == long_text
+
+    # Short bodies are kept as is, and plain text starting with the marker stays unambiguous
+    assert encode_body("short", "zlib") == "short"
+    assert decode_body(encode_body("\x00zlib:not compressed")) == "\x00zlib:not compressed"
+
+
+def test_listings_leave_content_out(redis_manager):
+    async def run():
+        content_service = ContentService(redis_manager)
+        await content_service.create_module({"id": 1, "course_id": 9, "title": "M", "description": "", "order": 1})
+        await content_service.create_lesson(lesson_data(11, "<p>Lesson body</p>"))
+
+        assert "content" not in redis_manager.get_doc("lesson:11")
+        assert redis_manager.get("lesson:11:content") == "<p>Lesson body</p>"
+
+        listed = await content_service.get_lessons_by_module_id(1)
+        assert listed[0].content == ""
+        assert (await content_service.get_lesson(11)).content == "<p>Lesson body</p>"
+        assert (await content_service.get_lesson(11, with_content=False)).content == ""
+
+        await content_service.delete_lesson(11)
+        assert redis_manager.get("lesson:11:content") is None
+
+    asyncio.run(run())
+
+
+def test_large_bodies_are_compressed(redis_manager):
+    async def run():
+        manager = RedisManager(client=redis_manager.redis_client, body_compression="zlib")
+        content_service = ContentService(manager)
+        await content_service.create_module({"id": 1, "course_id": 9, "title": "M", "description": "", "order": 1})
+        body = "<p>Step by step.</p>" * 500
+        await content_service.create_lesson(lesson_data(11, body))
+
+        assert redis_manager.get("lesson:11:content").startswith("\x00zlib:")
+        # Readers decompress whatever the writer's setting was
+        assert (await ContentService(redis_manager).get_lesson(11)).content == body
+
+    asyncio.run(run())
+
+
+def test_inline_content_is_read_migrated_and_exported(redis_manager):
+    async def run():
+        content_service = ContentService(redis_manager)
+        await content_service.create_module({"id": 1, "course_id": 9, "title": "M", "description": "", "order": 1})
+        await content_service.create_lesson(lesson_data(11, "new"))
+        # A lesson written before content had its own key
+        redis_manager.set("lesson:12", redis_manager.encode_doc(lesson_data(12, "old")))
+        redis_manager.zadd("module:1:lessons", {12: 12})
+        redis_manager.sadd("all_courses", 9)
+        redis_manager.set_doc("course:9", {"id": 9, "title": "C"})
+        redis_manager.zadd("course:9:modules", {1: 1})
+
+        assert (await content_service.get_lesson(12)).content == "old"
+        exported = list(CatalogExportService(redis_manager).iter_courses())
+        assert [l["content"] for l in exported[0]["modules"][0]["lessons"]] == ["new", "old"]
+
+        counts = redis_manager.migrate_documents(patterns=("lesson:*",))
+        assert counts["migrated"] == 1
+        assert "content" not in redis_manager.get_doc("lesson:12")
+        assert (await content_service.get_lesson(12)).content == "old"
+
+    asyncio.run(run())
+
+
+def test_editing_a_course_keeps_lesson_bodies(app):
+    from starlette.testclient import TestClient
+
+    main = app
+
+    async def setup():
+        instructor = await main.user_service.create_user({
+            "id": 7, "username": "teacher", "email": "teacher@example.com", "full_name": "T", "role": "instructor"})
+        course = await main.course_service.create_course({
+            "title": "Course", "description": "", "level": "beginner", "instructor_id": instructor.id})
+        module = await main.content_service.create_module(
+            {"course_id": course.id, "title": "M", "description": "", "order": 1})
+        await main.content_service.create_lesson({**lesson_data(11, "<p>Lesson body</p>"), "module_id": module.id})
+        return course
+
+    course = asyncio.run(setup())
+    client = TestClient(main.app)
+    client.cookies.set("access_token", "Bearer teacher:instructor")
+
+    form = client.get(f"/edit-course/{course.id}")
+    assert "&lt;p&gt;Lesson body&lt;/p&gt;</textarea>" in form.text
+
+    # Submitting the form unchanged saves the bodies it showed
+    client.post("/create-course", data={
+        "course_id": course.id, "title": "Course", "description": "", "level": "beginner",
+        "module_titles[]": "M", "module_descriptions[]": "", "lesson_titles[]": "Lesson",
+        "lesson_descriptions[]": "", "lesson_content_types[]": "text", "lesson_contents[]": "<p>Lesson body</p>",
+    }, allow_redirects=False)
+
+    async def bodies():
+        modules = await main.content_service.get_course_tree(course.id)
+        return [(await main.content_service.get_lesson(lesson.id)).content
+                for module in modules for lesson in module.lessons]
+
+    assert set(asyncio.run(bodies())) == {"<p>Lesson body</p>"}
@@ -0,0 +1,147 @@
+import asyncio
+from services.catalog_version import CatalogVersions
+from services.content import ContentService, ContentType
+
+
+async def create_course_content(content_service, course_id=500):
+    """Create two modules with two lessons each, out of order."""
+    second = await content_service.create_module({
+        "id": 52, "course_id": course_id, "title": "Second", "description": "", "order": 2
+    })
+    first = await content_service.create_module({
+        "id": 51, "course_id": course_id, "title": "First", "description": "", "order": 1
+    })
+    for module, lesson_ids in ((second, (522, 521)), (first, (512, 511))):
+        for lesson_id in lesson_ids:
+            await content_service.create_lesson({
+                "id": lesson_id,
+                "module_id": module.id,
+                "title": f"Lesson {lesson_id}",
+                "description": "",
+                "content_type": ContentType.TEXT,
+                "content": "",
+                "order": lesson_id % 10
+            })
+    return first, second
+
+
+def test_lesson_navigation_crosses_modules(redis_manager):
+    async def run():
+        content_service = ContentService(redis_manager)
+        await create_course_content(content_service)
+
+        nav = await content_service.get_lesson_navigation(500, 512)
+        assert (nav.position, nav.total) == (2, 4)
+        assert nav.prev_lesson_id == 511 and nav.prev_module_id == 51
+        assert nav.next_lesson_id == 521 and nav.next_module_id == 52
+        assert nav.first_lesson_id == 511 and nav.last_lesson_id == 522
+
+        first = await content_service.get_lesson_navigation(500, 511)
+        assert first.prev_lesson_id is None
+        last = await content_service.get_lesson_navigation(500, 522)
+        assert last.next_lesson_id is None and last.position == 4
+
+    asyncio.run(run())
+
+
+def test_lesson_navigation_rebuilt_on_delete(redis_manager):
+    async def run():
+        content_service = ContentService(redis_manager)
+        await create_course_content(content_service)
+
+        await content_service.delete_module(51)
+        nav = await content_service.get_lesson_navigation(500, 521)
+        assert (nav.position, nav.total) == (1, 2)
+        assert nav.prev_lesson_id is None
+        assert redis_manager.hget("course:500:lesson_nav", "511") is None
+
+    asyncio.run(run())
+
+
+def test_missing_navigation_index_is_built_lazily(redis_manager):
+    async def run():
+        content_service = ContentService(redis_manager)
+        await create_course_content(content_service)
+
+        redis_manager.delete("course:500:lesson_nav")
+        nav = await content_service.get_lesson_navigation(500, 521)
+        assert nav.position == 3
+        assert redis_manager.hget("course:500:lesson_nav", "521") is not None
+
+    asyncio.run(run())
+
+
+
+def test_concurrent_lesson_is_not_left_out_of_navigation(redis_manager):
+    async def run():
+        content_service = ContentService(redis_manager)
+        await create_course_content(content_service)
+
+        # Another process adds a lesson to module 51 right after this write has read its index
+        read_indexes = content_service._read_indexes
+        raced = []
+
+        def racing_read(index_keys):
+            indexes = read_indexes(index_keys)
+            if "module:51:lessons" in index_keys and not raced:
+                raced.append(True)
+                redis_manager.zadd("module:51:lessons", {513: 3})
+            return indexes
+
+        content_service._read_indexes = racing_read
+        await content_service.create_lesson({
+            "id": 523, "module_id": 52, "title": "Lesson 523", "description": "",
+            "content_type": ContentType.TEXT, "content": "", "order": 3
+        })
+
+        # The write was retried, so its navigation includes the other lesson
+        nav = await content_service.get_lesson_navigation(500, 512)
+        assert nav.next_lesson_id == 513 and nav.total == 6
+
+    asyncio.run(run())
+
+
+def test_navigation_written_without_watch_is_rebuilt(redis_manager):
+    async def run():
+        content_service = ContentService(redis_manager)
+        await create_course_content(content_service)
+
+        # An entry from before navigation was written under WATCH, missing lesson 512
+        stale = (await content_service.get_lesson_navigation(500, 511)).copy(
+            update={"next_lesson_id": 521, "next_module_id": 52})
+        redis_manager.delete("course:500:lesson_nav")
+        redis_manager.redis_client.hset("course:500:lesson_nav", "511", stale.json())
+
+        nav = await content_service.get_lesson_navigation(500, 511)
+        assert nav.next_lesson_id == 512
+        assert redis_manager.hget("course:500:lesson_nav", "_format") is not None
+
+    asyncio.run(run())
+
+
+def test_rebuilding_navigation_on_read_keeps_cached_pages_valid(redis_manager):
+    async def run():
+        content_service = ContentService(redis_manager)
+        await create_course_content(content_service)
+        versions = CatalogVersions(redis_manager).get(500)
+
+        redis_manager.delete("course:500:lesson_nav")
+        assert (await content_service.get_lesson_navigation(500, 521)).position == 3
+        assert CatalogVersions(redis_manager).get(500) == versions
+
+    asyncio.run(run())
+
+
+def test_unknown_lessons_do_not_rebuild_a_current_index(redis_manager):
+    async def run():
+        content_service = ContentService(redis_manager)
+        await create_course_content(content_service)
+
+        async def rebuild(course_id):
+            raise AssertionError("rebuilt a current navigation index")
+
+        content_service.rebuild_lesson_navigation = rebuild
+        assert await content_service.get_lesson_navigation(500, 999) is None
+        assert (await content_service.get_lesson_navigation(500, 521)).position == 3
+
+    asyncio.run(run())
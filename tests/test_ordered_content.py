@@ -0,0 +1,79 @@
+import asyncio
+import json
+from services.content import ContentService, ContentType
+
+
+async def create_lessons(content_service, module_id, orders):
+    for lesson_id, order in orders.items():
+        await content_service.create_lesson({
+            "id": lesson_id,
+            "module_id": module_id,
+            "title": f"Lesson {lesson_id}",
+            "description": "",
+            "content_type": ContentType.TEXT,
+            "content": "",
+            "order": order
+        })
+
+
+def test_lessons_are_stored_in_order(redis_manager):
+    async def run():
+        content_service = ContentService(redis_manager)
+        await content_service.create_module({"id": 7, "course_id": 70, "title": "M", "description": "", "order": 1})
+        await create_lessons(content_service, 7, {71: 3, 72: 1, 73: 2})
+
+        assert redis_manager.type("module:7:lessons") == "zset"
+        assert await content_service.get_lesson_ids_by_module_id(7) == [72, 73, 71]
+        lessons = await content_service.get_lessons_by_module_id(7)
+        assert [lesson.id for lesson in lessons] == [72, 73, 71]
+
+    asyncio.run(run())
+
+
+def test_reorder_lessons_updates_scores_and_documents(redis_manager):
+    async def run():
+        content_service = ContentService(redis_manager)
+        await content_service.create_module({"id": 7, "course_id": 70, "title": "M", "description": "", "order": 1})
+        await create_lessons(content_service, 7, {71: 1, 72: 2, 73: 3})
+
+        lessons = await content_service.reorder_lessons(7, [{"id": 73, "order": 0}, {"id": 71, "order": 5}])
+        assert [lesson.id for lesson in lessons] == [73, 72, 71]
+        assert json.loads(redis_manager.get("lesson:73"))["order"] == 0
+
+        nav = await content_service.get_lesson_navigation(70, 73)
+        assert nav.position == 1 and nav.next_lesson_id == 72
+
+    asyncio.run(run())
+
+
+def test_reorder_modules_ignores_other_courses(redis_manager):
+    async def run():
+        content_service = ContentService(redis_manager)
+        await content_service.create_module({"id": 1, "course_id": 10, "title": "A", "description": "", "order": 1})
+        await content_service.create_module({"id": 2, "course_id": 10, "title": "B", "description": "", "order": 2})
+        await content_service.create_module({"id": 3, "course_id": 11, "title": "C", "description": "", "order": 1})
+
+        modules = await content_service.reorder_modules(10, [{"id": 2, "order": 0}, {"id": 3, "order": 0}])
+        assert [module.id for module in modules] == [2, 1]
+        assert redis_manager.zrange("course:10:modules") == ["2", "1"]
+        assert json.loads(redis_manager.get("module:3"))["order"] == 1
+
+    asyncio.run(run())
+
+
+def test_legacy_set_index_is_migrated(redis_manager):
+    async def run():
+        content_service = ContentService(redis_manager)
+        for lesson_id, order in {81: 2, 82: 1}.items():
+            redis_manager.set(f"lesson:{lesson_id}", json.dumps({
+                "id": lesson_id, "module_id": 8, "title": "L", "description": "",
+                "content_type": "text", "content": "", "order": order,
+                "created_at": "2024-01-01T00:00:00", "updated_at": "2024-01-01T00:00:00"
+            }))
+        redis_manager.sadd("module:8:lessons", 81, 82)
+
+        lessons = await content_service.get_lessons_by_module_id(8)
+        assert [lesson.id for lesson in lessons] == [82, 81]
+        assert redis_manager.type("module:8:lessons") == "zset"
+
+    asyncio.run(run())
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse
+from starlette.testclient import TestClient
+
+from services.catalog_version import CatalogVersions
+from services.content import ContentService
+from web import PageCache
+
+
+def make_app(page_cache):
+    """A one-page app that counts how often the page is rendered."""
+    app = FastAPI()
+    app.state.renders = 0
+
+    @app.get("/courses/ui")
+    async def courses(request: Request):
+        user = None
+
+        async def render():
+            app.state.renders += 1
+            return HTMLResponse(f"<h1>Courses {request.query_params.get('skip', '0')}</h1>")
+
+        return await page_cache.respond(request, user, render)
+
+    return app
+
+
+@pytest.fixture
+def page_cache(redis_manager):
+    return PageCache(redis_manager, enabled=True)
+
+
+def test_repeat_views_are_cached_and_revalidated(page_cache):
+    app = make_app(page_cache)
+    client = TestClient(app)
+
+    first = client.get("/courses/ui")
+    second = client.get("/courses/ui")
+    assert first.text == second.text == "<h1>Courses 0</h1>"
+    assert app.state.renders == 1
+    assert first.headers["etag"] == second.headers["etag"]
+
+    not_modified = client.get("/courses/ui", headers={"If-None-Match": first.headers["etag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    # Other parameters are other pages
+    assert client.get("/courses/ui?skip=10").text == "<h1>Courses 10</h1>"
+    assert app.state.renders == 2
+
+
+def test_content_writes_invalidate_pages(redis_manager, page_cache):
+    app = make_app(page_cache)
+    client = TestClient(app)
+    etag = client.get("/courses/ui").headers["etag"]
+
+    asyncio.run(ContentService(redis_manager).create_module(
+        {"id": 1, "course_id": 9, "title": "M", "description": "", "order": 1}))
+
+    response = client.get("/courses/ui", headers={"If-None-Match": etag})
+    # Same HTML, so the ETag still matches, but the page was rendered again
+    assert response.status_code == 304
+    assert app.state.renders == 2
+    assert [version.number for version in CatalogVersions(redis_manager).get(9)] == [1, 1]
+
+
+def test_pages_are_shared_through_redis(redis_manager):
+    writer = make_app(PageCache(redis_manager, enabled=True, use_redis=True))
+    reader = make_app(PageCache(redis_manager, enabled=True, use_redis=True))
+
+    TestClient(writer).get("/courses/ui")
+    assert TestClient(reader).get("/courses/ui").text == "<h1>Courses 0</h1>"
+    assert reader.state.renders == 0
+
+
+def test_pages_are_not_cached_without_redis():
+    page_cache = PageCache(redis_manager=None, enabled=True)
+    app = make_app(page_cache)
+    client = TestClient(app)
+    client.get("/courses/ui")
+    client.get("/courses/ui")
+    assert app.state.renders == 2
+
+
+def test_cached_pages_are_served_while_redis_is_unavailable(redis_manager, page_cache):
+    app = make_app(page_cache)
+    client = TestClient(app)
+    assert client.get("/courses/ui").text == "<h1>Courses 0</h1>"
+
+    redis_manager.circuit.trip()
+    assert client.get("/courses/ui").text == "<h1>Courses 0</h1>"
+    assert app.state.renders == 1
+    # Pages not cached before are rendered, but not cached
+    client.get("/courses/ui?skip=10")
+    client.get("/courses/ui?skip=10")
+    assert app.state.renders == 3
+
+
+def test_unversioned_state_varies_the_cached_page(page_cache):
+    app = FastAPI()
+    app.state.students = 0
+
+    @app.get("/courses/1/ui")
+    async def course(request: Request):
+        students = app.state.students
+
+        async def render():
+            return HTMLResponse(f"<p>Students: {students}</p>")
+
+        return await page_cache.respond(request, None, render, vary=f"students={students}")
+
+    client = TestClient(app)
+    assert client.get("/courses/1/ui").text == "<p>Students: 0</p>"
+    # An enrollment changes the page without bumping the catalog version
+    app.state.students = 1
+    assert client.get("/courses/1/ui").text == "<p>Students: 1</p>"
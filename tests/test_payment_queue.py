@@ -0,0 +1,132 @@
+import asyncio
+import time
+
+import pytest
+
+from services.payment import PaymentMethod, PaymentService, PaymentStatus
+from services.payment_gateway import FakePaymentGateway
+from services.payment_queue import (
+    CHARGE, DEAD, DEAD_LETTER_STREAM, DELAYED_JOBS_KEY, REFUND, RETRYING, SUCCEEDED, FAILED, PaymentQueue
+)
+
+
+def make_queue(redis_manager, gateway, **options):
+    payment_service = PaymentService(redis_manager, gateway=gateway)
+    options = {"workers": 3, "max_attempts": 3, "base_delay": 0, "poll_interval": 0.01, **options}
+    return PaymentQueue(redis_manager, payment_service, **options)
+
+
+def create_payment(queue, amount=20.0):
+    return asyncio.run(queue.payment_service.create_payment(
+        {"user_id": 1, "course_id": 2, "amount": amount, "payment_method": PaymentMethod.PAYPAL}))
+
+
+def test_jobs_are_deduplicated_and_processed(redis_manager):
+    gateway = FakePaymentGateway(declined_amounts=[13.0])
+    queue = make_queue(redis_manager, gateway)
+    payment = create_payment(queue)
+    declined = create_payment(queue, amount=13.0)
+
+    job_id = queue.enqueue(CHARGE, payment.id, user_id=1)
+    assert queue.enqueue(CHARGE, payment.id, user_id=1) == job_id
+    declined_job = queue.enqueue(CHARGE, declined.id)
+    assert queue.get_job(job_id)["status"] == "queued"
+
+    async def run():
+        while await queue.run_once("worker"):
+            pass
+    asyncio.run(run())
+
+    job = queue.get_job(job_id)
+    assert (job["status"], job["payment_status"], job["attempts"], job["user_id"]) == (SUCCEEDED, "completed", 1, 1)
+    assert queue.get_job(declined_job)["status"] == FAILED
+    assert len(gateway.charges) == 1
+    # A finished charge is not queued again
+    assert queue.enqueue(CHARGE, payment.id) == job_id
+    assert asyncio.run(queue.run_once("worker")) == 0
+
+    refund_job = queue.enqueue(REFUND, payment.id)
+    asyncio.run(queue.run_once("worker"))
+    assert queue.get_job(refund_job)["payment_status"] == "refunded"
+
+
+def test_gateway_errors_are_retried_then_dead_lettered(redis_manager):
+    gateway = FakePaymentGateway(failures=1)
+    queue = make_queue(redis_manager, gateway, base_delay=0.05)
+    payment = create_payment(queue)
+    job_id = queue.enqueue(CHARGE, payment.id)
+
+    asyncio.run(queue.run_once("worker"))
+    job = queue.get_job(job_id)
+    assert job["status"] == RETRYING and "timed out" in job["error"]
+    # Not due yet
+    assert asyncio.run(queue.run_once("worker")) == 0
+    time.sleep(0.06)
+    asyncio.run(queue.run_once("worker"))
+    assert queue.get_job(job_id)["status"] == SUCCEEDED
+    assert queue.get_job(job_id)["attempts"] == 2
+
+    gateway.failures = 10
+    other = create_payment(queue)
+    other_job = queue.enqueue(CHARGE, other.id)
+    fast = make_queue(redis_manager, gateway)
+    for _ in range(3):
+        asyncio.run(fast.run_once("worker"))
+    assert fast.get_job(other_job)["status"] == DEAD
+    client = redis_manager.get_client()
+    assert [fields["job_id"] for _, fields in client.xrange(DEAD_LETTER_STREAM)] == [other_job]
+    assert client.zcard(DELAYED_JOBS_KEY) == 0
+    assert asyncio.run(fast.payment_service.get_payment(other.id)).status == PaymentStatus.PENDING
+
+
+def test_worker_pool_absorbs_gateway_latency(redis_manager):
+    gateway = FakePaymentGateway(latency=0.05)
+    queue = make_queue(redis_manager, gateway, workers=4)
+    payments = [create_payment(queue) for _ in range(8)]
+    job_ids = [queue.enqueue(CHARGE, payment.id) for payment in payments]
+
+    async def run():
+        started = time.monotonic()
+        queue.start()
+        while any(queue.get_job(job_id)["status"] != SUCCEEDED for job_id in job_ids):
+            assert time.monotonic() - started < 5
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return time.monotonic() - started
+
+    elapsed = asyncio.run(run())
+    # Eight 50ms charges on four workers take about two rounds, not eight
+    assert elapsed < 8 * 0.05
+    assert len(gateway.charges) == 8
+
+
+def test_jobs_of_a_stopped_worker_are_claimed(redis_manager):
+    gateway = FakePaymentGateway()
+    queue = make_queue(redis_manager, gateway, claim_idle=0)
+    payment = create_payment(queue)
+    job_id = queue.enqueue(CHARGE, payment.id)
+    client = redis_manager.get_client()
+    queue._ensure_group(client)
+    # A worker read the job and died before running it
+    client.xreadgroup("payment_workers", "gone", {"payment_jobs": ">"}, count=1)
+
+    asyncio.run(queue.run_once("worker"))
+    assert queue.get_job(job_id)["status"] == SUCCEEDED
+
+
+def test_idle_workers_leave_maintenance_to_one_slower_task(redis_manager):
+    queue = make_queue(redis_manager, FakePaymentGateway(), workers=2, poll_interval=0.05, maintenance_interval=10)
+    client = redis_manager.get_client()
+    commands = []
+    execute_command = client.execute_command
+    client.execute_command = lambda *args, **kwargs: commands.append(args[0]) or execute_command(*args, **kwargs)
+
+    async def run():
+        queue.start()
+        await asyncio.sleep(0.3)
+        await queue.stop()
+
+    asyncio.run(run())
+    assert commands.count("ZRANGEBYSCORE") == 1 and commands.count("XAUTOCLAIM") == 1
+    # Each worker reads about once per poll interval
+    assert 2 <= commands.count("XREADGROUP") <= 2 * (0.3 / 0.05 + 1)
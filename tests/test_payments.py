@@ -0,0 +1,165 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.analytics import AnalyticsService
+from services.payment import PaymentMethod, PaymentService, PaymentStatus
+from services.payment_gateway import FakePaymentGateway, GatewayResult, PaymentGateway, get_payment_gateway
+
+
+@pytest.fixture
+def gateway():
+    return FakePaymentGateway(declined_amounts=[13.0], latency=0.01)
+
+
+@pytest.fixture
+def payment_service(redis_manager, gateway):
+    return PaymentService(redis_manager, gateway=gateway, analytics=AnalyticsService(redis_manager))
+
+
+def payment_data(user_id=1, course_id=10, amount=49.99, **extra):
+    return {"user_id": user_id, "course_id": course_id, "amount": amount,
+            "payment_method": PaymentMethod.CREDIT_CARD, **extra}
+
+
+def test_payments_are_stored_and_paged_newest_first(payment_service):
+    async def run():
+        start = datetime(2024, 1, 1)
+        for i in range(5):
+            await payment_service.create_payment(payment_data(
+                user_id=1 if i % 2 == 0 else 2, course_id=10 + i % 2, created_at=start + timedelta(hours=i)))
+
+        assert [p.created_at.hour for p in await payment_service.list_payments(limit=2)] == [4, 3]
+        assert [p.created_at.hour for p in await payment_service.list_payments(skip=2, limit=2)] == [2, 1]
+        assert [p.created_at.hour for p in await payment_service.get_user_payments(1)] == [4, 2, 0]
+        assert [p.created_at.hour for p in await payment_service.get_course_payments(11, limit=1)] == [3]
+        assert [p.created_at.hour for p in await payment_service.list_payments(
+            filters={"user_id": 1, "course_id": 10}, skip=1)] == [2, 0]
+
+        first = (await payment_service.get_user_payments(2))[0]
+        stored = await payment_service.get_payment(first.id)
+        assert stored.amount == 49.99 and stored.status == PaymentStatus.PENDING
+
+    asyncio.run(run())
+
+
+def test_retried_create_returns_the_first_payment(payment_service, redis_manager):
+    async def run():
+        first = await payment_service.create_payment(payment_data(), idempotency_key="checkout-1")
+        again = await payment_service.create_payment(payment_data(), idempotency_key="checkout-1")
+        other_user = await payment_service.create_payment(payment_data(user_id=2), idempotency_key="checkout-1")
+        assert again.id == first.id
+        assert other_user.id != first.id
+
+        retries = await asyncio.gather(*[
+            payment_service.create_payment(payment_data(user_id=3), idempotency_key="checkout-2") for _ in range(5)
+        ])
+        assert len({payment.id for payment in retries}) == 1
+        assert len(await payment_service.get_user_payments(3)) == 1
+
+    asyncio.run(run())
+
+
+def test_processing_charges_once(payment_service, gateway):
+    async def run():
+        payment = await payment_service.create_payment(payment_data())
+        results = await asyncio.gather(*[payment_service.process_payment(payment.id) for _ in range(3)])
+        assert all(result is not None for result in results)
+
+        processed = await payment_service.get_payment(payment.id)
+        assert processed.status == PaymentStatus.COMPLETED and processed.transaction_id
+        assert len(gateway.charges) == 1
+        assert [p.id for p in await payment_service.list_payments(filters={"status": "completed"})] == [payment.id]
+        assert await payment_service.list_payments(filters={"status": PaymentStatus.PENDING}) == []
+        assert payment_service.analytics.series("revenue", 3600)["total"] == 49.99
+
+        refunded = await payment_service.refund_payment(payment.id)
+        assert refunded.status == PaymentStatus.REFUNDED
+        assert (await payment_service.refund_payment(payment.id)).refund_transaction_id == refunded.refund_transaction_id
+        assert gateway.refunds == [processed.transaction_id]
+
+    asyncio.run(run())
+
+
+def test_declines_and_gateway_errors(redis_manager):
+    async def run():
+        gateway = FakePaymentGateway(declined_amounts=[13.0], failures=1)
+        payment_service = PaymentService(redis_manager, gateway=gateway)
+        payment = await payment_service.create_payment(payment_data(amount=20.0))
+        # The gateway timed out: the payment stays pending and can be processed again
+        assert await payment_service.process_payment(payment.id) is None
+        assert (await payment_service.get_payment(payment.id)).status == PaymentStatus.PENDING
+        assert (await payment_service.process_payment(payment.id)).status == PaymentStatus.COMPLETED
+
+        declined = await payment_service.create_payment(payment_data(amount=13.0))
+        declined = await payment_service.process_payment(declined.id)
+        assert declined.status == PaymentStatus.FAILED and declined.failure_reason == "Card declined"
+        assert await payment_service.refund_payment(declined.id) is None
+
+    asyncio.run(run())
+
+
+def test_gateway_comes_from_config(monkeypatch):
+    monkeypatch.delenv("PAYMENT_GATEWAY", raising=False)
+    assert get_payment_gateway() is None
+    monkeypatch.setenv("PAYMENT_GATEWAY", "fake")
+    assert isinstance(get_payment_gateway(), FakePaymentGateway)
+    with pytest.raises(ValueError):
+        get_payment_gateway("stripe")
+
+
+def test_payments_are_not_charged_without_a_gateway(redis_manager):
+    async def run():
+        payment_service = PaymentService(redis_manager)
+        payment = await payment_service.create_payment(payment_data())
+        with pytest.raises(RuntimeError):
+            await payment_service.process_payment(payment.id)
+        assert (await payment_service.get_payment(payment.id)).status == PaymentStatus.PENDING
+
+    asyncio.run(run())
+
+
+def test_payments_are_unavailable_without_a_gateway(app, monkeypatch):
+    from starlette.testclient import TestClient
+
+    monkeypatch.setattr(app.payment_service, "gateway", None)
+    monkeypatch.setattr(app, "ENROLLMENT_REQUIRES_PAYMENT", True)
+
+    async def setup():
+        await app.user_service.create_user({
+            "id": 7, "username": "student", "email": "student@example.com", "full_name": "S", "role": "admin"})
+        course = await app.course_service.create_course({
+            "title": "Course", "description": "", "level": "beginner", "instructor_id": 7, "price": 20.0})
+        payment = await app.payment_service.create_payment(payment_data(user_id=7, course_id=course.id))
+        return course, payment
+
+    course, payment = asyncio.run(setup())
+    client = TestClient(app.app)
+    client.cookies.set("access_token", "Bearer student:admin")
+
+    assert client.post(f"/api/courses/{course.id}/checkout", json={}).status_code == 503
+    assert client.post(f"/api/payments/{payment.id}/refund").status_code == 503
+    assert client.post(f"/courses/{course.id}/enroll", allow_redirects=False).status_code == 503
+    assert not asyncio.run(app.enrollment_service.is_user_enrolled(7, course.id))
+
+
+def test_gateways_implement_the_whole_interface():
+    class Incomplete(PaymentGateway):
+        async def charge(self, amount, currency, payment_method, idempotency_key):
+            return GatewayResult(success=True)
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_fake_gateway_remembers_a_bounded_number_of_results():
+    async def run():
+        gateway = FakePaymentGateway(max_results=2)
+        first = await gateway.charge(10.0, "USD", "credit_card", "a")
+        assert await gateway.charge(10.0, "USD", "credit_card", "a") == first
+        await gateway.charge(10.0, "USD", "credit_card", "b")
+        await gateway.charge(10.0, "USD", "credit_card", "c")
+        assert list(gateway._results) == ["b", "c"]
+
+    asyncio.run(run())
@@ -0,0 +1,70 @@
+import asyncio
+
+import fakeredis
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+from starlette.testclient import TestClient
+
+from services.catalog_version import CatalogVersions
+from services.enrollment import EnrollmentService
+from services.redis_manager import RedisManager
+from services.redis_metrics import RedisMetrics
+from web import RedisStatsMiddleware
+
+
+def make_manager():
+    return RedisManager(client=fakeredis.FakeRedis(decode_responses=True), metrics=RedisMetrics(enabled=True))
+
+
+def metric_lines(metrics, name):
+    return [line for line in metrics.render().splitlines() if line.startswith(name + "{")]
+
+
+def test_round_trips_are_counted_by_command_and_caller():
+    manager = make_manager()
+    versions = CatalogVersions(manager)
+    versions.bump(1, 2)
+    versions.get(1)
+    versions.get(2)
+
+    rendered = manager.metrics.render()
+    assert 'redis_round_trips_total{command="PIPELINE",caller="CatalogVersions.bump"} 1' in rendered
+    assert 'redis_round_trips_total{command="HMGET",caller="CatalogVersions.get"} 2' in rendered
+    # Every command inside the pipeline is counted
+    assert 'redis_commands_total{command="HINCRBY",caller="CatalogVersions.bump"} 3' in rendered
+    assert 'redis_commands_total{command="HSET",caller="CatalogVersions.bump"} 1' in rendered
+
+    buckets = metric_lines(manager.metrics, "redis_round_trip_duration_seconds_bucket")
+    get_buckets = [int(line.rsplit(" ", 1)[1]) for line in buckets if 'caller="CatalogVersions.get"' in line]
+    assert get_buckets == sorted(get_buckets) and get_buckets[-1] == 2
+    assert 'redis_round_trip_duration_seconds_count{command="HMGET",caller="CatalogVersions.get"} 2' in rendered
+    assert any(line.startswith('redis_received_bytes_total{caller="CatalogVersions.get"}')
+               for line in rendered.splitlines())
+
+
+def test_transactions_count_watched_reads_and_exec():
+    manager = make_manager()
+    asyncio.run(EnrollmentService(manager).enroll_after_payment(1, 5, require_payment=False))
+    rendered = manager.metrics.render()
+    caller = "EnrollmentService.enroll_after_payment.<locals>.enroll"
+    assert f'redis_round_trips_total{{command="HGET",caller="{caller}"}} 1' in rendered
+    assert 'redis_round_trips_total{command="PIPELINE",caller="EnrollmentService.enroll_after_payment"} 1' in rendered
+
+
+def test_debug_header_summarises_each_request():
+    manager = make_manager()
+    app = FastAPI()
+    app.add_middleware(RedisStatsMiddleware, enabled=True)
+
+    @app.get("/versions")
+    async def versions():
+        for course_id in range(3):
+            CatalogVersions(manager).get(course_id)
+        return PlainTextResponse("ok")
+
+    client = TestClient(app)
+    header = client.get("/versions").headers["x-redis-stats"]
+    assert header.startswith("round-trips=3; commands=3;")
+    assert header.endswith("callers=CatalogVersions.get=3")
+    # Each request has its own summary
+    assert client.get("/versions").headers["x-redis-stats"].startswith("round-trips=3;")
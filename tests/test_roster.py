@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime
+
+from services.enrollment import Enrollment, EnrollmentService, EnrollmentStatus
+from services.user import UserService
+
+
+def test_counts_and_pages_come_from_the_roster(redis_manager):
+    service = EnrollmentService(redis_manager)
+    for user_id in range(1, 8):
+        asyncio.run(service.enroll_after_payment(user_id, 5, require_payment=False))
+    asyncio.run(service.enroll_after_payment(1, 6, require_payment=False))
+
+    assert asyncio.run(service.get_enrollment_counts([5, 6, 7])) == {5: 7, 6: 1, 7: 0}
+    first = asyncio.run(service.get_course_enrollments(5, skip=0, limit=3))
+    rest = asyncio.run(service.get_course_enrollments(5, skip=3, limit=10))
+    assert [e.user_id for e in first] == [1, 2, 3]
+    assert [e.user_id for e in rest] == [4, 5, 6, 7]
+    assert asyncio.run(service.get_course_enrollments(7)) == []
+
+
+def store_legacy_enrollment(redis_manager, enrollment_id, course_id, status):
+    """An enrollment made before course rosters existed."""
+    enrollment = Enrollment(id=enrollment_id, user_id=enrollment_id, course_id=course_id, status=status,
+                            enrolled_at=datetime(2024, 1, enrollment_id))
+    redis_manager.set(f"enrollment:{enrollment_id}", redis_manager.encode_doc(enrollment.dict()))
+    redis_manager.sadd(f"course:{course_id}:enrollments", enrollment_id)
+
+
+def test_roster_is_rebuilt_from_enrollments_made_before_it(redis_manager):
+    for enrollment_id, status in ((1, EnrollmentStatus.ACTIVE), (2, EnrollmentStatus.DROPPED),
+                                  (3, EnrollmentStatus.ACTIVE)):
+        store_legacy_enrollment(redis_manager, enrollment_id, 9, status)
+
+    service = EnrollmentService(redis_manager)
+    assert asyncio.run(service.get_enrollment_count(9)) == 2
+    assert [e.id for e in asyncio.run(service.get_course_enrollments(9))] == [1, 3]
+    assert redis_manager.zrange("course:9:roster") == ["1", "3"]
+
+
+def test_roster_is_rebuilt_once_even_without_active_enrollments(redis_manager):
+    store_legacy_enrollment(redis_manager, 1, 9, EnrollmentStatus.DROPPED)
+    store_legacy_enrollment(redis_manager, 2, 8, EnrollmentStatus.ACTIVE)
+    service = EnrollmentService(redis_manager)
+    # A new enrollment in a course that has older ones does not hide them
+    asyncio.run(service.enroll_after_payment(3, 8, require_payment=False))
+
+    scans = []
+    sscan = redis_manager.sscan
+    redis_manager.sscan = lambda key, count=100: scans.append(key) or sscan(key, count)
+    for _ in range(3):
+        assert asyncio.run(service.get_enrollment_counts([8, 9])) == {8: 2, 9: 0}
+    assert scans == ["course:8:enrollments", "course:9:enrollments"]
+
+
+def test_get_users_keeps_order_and_marks_unknown_ids(redis_manager):
+    users = UserService(redis_manager)
+    for name in ("ana", "ben"):
+        asyncio.run(users.create_user({"username": name, "email": f"{name}@example.com",
+                                       "full_name": name.title(), "password": "secret"}))
+    ana, ben = (asyncio.run(users.get_user_by_username(name)) for name in ("ana", "ben"))
+
+    found = asyncio.run(users.get_users([ben.id, 999, ana.id]))
+    assert [user.username if user else None for user in found] == ["ben", None, "ana"]
+
+
+def test_roster_finds_students_stored_before_the_user_id_index(redis_manager):
+    redis_manager.set("user:ana", redis_manager.encode_doc(
+        {"id": 1, "username": "ana", "email": "ana@example.com", "full_name": "Ana"}))
+    redis_manager.sadd("users", "ana")
+    store_legacy_enrollment(redis_manager, 1, 9, EnrollmentStatus.ACTIVE)
+    users = UserService(redis_manager)
+    asyncio.run(users.build_id_index())
+
+    enrollments = asyncio.run(EnrollmentService(redis_manager).get_course_enrollments(9))
+    students = asyncio.run(users.get_users([enrollment.user_id for enrollment in enrollments]))
+    assert [student.username for student in students] == ["ana"]
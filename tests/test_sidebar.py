@@ -0,0 +1,53 @@
+import asyncio
+
+from services.course import CourseService, CourseStatus
+from services.sidebar import SidebarSnapshot
+
+
+def create_courses(course_service, *course_ids):
+    async def run():
+        for course_id in course_ids:
+            await course_service.create_course({"id": course_id, "title": f"C{course_id}", "description": "",
+                                                "instructor_id": 1, "status": CourseStatus.PUBLISHED})
+    asyncio.run(run())
+
+
+def test_snapshot_serves_fallback_until_redis_has_courses(redis_manager):
+    course_service = CourseService(redis_manager=redis_manager)
+    sidebar = SidebarSnapshot(course_service, size=2, fallback_featured=[{"id": 1}], fallback_trending=[{"id": 2}])
+    assert asyncio.run(sidebar.refresh())
+    assert sidebar.featured == [{"id": 1}] and sidebar.trending == [{"id": 2}]
+
+    create_courses(course_service, 10, 11, 12)
+    redis_manager.sadd("featured_courses", 10, 11, 12)
+    asyncio.run(course_service.trending_service.record_view(12))
+    assert asyncio.run(sidebar.refresh())
+    assert len(sidebar.featured) == 2
+    assert [course.id for course in sidebar.trending] == [12]
+
+
+def test_pages_read_the_snapshot_without_recomputing(redis_manager):
+    course_service = CourseService(redis_manager=redis_manager)
+    create_courses(course_service, 10)
+    redis_manager.sadd("featured_courses", 10)
+    sidebar = SidebarSnapshot(course_service, refresh_seconds=3600)
+
+    calls = []
+    original = course_service.list_course_cards
+
+    async def counting(*args, **kwargs):
+        calls.append(kwargs.get("filters"))
+        return await original(*args, **kwargs)
+
+    course_service.list_course_cards = counting
+
+    async def run():
+        sidebar.start()
+        await asyncio.sleep(0)
+        for _ in range(5):
+            assert [course.id for course in sidebar.featured] == [10]
+        await sidebar.stop()
+
+    asyncio.run(run())
+    # One background refresh reads both lists once
+    assert len(calls) == 2
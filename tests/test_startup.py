@@ -0,0 +1,36 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from services.redis_manager import RedisManager
+from services.user import UserService
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def imported_modules(code):
+    """Modules loaded by running code in a fresh interpreter."""
+    result = subprocess.run([sys.executable, "-c", code + "\nimport sys\nprint(' '.join(sys.modules))"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    return set(result.stdout.split("\n")[-2].split())
+
+
+def test_managers_connect_on_first_use(monkeypatch):
+    calls = []
+    monkeypatch.setattr(RedisManager, "connect", lambda self: calls.append(self) or False)
+
+    manager = RedisManager()
+    UserService(manager)
+    assert calls == []
+    assert manager.get_client() is None and manager.get_client() is None
+    assert calls == [manager]
+
+
+def test_importing_one_service_does_not_import_the_others():
+    modules = imported_modules("import services.redis_manager")
+    assert "services.user" not in modules and "passlib" not in modules
+
+
+def test_app_does_not_import_test_modules():
+    modules = imported_modules("import main")
+    assert "main" in modules and "test_complete_learning_flow" not in modules
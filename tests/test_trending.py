@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from services.course import CourseService, CourseStatus
+from services.trending import EPOCH_HALF_LIVES, TrendingService
+
+HOUR = 3600
+
+
+@pytest.fixture
+def trending(redis_manager):
+    return TrendingService(redis_manager, half_life_hours=1, view_weight=1, enrollment_weight=10)
+
+
+def record(trending, kind, course_id, now):
+    method = trending.record_view if kind == "view" else trending.record_enrollment
+    assert asyncio.run(method(course_id, now=now))
+
+
+def test_recent_engagement_outranks_older_engagement(trending):
+    start = 1_000_000 * HOUR
+    for _ in range(3):
+        record(trending, "view", 1, start)
+    # Two half-lives later one view counts four times as much
+    record(trending, "view", 2, start + 2 * HOUR + 60)
+    assert trending.top_ids(2, now=start + 3 * HOUR) == [2, 1]
+
+    record(trending, "enrollment", 3, start + 2 * HOUR)
+    assert trending.top_ids(1, now=start + 3 * HOUR) == [3]
+    assert trending.top_ids(10, now=start + 3 * HOUR) == [3, 2, 1]
+
+
+def test_scores_carry_over_into_the_next_epoch(trending):
+    epoch_length = EPOCH_HALF_LIVES * HOUR
+    boundary = 1000 * epoch_length
+    record(trending, "view", 1, boundary - 60)
+    record(trending, "view", 1, boundary - 60)
+    record(trending, "view", 2, boundary + 60)
+    # Two views a couple of minutes earlier still beat one view now
+    assert trending.top_ids(2, now=boundary + 120) == [1, 2]
+
+    record(trending, "view", 2, boundary + 120)
+    record(trending, "view", 2, boundary + 120)
+    assert trending.top_ids(2, now=boundary + 180) == [2, 1]
+
+    # A second service (another worker) must not carry the old epoch over again
+    other = TrendingService(trending.redis_manager, half_life_hours=1)
+    assert other.top_ids(2, now=boundary + 180) == [2, 1]
+
+
+def test_falls_back_to_the_hand_filled_set(redis_manager, trending):
+    redis_manager.sadd("trending_courses", 7, 5)
+    assert trending.top_ids(5) == [5, 7]
+
+
+def test_trending_course_lists_follow_the_ranking(redis_manager):
+    async def run():
+        course_service = CourseService(redis_manager=redis_manager)
+        for course_id in (1, 2, 3):
+            await course_service.create_course({"id": course_id, "title": f"C{course_id}", "description": "",
+                                                "instructor_id": 1, "status": CourseStatus.PUBLISHED})
+        await course_service.trending_service.record_view(2)
+        await course_service.trending_service.record_enrollment(3)
+        courses = await course_service.list_courses(filters={"status": CourseStatus.PUBLISHED, "trending": True})
+        assert [course.id for course in courses] == [3, 2]
+
+    asyncio.run(run())
+
+
+def test_only_views_of_existing_courses_are_counted(app):
+    from starlette.testclient import TestClient
+
+    course = asyncio.run(app.course_service.create_course({
+        "title": "Course", "description": "", "level": "beginner", "instructor_id": 1}))
+    client = TestClient(app.app)
+    assert client.get("/courses/424242/ui").status_code == 404
+    assert client.get(f"/courses/{course.id}/ui").status_code == 200
+    assert app.trending_service.top_ids(10) == [course.id]
@@ -0,0 +1,29 @@
+import asyncio
+
+from services.user import USER_ID_INDEX_BUILT_KEY, UserService
+
+
+def store_legacy_user(redis_manager, user_id, username):
+    """A user written before the user ID index existed."""
+    redis_manager.set(f"user:{username}", redis_manager.encode_doc({
+        "id": user_id, "username": username, "email": f"{username}@example.com", "full_name": username.title()
+    }))
+    redis_manager.sadd("users", username)
+
+
+def test_users_stored_before_the_index_are_indexed_once(redis_manager):
+    users = UserService(redis_manager)
+    store_legacy_user(redis_manager, 1, "ana")
+    store_legacy_user(redis_manager, 2, "ben")
+
+    # Lookups by ID never scan the users set
+    assert asyncio.run(users.get_user(1)) is None
+
+    assert asyncio.run(users.build_id_index(batch_size=1)) == 2
+    assert redis_manager.get(USER_ID_INDEX_BUILT_KEY) is not None
+    assert asyncio.run(users.get_user(1)).username == "ana"
+    assert [user.username for user in asyncio.run(users.get_users([2, 1]))] == ["ben", "ana"]
+
+    store_legacy_user(redis_manager, 3, "cy")
+    assert asyncio.run(users.build_id_index()) == 0
+    assert asyncio.run(users.get_user(3)) is None
@@ -0,0 +1,26 @@
+from .http_cache import (
+    Validators, etag_for, if_none_match, not_modified, version_validators, ranking_validators, is_not_modified,
+    conditional_response
+)
+from .page_cache import CachedPage, PageCache
+from .compression import CompressionMiddleware
+from .responses import FastJSONResponse
+from .page_views import PageViewMiddleware
+from .redis_stats import RedisStatsMiddleware
+
+__all__ = [
+    'CachedPage',
+    'PageCache',
+    'CompressionMiddleware',
+    'FastJSONResponse',
+    'PageViewMiddleware',
+    'RedisStatsMiddleware',
+    'Validators',
+    'etag_for',
+    'if_none_match',
+    'not_modified',
+    'version_validators',
+    'ranking_validators',
+    'is_not_modified',
+    'conditional_response',
+]
@@ -0,0 +1,149 @@
+import os
+import zlib
+from typing import List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip is offered
+    brotli = None
+
+# Content types worth compressing; images, video and archives are compressed already
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript",
+                      "application/xml", "image/svg+xml")
+
+
+class GzipCompressor:
+    """Incremental gzip compression."""
+    encoding = "gzip"
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        chunk = self._compressor.compress(data)
+        return chunk + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else chunk
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliCompressor:
+    """Incremental brotli compression."""
+    encoding = "br"
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, flush: bool = False) -> bytes:
+        chunk = self._compressor.process(data)
+        return chunk + self._compressor.flush() if flush else chunk
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def accepted_encodings(header: str) -> List[str]:
+    """The content codings an Accept-Encoding header allows, ignoring those with q=0."""
+    accepted = []
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding and q > 0:
+            accepted.append(coding.strip().lower())
+    return accepted
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli or gzip, whichever the client accepts,
+    preferring brotli when it is installed.
+
+    Responses below `minimum_size`, responses that are already encoded and
+    content types that do not compress are sent as they are. Streaming
+    responses (such as the NDJSON exports) are compressed chunk by chunk and
+    flushed after each one, so clients still see progress.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: Optional[int] = None, gzip_level: int = 6,
+                 brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else int(
+            os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _compressor(self, accept_encoding: str):
+        accepted = accepted_encodings(accept_encoding)
+        if brotli is not None and "br" in accepted:
+            return BrotliCompressor(self.brotli_quality)
+        if "gzip" in accepted or "*" in accepted:
+            return GzipCompressor(self.gzip_level)
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        compressor = self._compressor(Headers(scope=scope).get("accept-encoding", ""))
+        if compressor is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Message = {}
+        state = {"compressing": None}
+
+        async def send_compressed(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # Hold the headers back until the first body chunk shows whether to compress
+                start.update(message)
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if state["compressing"] is None:
+                headers = MutableHeaders(raw=start["headers"])
+                state["compressing"] = (
+                    start["status"] not in (204, 304)
+                    and "content-encoding" not in headers
+                    and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                    and (more_body or len(body) >= self.minimum_size)
+                )
+                if state["compressing"]:
+                    headers["Content-Encoding"] = compressor.encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    # The compressed bytes differ from the representation a strong ETag names
+                    etag = headers.get("etag")
+                    if etag and not etag.startswith("W/"):
+                        headers["ETag"] = f"W/{etag}"
+                    if more_body:
+                        del headers["Content-Length"]
+                        body = compressor.compress(body, flush=True)
+                    else:
+                        body = compressor.compress(body) + compressor.finish()
+                        headers["Content-Length"] = str(len(body))
+                    message = {**message, "body": body}
+                await send(start)
+                await send(message)
+                return
+
+            if state["compressing"]:
+                chunk = compressor.compress(body, flush=more_body)
+                if not more_body:
+                    chunk += compressor.finish()
+                message = {**message, "body": chunk}
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,102 @@
+import hashlib
+import os
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, List, NamedTuple, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from services.catalog_version import CatalogVersions
+
+# How long browsers and CDNs may reuse a catalog response before revalidating it
+API_CACHE_MAX_AGE = int(os.getenv("API_CACHE_MAX_AGE", "60"))
+PUBLIC_CACHE_CONTROL = f"public, max-age={API_CACHE_MAX_AGE}"
+
+
+class Validators(NamedTuple):
+    """The validators of a response: a strong ETag and when the resource last changed."""
+    etag: str
+    last_modified: Optional[datetime]
+
+
+def etag_for(body: bytes) -> str:
+    """A strong ETag for a response body."""
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def if_none_match(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match header matches an ETag."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def not_modified(etag: str, headers: Optional[dict] = None) -> Response:
+    """A 304 response carrying the validator the client already has."""
+    return Response(status_code=304, headers={"ETag": etag, **(headers or {})})
+
+
+def version_validators(versions: CatalogVersions, resource: str, course_id=None) -> Optional[Validators]:
+    """
+    Validators of a resource from the catalog version, or from a course's
+    version if `course_id` is given, without reading the resource itself.
+
+    `resource` names the representation, including any query parameters that
+    change it. Returns None if the versions cannot be read.
+    """
+    found = versions.get(*([] if course_id is None else [course_id]))
+    if found is None:
+        return None
+    version = found[-1]
+    tag = hashlib.sha1(resource.encode("utf-8")).hexdigest()[:16]
+    return Validators(f'"{tag}-{version.number}"', version.modified)
+
+
+def ranking_validators(versions: CatalogVersions, resource: str, ids: List[Any]) -> Optional[Validators]:
+    """
+    Validators of a ranked listing, which change when the ranking or any course
+    in the catalog changes. Reading the ranked IDs is cheap; reading the
+    documents is what a 304 saves.
+    """
+    found = versions.get()
+    if found is None:
+        return None
+    ranking = ",".join(str(item_id) for item_id in ids)
+    tag = hashlib.sha1(f"{resource}:{ranking}".encode("utf-8")).hexdigest()[:16]
+    return Validators(f'"{tag}-{found[0].number}"', None)
+
+
+def is_not_modified(request: Request, validators: Validators) -> bool:
+    """Whether the client's copy is current; If-None-Match takes precedence over If-Modified-Since."""
+    if "if-none-match" in request.headers:
+        return if_none_match(request, validators.etag)
+    since = request.headers.get("if-modified-since")
+    if not since or validators.last_modified is None:
+        return False
+    try:
+        return validators.last_modified <= parsedate_to_datetime(since)
+    except (TypeError, ValueError):
+        return False
+
+
+def conditional_response(request: Request, response: Response, validators: Optional[Validators],
+                         cache_control: str = PUBLIC_CACHE_CONTROL) -> Optional[Response]:
+    """
+    Apply conditional GET to a route before it does any work.
+
+    Sets the caching headers on the route's `response` and returns a 304 to
+    send instead if the client's copy is current, else None. Without
+    validators nothing is set, so clients always get a full response.
+    """
+    if validators is None:
+        return None
+    headers = {"ETag": validators.etag, "Cache-Control": cache_control}
+    if validators.last_modified is not None:
+        headers["Last-Modified"] = format_datetime(validators.last_modified, usegmt=True)
+    if is_not_modified(request, validators):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
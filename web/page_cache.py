@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from services.catalog_version import CatalogVersions
+from web.http_cache import etag_for, if_none_match, not_modified
+
+
+class CachedPage(NamedTuple):
+    """A rendered page and its strong ETag."""
+    body: bytes
+    etag: str
+    media_type: str
+
+
+class PageCache:
+    """
+    Cache of rendered HTML pages, keyed by route, query parameters, auth state
+    and catalog version.
+
+    Entries are kept in a per-process LRU and, if enabled, in Redis so that
+    all workers share them. Course and content writes bump the catalog
+    version, so stale entries are never hit again and simply age out; the TTL
+    bounds how long data that does not bump the version (such as instructor
+    names) can be stale.
+
+    Every cached page carries an ETag, and a matching If-None-Match is
+    answered with 304 without sending the page again.
+
+    While Redis is unavailable (e.g. its circuit is open) the catalog version
+    cannot be read, so nothing new is cached; pages this process cached under
+    the last version it saw are served instead, however old, and other pages
+    are rendered from whatever the services fall back to.
+    """
+
+    def __init__(self, redis_manager=None, versions: Optional[CatalogVersions] = None,
+                 max_entries: Optional[int] = None, ttl: Optional[int] = None,
+                 use_redis: Optional[bool] = None, enabled: Optional[bool] = None):
+        self.redis_manager = redis_manager
+        self.versions = versions or CatalogVersions(redis_manager)
+        self.max_entries = max_entries or int(os.getenv("PAGE_CACHE_MAX_ENTRIES", "256"))
+        self.ttl = ttl or int(os.getenv("PAGE_CACHE_TTL", "300"))
+        if use_redis is None:
+            use_redis = os.getenv("PAGE_CACHE_REDIS", "false").lower() in ("1", "true", "yes")
+        self.use_redis = use_redis and redis_manager is not None
+        if enabled is None:
+            enabled = os.getenv("PAGE_CACHE", "true").lower() in ("1", "true", "yes")
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_version: Optional[int] = None
+
+    @staticmethod
+    def auth_state(user) -> str:
+        """The part of the key that depends on who is looking: anonymous, or a digest of the user."""
+        if user is None:
+            return "anonymous"
+        return hashlib.sha1(user.json().encode("utf-8")).hexdigest()[:16]
+
+    def key_for(self, request: Request, user=None, vary: str = "") -> Optional[str]:
+        """
+        The cache key of a request, or None if the page must not be cached.
+        `vary` is any further state the page shows that writes do not version.
+        """
+        if not self.enabled:
+            return None
+        versions = self.versions.get()
+        if versions is None:
+            # Without the version, writes by other processes could go unnoticed
+            return None
+        self._last_version = versions[0].number
+        return self._key(versions[0].number, request, user, vary)
+
+    def _key(self, version: int, request: Request, user, vary: str = "") -> str:
+        query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+        key = f"page_cache:{version}:{self.auth_state(user)}:{request.url.path}?{query}"
+        return f"{key}#{vary}" if vary else key
+
+    def _stale(self, request: Request, user, vary: str = "") -> Optional[CachedPage]:
+        """The page this process cached under the last catalog version it read, even if expired."""
+        if not self.enabled or self._last_version is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(self._key(self._last_version, request, user, vary))
+        return entry[1] if entry is not None else None
+
+    def get(self, key: str) -> Optional[CachedPage]:
+        """Get a cached page from this process or, if enabled, from Redis."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, page = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    return page
+                del self._entries[key]
+
+        if self.use_redis:
+            data = self.redis_manager.get(key)
+            if data:
+                try:
+                    stored = json.loads(data)
+                    page = CachedPage(stored["body"].encode("utf-8"), stored["etag"], stored["media_type"])
+                except (ValueError, KeyError) as e:
+                    print(f"Error decoding cached page from Redis: {e}")
+                    return None
+                self._remember(key, page)
+                return page
+        return None
+
+    def set(self, key: str, page: CachedPage) -> None:
+        """Cache a page in this process and, if enabled, in Redis."""
+        self._remember(key, page)
+        if self.use_redis:
+            client = self.redis_manager.get_client()
+            if client is None:
+                return
+            try:
+                client.set(key, json.dumps({"body": page.body.decode("utf-8"), "etag": page.etag,
+                                            "media_type": page.media_type}), ex=self.ttl)
+            except Exception as e:
+                print(f"Error caching page in Redis: {e}")
+
+    def _remember(self, key: str, page: CachedPage) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, page)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop the entries cached in this process."""
+        with self._lock:
+            self._entries.clear()
+
+    async def respond(self, request: Request, user, render: Callable[[], Awaitable[Response]],
+                      vary: str = "") -> Response:
+        """
+        Serve a page from the cache, rendering and caching it on a miss.
+
+        Only successful renders are cached; errors raised by `render` (such
+        as a 404) pass through untouched. Pages showing state that writes do
+        not version, such as enrollments, pass that state as `vary` so each
+        state is cached separately.
+        """
+        key = self.key_for(request, user, vary)
+        # No key while Redis is unavailable: serve a stale copy rather than render from fallback data
+        page = self.get(key) if key else self._stale(request, user, vary)
+        if page is None:
+            response = await render()
+            if key is None or response.status_code != 200:
+                return response
+            page = CachedPage(response.body, etag_for(response.body), response.media_type)
+            self.set(key, page)
+
+        # Pages for signed-in users must never be stored by shared caches
+        headers = {"Cache-Control": "no-cache" if user is None else "private, no-cache", "Vary": "Cookie"}
+        if if_none_match(request, page.etag):
+            return not_modified(page.etag, headers)
+        return Response(page.body, media_type=page.media_type, headers={"ETag": page.etag, **headers})
@@ -0,0 +1,26 @@
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class PageViewMiddleware:
+    """
+    Count every HTML page served to a GET in the page_views analytics metric.
+    API, static, redirect and error responses are not counted.
+    """
+
+    def __init__(self, app: ASGIApp, analytics) -> None:
+        self.app = app
+        self.analytics = analytics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_counted(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                if Headers(raw=message["headers"]).get("content-type", "").startswith("text/html"):
+                    await self.analytics.record_page_view()
+            await send(message)
+
+        await self.app(scope, receive, send_counted)
@@ -0,0 +1,44 @@
+import os
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.redis_metrics import end_request_stats, start_request_stats
+
+HEADER = "X-Redis-Stats"
+
+
+class RedisStatsMiddleware:
+    """
+    In debug mode, add a header summarising the Redis usage of each request:
+    round-trips, commands, time spent waiting on Redis, payload bytes, and
+    the service methods that made the most round-trips. A page whose
+    round-trips grow with its content is an N+1 to fix.
+
+    The summary covers what the request did before its response started, so
+    streamed responses report only the Redis work done up front.
+    """
+
+    def __init__(self, app: ASGIApp, enabled: Optional[bool] = None) -> None:
+        self.app = app
+        if enabled is None:
+            enabled = os.getenv("REDIS_STATS_HEADER", "false").lower() in ("1", "true", "yes")
+        self.enabled = enabled
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats, token = start_request_stats()
+
+        async def send_with_stats(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[HEADER] = stats.header()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            end_request_stats(token)
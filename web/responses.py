@@ -0,0 +1,46 @@
+import json
+from typing import Any
+
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+from services.codec import json_default
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    """Serialize what neither encoder handles natively."""
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    return json_default(obj)
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode JSON with orjson if it is installed, else with the standard library.
+
+    Both write datetimes as ISO 8601 and enums as their values, which is what
+    FastAPI's jsonable_encoder produces for the models in this project.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    A JSON response for content that is already validated, such as models
+    built from Redis documents.
+
+    Returning it from a route skips FastAPI's second pass over the content
+    (response_model validation and jsonable_encoder), which dominates the cost
+    of large lists. Headers set on the route's injected Response are not
+    merged into a returned response, so pass them on with `headers=`.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)